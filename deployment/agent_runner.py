@@ -0,0 +1,155 @@
+"""
+Long-lived ADK runner for the Streamlit front-end.
+
+Streamlit re-executes the page script on every interaction, so anything
+created there (a runner, an event loop) is rebuilt per message. `AgentRunner`
+is created once per server process instead (the app caches it with
+`st.cache_resource`): it owns one InMemoryRunner and one event loop running
+on a daemon thread, and keeps a session per browser. `stream()` is a plain
+generator the page can iterate, fed by the loop thread through a queue, so
+partial model text reaches the chat bubble as soon as ADK emits it.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+_DONE = object()
+
+
+@dataclass
+class MessageTimings:
+    """Per-message latency, all in milliseconds from the prompt being submitted."""
+
+    # Until the run was handed to ADK (session lookup, loop hand-off)
+    overhead_ms: float | None = None
+    first_token_ms: float | None = None
+    total_ms: float | None = None
+    partial_events: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "overhead_ms": self.overhead_ms,
+            "first_token_ms": self.first_token_ms,
+            "total_ms": self.total_ms,
+            "partial_events": self.partial_events,
+        }
+
+
+@dataclass
+class AgentReply:
+    """Filled in while `AgentRunner.stream` runs."""
+
+    text: str = ""
+    timings: MessageTimings = field(default_factory=MessageTimings)
+
+
+class AgentRunner:
+    def __init__(self, agent, app_name: str = "uon_albeee_einstein", timeout_s: float = 120.0):
+        self.runner = InMemoryRunner(agent=agent, app_name=app_name)
+        self.app_name = app_name
+        self.timeout_s = timeout_s
+        self.run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="adk-runner", daemon=True
+        )
+        self._thread.start()
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _ensure_session(self, user_id: str, session_id: str):
+        service = self.runner.session_service
+        session = await service.get_session(
+            app_name=self.app_name, user_id=user_id, session_id=session_id
+        )
+        if session is None:
+            await service.create_session(
+                app_name=self.app_name, user_id=user_id, session_id=session_id
+            )
+
+    async def _pump(
+        self,
+        user_id: str,
+        session_id: str,
+        prompt: str,
+        out: queue.Queue,
+        reply: AgentReply,
+        started: float,
+    ):
+        try:
+            await self._ensure_session(user_id, session_id)
+            reply.timings.overhead_ms = round((time.perf_counter() - started) * 1000, 1)
+            message = types.Content(role="user", parts=[types.Part.from_text(text=prompt)])
+
+            streamed = False
+            async for event in self.runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=message,
+                run_config=self.run_config,
+            ):
+                if not event.content or not event.content.parts:
+                    continue
+                text = "".join(
+                    part.text for part in event.content.parts if part.text and not part.thought
+                )
+                if not text:
+                    continue
+                if event.partial:
+                    streamed = True
+                    reply.timings.partial_events += 1
+                    out.put(text)
+                elif event.is_final_response():
+                    # The final event repeats the streamed text in full
+                    if not streamed:
+                        out.put(text)
+                    reply.text = text
+        except BaseException as e:
+            out.put(e)
+        finally:
+            out.put(_DONE)
+
+    def stream(self, user_id: str, session_id: str, prompt: str, reply: AgentReply) -> Iterator[str]:
+        """
+        Yield the answer's text as it streams. `reply` holds the complete text
+        and the timings once the generator is exhausted.
+        """
+        started = time.perf_counter()
+        out: queue.Queue = queue.Queue()
+        future = self._submit(self._pump(user_id, session_id, prompt, out, reply, started))
+        streamed = []
+        try:
+            while True:
+                item = out.get(timeout=self.timeout_s)
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                if reply.timings.first_token_ms is None:
+                    reply.timings.first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                streamed.append(item)
+                yield item
+        finally:
+            # Stop the run if the page stopped reading (e.g. the user navigated away)
+            future.cancel()
+            reply.timings.total_ms = round((time.perf_counter() - started) * 1000, 1)
+            if not reply.text:
+                reply.text = "".join(streamed)
+
+    def forget(self, user_id: str, session_id: str):
+        """Drop a browser's conversation, e.g. when its chat history is cleared."""
+        self._submit(
+            self.runner.session_service.delete_session(
+                app_name=self.app_name, user_id=user_id, session_id=session_id
+            )
+        ).result(timeout=self.timeout_s)
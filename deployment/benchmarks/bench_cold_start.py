@@ -0,0 +1,80 @@
+# python bench_cold_start.py --runs 3
+
+"""
+Cold-start time of an API worker, with and without the optimized ONNX graph cache.
+
+Starts `uvicorn main:app` (in-process TTS, no ADK server needed) and polls
+/ready until the worker reports warm, then stops it. The first scenario has
+graph caching disabled; the second starts from an empty cache directory, so
+its first run writes the optimized graph and later runs load it. For each
+run it reports seconds from launch to ready and the per-stage timings the
+worker recorded.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(__file__)
+API_DIR = os.path.join(HERE, "..", "einstein_api")
+
+
+def start_once(port: int, env: dict, timeout_s: float) -> dict:
+    launched = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR,
+        env={**os.environ, **env},
+    )
+    try:
+        while time.perf_counter() - launched < timeout_s:
+            if process.poll() is not None:
+                raise RuntimeError(f"Worker exited with code {process.returncode}")
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1.0)
+                if response.status_code == 200:
+                    status = response.json()
+                    return {
+                        "launch_to_ready_s": round(time.perf_counter() - launched, 3),
+                        "ready_after_s": status["ready_after_s"],
+                        "stages_ms": {name: s.get("ms") for name, s in status["stages"].items()},
+                    }
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"Worker not ready after {timeout_s} s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8974)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    # Keep ADK warm-up from waiting on a server that is not there
+    base_env = {"WARMUP_TIMEOUT_S": "0", "WARMUP_PRERENDER": "0", "TTS_CACHE_MAX_MB": "0"}
+
+    with tempfile.TemporaryDirectory() as graph_dir:
+        scenarios = {
+            "no_graph_cache": {**base_env, "TTS_OPTIMIZED_MODEL_DIR": ""},
+            "graph_cache": {**base_env, "TTS_OPTIMIZED_MODEL_DIR": graph_dir},
+        }
+        results = {
+            name: [start_once(args.port, env, args.timeout) for _ in range(args.runs)]
+            for name, env in scenarios.items()
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
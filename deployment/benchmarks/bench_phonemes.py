@@ -0,0 +1,111 @@
+# python bench_phonemes.py --repeats 20
+
+"""
+Phonemization cost with and without the clause phoneme cache.
+
+Times the text front-end (espeak phonemization plus phoneme ID mapping) for
+the sample sentences before, through Piper's own phonemizer, and after,
+through a PhonemeCache warmed from the domain lexicon: on first sight of each
+sentence (only recurring clauses hit) and on repeats. It checks the cached
+phoneme IDs match Piper's exactly, and times one ONNX inference per sentence
+so the front-end's share of total synthesis time is visible.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(__file__)
+API_DIR = os.path.join(HERE, "..", "einstein_api")
+sys.path.insert(0, API_DIR)
+
+from tts_batching import infer_padded, phoneme_rows  # noqa: E402
+from tts_cache import DEFAULT_LEXICON, PhonemeCache, load_lexicon  # noqa: E402
+from tts_engine import load_voice  # noqa: E402
+
+SENTENCES = [
+    "Ah, a splendid question!",
+    "Ah, you must mean the MSc Machine Learning in Science.",
+    "The MSc Machine Learning in Science is run by the School of Physics and Astronomy.",
+    "It blends statistics, programming and real scientific data.",
+    "Just a quick heads-up: course details may change, so please check the course page.",
+    "Open days usually start at ten and finish around half past three.",
+]
+
+
+def time_us(fn, sentences: list[str], repeats: int) -> list[float]:
+    """Microseconds per call of `fn(sentence)`, over every sentence and repeat."""
+    samples = []
+    for _ in range(repeats):
+        for sentence in sentences:
+            started = time.perf_counter()
+            fn(sentence)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def summary(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "mean_us": round(statistics.mean(samples), 1),
+        "p50_us": round(samples[len(samples) // 2], 1),
+        "p95_us": round(samples[max(0, int(len(samples) * 0.95) - 1)], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--model", default=os.path.join(API_DIR, "piper_model", "en_GB-alaneinstein-medium.onnx")
+    )
+    parser.add_argument("--lexicon", default=DEFAULT_LEXICON)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    voice = load_voice(args.model)
+    # espeak and onnxruntime both initialise lazily
+    infer_padded(voice, phoneme_rows(voice, SENTENCES[0]))
+
+    before = time_us(lambda s: phoneme_rows(voice, s), SENTENCES, args.repeats)
+
+    cache = PhonemeCache(voice.phonemize)
+    started = time.perf_counter()
+    lexicon_clauses = cache.warm(load_lexicon(args.lexicon))
+    warm_up_ms = (time.perf_counter() - started) * 1000
+    warmed = cache.stats()
+    after_first = time_us(lambda s: phoneme_rows(voice, s, cache.phonemize), SENTENCES, 1)
+    first_pass = cache.stats()
+    after_repeats = time_us(lambda s: phoneme_rows(voice, s, cache.phonemize), SENTENCES, args.repeats)
+    identical = all(
+        phoneme_rows(voice, s, cache.phonemize) == phoneme_rows(voice, s) for s in SENTENCES
+    )
+
+    inference = time_us(
+        lambda s: [infer_padded(voice, [row]) for row in phoneme_rows(voice, s)], SENTENCES, 3
+    )
+
+    print(json.dumps({
+        "sentences": len(SENTENCES),
+        "repeats": args.repeats,
+        "before": summary(before),
+        "after_first_sight": summary(after_first),
+        "after_repeats": summary(after_repeats),
+        "first_sight_clause_hits": first_pass["hits"] - warmed["hits"],
+        "first_sight_clause_misses": first_pass["misses"] - warmed["misses"],
+        "lexicon_clauses": lexicon_clauses,
+        "lexicon_warm_up_ms": round(warm_up_ms, 1),
+        "identical_phoneme_ids": identical,
+        "synthesis": summary(inference),
+        "front_end_share_before": round(statistics.mean(before) / statistics.mean(inference), 4),
+        "front_end_share_after_repeats": round(
+            statistics.mean(after_repeats) / statistics.mean(inference), 4
+        ),
+        "cache": cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
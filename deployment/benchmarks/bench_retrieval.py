@@ -0,0 +1,116 @@
+# python bench_retrieval.py --repeats 1000
+
+"""
+Latency of the agent's offline knowledge retrieval.
+
+Builds the knowledge index from uon_agent_albeee/knowledge/ into a temporary
+directory (or opens an existing one with --index), then reports the time to
+open it and microseconds per query (p50/p95/p99) for a set of visitor
+questions, along with how many of them the tool answers without falling back
+to web search. The index can be inflated with --synthetic passages to see
+how latency scales with corpus size.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from uon_agent_albeee import build_index  # noqa: E402
+from uon_agent_albeee.knowledge import KnowledgeIndex, Passage, write_index  # noqa: E402
+
+QUESTIONS = [
+    "What is the MSc Machine Learning in Science?",
+    "Is there an AI postgraduate course?",
+    "What are the tuition fees?",
+    "What are the entry requirements for physics?",
+    "Who are you?",
+    "Where is the School of Physics and Astronomy website?",
+    "Can I study astronomy at Nottingham?",
+    "What is the weather like in Paris?",
+]
+
+
+def local_passages() -> list[Passage]:
+    passages = []
+    for name in sorted(os.listdir(build_index.KNOWLEDGE_DIR)):
+        if name.endswith((".md", ".txt")) and name != "sources.txt":
+            path = os.path.join(build_index.KNOWLEDGE_DIR, name)
+            passages += build_index.split_passages(*build_index.read_document(path))
+    return passages
+
+
+def synthetic_passages(count: int, seed: int = 0) -> list[Passage]:
+    """Filler passages drawn from the local vocabulary, to grow the index."""
+    rng = random.Random(seed)
+    words = " ".join(p.text for p in local_passages()).split()
+    return [
+        Passage(f"Synthetic {i}", "", " ".join(rng.choice(words) for _ in range(100)))
+        for i in range(count)
+    ]
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index", help="Existing index directory (default: build one)")
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=1000)
+    parser.add_argument("--min-confidence", type=float, default=0.6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = args.index
+        results = {}
+        if not index_dir:
+            index_dir = tmp
+            passages = local_passages() + synthetic_passages(args.synthetic)
+            started = time.perf_counter()
+            write_index(index_dir, passages)
+            results["build_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        index = KnowledgeIndex(index_dir)
+        results["open_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        results["passages"] = index.passages
+        results["terms"] = len(index.terms)
+        results["bytes"] = sum(
+            os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)
+        )
+
+        latencies = []
+        for _ in range(args.repeats):
+            for question in QUESTIONS:
+                started = time.perf_counter()
+                index.search(question)
+                latencies.append((time.perf_counter() - started) * 1e6)
+
+        answered = {}
+        for question in QUESTIONS:
+            hits = index.search(question)
+            answered[question] = hits[0].confidence if hits else 0.0
+
+        results["query_us"] = {
+            "p50": round(statistics.median(latencies), 1),
+            "p95": round(percentile(latencies, 0.95), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+        }
+        results["answered_locally"] = sum(c >= args.min_confidence for c in answered.values())
+        results["questions"] = len(QUESTIONS)
+        results["top_confidence"] = answered
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# python bench_segmenter.py --chunk-chars 40 --chunks-per-second 20
+
+"""
+Sentence segmenter: corpus check and latency comparison.
+
+1. Runs data/segmenter_corpus.json through SentenceSegmenter and fails if any
+   case splits differently from the expected sentences.
+2. Replays sample answers as a simulated ADK stream (fixed-size chunks at a
+   fixed rate) through both the SentenceSegmenter and the original
+   "chunk ends with punctuation" rule, and reports when the first sentence is
+   released for synthesis, how long sentences get and the CPU cost per chunk.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "einstein_api"))
+
+from segmenter import SentenceSegmenter  # noqa: E402
+
+SAMPLE_ANSWERS = [
+    "Ah, a splendid question! The MSc Machine Learning in Science is run by the School of Physics and Astronomy. "
+    "It blends statistics, programming and real scientific data. Just a quick heads-up: course details may change, "
+    "so please check the University website for the latest info before you apply.",
+    "Tuition for home students is £9,535 per year, while international fees are higher. "
+    "Dr. Smith's group studies gravitational waves, e.g. from merging black holes, at roughly 3.5 times the sensitivity of older detectors.",
+    "I am afraid I don't know that one. Perhaps ask me about physics at Nottingham instead; there is plenty to discover!",
+    "Open days usually start at 10:00 and finish around 15:30. You can tour the labs, meet staff and students, "
+    "and even see the planetarium, which is a real treat for any budding astronomer.",
+]
+
+
+class LegacySegmenter:
+    """The rule sse_generator used before SentenceSegmenter."""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text_chunk: str) -> list[str]:
+        self._buffer += text_chunk
+        if any(text_chunk.endswith(p) for p in ".!?;:\n") and self._buffer.strip():
+            sentence, self._buffer = self._buffer, ""
+            return [sentence]
+        return []
+
+    def flush(self) -> str | None:
+        rest, self._buffer = self._buffer, ""
+        return rest if rest.strip() else None
+
+
+def check_corpus() -> int:
+    with open(os.path.join(HERE, "data", "segmenter_corpus.json"), encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    failures = 0
+    for case in corpus:
+        segmenter = SentenceSegmenter()
+        sentences = []
+        for chunk in case["chunks"]:
+            sentences += segmenter.feed(chunk)
+        rest = segmenter.flush()
+        if rest:
+            sentences.append(rest)
+        if sentences != case["expected"]:
+            failures += 1
+            print(f"FAIL {case['name']}: {sentences!r}", file=sys.stderr)
+    return failures
+
+
+def simulate(factory, answer: str, chunk_chars: int, chunks_per_second: float) -> dict:
+    chunks = [answer[i : i + chunk_chars] for i in range(0, len(answer), chunk_chars)]
+    interval = 1.0 / chunks_per_second
+
+    segmenter = factory()
+    first_sentence_s = None
+    sentences = []
+    cpu = 0.0
+    for index, chunk in enumerate(chunks):
+        started = time.perf_counter()
+        released = segmenter.feed(chunk)
+        cpu += time.perf_counter() - started
+        if released and first_sentence_s is None:
+            first_sentence_s = (index + 1) * interval
+        sentences += released
+
+    rest = segmenter.flush()
+    if rest:
+        sentences.append(rest)
+        if first_sentence_s is None:
+            first_sentence_s = len(chunks) * interval
+
+    return {
+        "first_sentence_s": first_sentence_s,
+        "first_sentence_chars": len(sentences[0]),
+        "sentences": len(sentences),
+        "max_sentence_chars": max(len(s) for s in sentences),
+        "cpu_us_per_chunk": cpu / len(chunks) * 1e6,
+    }
+
+
+def summarize(runs: list[dict]) -> dict:
+    return {
+        key: round(statistics.mean(run[key] for run in runs), 3)
+        for key in runs[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-chars", type=int, default=40, help="characters per ADK partial event")
+    parser.add_argument("--chunks-per-second", type=float, default=20.0)
+    args = parser.parse_args()
+
+    failures = check_corpus()
+    results = {
+        "corpus_failures": failures,
+        "chunk_chars": args.chunk_chars,
+        "chunks_per_second": args.chunks_per_second,
+    }
+    for name, factory in (("legacy", LegacySegmenter), ("segmenter", SentenceSegmenter)):
+        runs = [
+            simulate(factory, answer, args.chunk_chars, args.chunks_per_second)
+            for answer in SAMPLE_ANSWERS
+        ]
+        results[name] = summarize(runs)
+
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
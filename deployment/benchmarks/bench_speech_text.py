@@ -0,0 +1,118 @@
+# python bench_speech_text.py --repeats 200
+
+"""
+Speech text normalizer: golden check and throughput comparison.
+
+1. Runs data/speech_text_goldens.json through normalize_for_speech and fails
+   if any case differs from the expected output.
+2. Times normalize_for_speech against the original refactor_to_speech on
+   every sentence of the sample answers and on the golden inputs, and
+   reports microseconds per sentence and sentences per second for each.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "einstein_api"))
+
+from segmenter import SentenceSegmenter  # noqa: E402
+from speech_text import normalize_for_speech  # noqa: E402
+
+SAMPLE_ANSWERS = [
+    "Ah, a splendid question! The MSc Machine Learning in Science is run by the School of Physics and Astronomy. "
+    "It blends statistics, programming and real scientific data. Just a quick heads-up: course details may change, "
+    "so please check the University website for the latest info before you apply.",
+    "Tuition for home students is £9,535 per year, while **international** fees are £28,600. "
+    "Dr. Smith's group studies gravitational waves, e.g. from merging black holes, at roughly 3.5 times the sensitivity of older detectors.",
+    "Einstein's famous E=mc² tells us that a 1 kg mass holds about 9 × 10^16 J of energy. "
+    "Light covers 300,000 km every second, and I first wrote that down in 1905!",
+    "Open days run on 5th September 2025 from 10:00 until 15:30. You can tour the labs, meet staff and students, "
+    "and see the planetarium. Find out more at nottingham.ac.uk or email physics@nottingham.ac.uk.",
+]
+
+
+def refactor_to_speech(text):
+    """The normalizer main.py used before speech_text.py."""
+    # remove asterisks
+    text = text.replace("*", "")
+    # convert £ to pounds
+    pattern = r"(£)([\d,]+)"
+    replacement = r"\2 pounds"
+    text = re.sub(pattern, replacement, text)
+    # replace MSci to MSc
+    text = re.sub(r"msci", "MSc", text, flags=re.IGNORECASE)
+    # replacing physics formulas
+    text = re.sub(r'=mc²', r'= m c squared', text, flags=re.IGNORECASE)
+    text = re.sub(r'=mc', r'= m c', text, flags=re.IGNORECASE)
+    text = re.sub(r'²', r'squared', text, flags=re.IGNORECASE)
+    return text
+
+
+def load_goldens() -> list[dict]:
+    with open(os.path.join(HERE, "data", "speech_text_goldens.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_goldens(goldens: list[dict]) -> int:
+    failures = 0
+    for case in goldens:
+        output = normalize_for_speech(case["input"])
+        if output != case["expected"]:
+            failures += 1
+            print(f"FAIL {case['name']}: {output!r}", file=sys.stderr)
+    return failures
+
+
+def split_sentences(answer: str) -> list[str]:
+    segmenter = SentenceSegmenter()
+    sentences = segmenter.feed(answer)
+    rest = segmenter.flush()
+    return sentences + [rest] if rest else sentences
+
+
+def measure(normalize, sentences: list[str], repeats: int) -> dict:
+    per_pass = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for sentence in sentences:
+            normalize(sentence)
+        per_pass.append(time.perf_counter() - started)
+    mean_us = statistics.mean(per_pass) / len(sentences) * 1e6
+    return {
+        "us_per_sentence": round(mean_us, 2),
+        "sentences_per_s": round(1e6 / mean_us),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    goldens = load_goldens()
+    failures = check_goldens(goldens)
+
+    corpora = {
+        "answers": [s for answer in SAMPLE_ANSWERS for s in split_sentences(answer)],
+        "goldens": [case["input"] for case in goldens],
+    }
+    results = {"golden_cases": len(goldens), "golden_failures": failures}
+    for corpus, sentences in corpora.items():
+        results[corpus] = {
+            "sentences": len(sentences),
+            "legacy": measure(refactor_to_speech, sentences, args.repeats),
+            "speech_text": measure(normalize_for_speech, sentences, args.repeats),
+        }
+
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
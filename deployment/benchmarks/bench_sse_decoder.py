@@ -0,0 +1,120 @@
+# python bench_sse_decoder.py --events 20000 --text-size 24 --chunk-size 64 4096
+
+"""
+Micro-benchmark: SSEDecoder vs the original `buffer += chunk; split` loop.
+
+Builds a synthetic ADK `run_sse` response, feeds it to both parsers in
+fixed-size network chunks and reports the time per parser. The legacy loop
+copies the remaining buffer on every line, so the gap widens as bursts
+(bytes buffered between newlines) grow.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "einstein_api"))
+
+from sse_decoder import SSEDecoder  # noqa: E402
+
+
+def make_stream(n_events: int, text_size: int) -> bytes:
+    lines = []
+    for i in range(n_events):
+        text = f"token {i} of the answer ".ljust(text_size, "x")
+        event = {
+            "partial": True,
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "author": "albeee_einstein_uon_ambassador",
+        }
+        lines.append(f"data: {json.dumps(event)}\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def legacy_parse(chunks) -> int:
+    """The loop adk_sse_stream used before SSEDecoder."""
+    count = 0
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        while b"\n" in buffer:
+            line_bytes, buffer = buffer.split(b"\n", 1)
+            line = line_bytes.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if not data:
+                continue
+            json.loads(data)
+            count += 1
+    return count
+
+
+def decoder_parse(chunks) -> int:
+    count = 0
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        for event in decoder.feed(chunk):
+            json.loads(event.data)
+            count += 1
+    for event in decoder.flush():
+        json.loads(event.data)
+        count += 1
+    return count
+
+
+def bench(fn, data: bytes, chunk_size: int, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        chunks = list(chunked(data, chunk_size))
+        started = time.perf_counter()
+        count = fn(chunks)
+        best = min(best, time.perf_counter() - started)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument(
+        "--text-size", type=int, default=24,
+        help="characters of text per event (tool results and final answers are large)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--chunk-size", type=int, nargs="+", default=[64, 4096, 262144],
+        help="network chunk sizes in bytes (large chunks model bursty upstreams)",
+    )
+    args = parser.parse_args()
+
+    data = make_stream(args.events, args.text_size)
+    results = []
+    for chunk_size in args.chunk_size:
+        legacy_s, legacy_n = bench(legacy_parse, data, chunk_size, args.repeat)
+        decoder_s, decoder_n = bench(decoder_parse, data, chunk_size, args.repeat)
+        assert legacy_n == decoder_n == args.events, (legacy_n, decoder_n)
+        results.append(
+            {
+                "chunk_size": chunk_size,
+                "bytes": len(data),
+                "events": args.events,
+                "text_size": args.text_size,
+                "legacy_ms": round(legacy_s * 1000, 2),
+                "decoder_ms": round(decoder_s * 1000, 2),
+                "speedup": round(legacy_s / decoder_s, 2),
+            }
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# GOOGLE_API_KEY=... python bench_streamlit_runner.py --messages 5
+
+"""
+Streamlit front-end: per-message runner vs the persistent AgentRunner.
+
+Sends the same questions through both ways of calling the agent and reports
+per-message overhead (until the run is handed to ADK), time to first token
+and total time:
+
+- "per_message": what uon_albeee_einstein.py used to do, a new
+  InMemoryRunner under a new asyncio.run() loop for every message, waiting
+  for the final response;
+- "persistent": agent_runner.AgentRunner, created once, streaming partial
+  events from its background loop.
+
+This calls the real model, so it needs GOOGLE_API_KEY; the model's own
+latency dominates the totals and varies between runs.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from google.adk.runners import InMemoryRunner  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from agent_runner import AgentReply, AgentRunner  # noqa: E402
+from uon_agent_albeee.agent import root_agent  # noqa: E402
+
+QUESTIONS = [
+    "What is the MSc Machine Learning in Science?",
+    "Who are you?",
+    "What can I study in the School of Physics and Astronomy?",
+    "Tell me about the physics labs.",
+    "Is there a planetarium on campus?",
+]
+
+
+def per_message(prompt: str) -> dict:
+    started = time.perf_counter()
+    timings = {}
+
+    async def run():
+        runner = InMemoryRunner(agent=root_agent)
+        session = await runner.session_service.create_session(
+            app_name=runner.app_name, user_id="bench"
+        )
+        timings["overhead_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        message = types.Content(role="user", parts=[types.Part.from_text(text=prompt)])
+        async for event in runner.run_async(
+            user_id="bench", session_id=session.id, new_message=message
+        ):
+            if event.is_final_response() and event.content and event.content.parts:
+                return
+
+    asyncio.run(run())
+    # Nothing is shown before the final response
+    timings["first_token_ms"] = timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def persistent(runner: AgentRunner, session_id: str, prompt: str) -> dict:
+    reply = AgentReply()
+    for _ in runner.stream("bench", session_id, prompt, reply):
+        pass
+    return reply.timings.as_dict()
+
+
+def summarize(runs: list[dict]) -> dict:
+    return {
+        key: round(statistics.median(run[key] for run in runs if run[key] is not None), 1)
+        for key in ("overhead_ms", "first_token_ms", "total_ms")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=len(QUESTIONS))
+    args = parser.parse_args()
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.messages)]
+
+    started = time.perf_counter()
+    runner = AgentRunner(root_agent)
+    startup_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    results = {
+        "messages": len(questions),
+        "persistent_startup_ms": startup_ms,
+        "per_message": summarize([per_message(q) for q in questions]),
+        "persistent": summarize([persistent(runner, uuid.uuid4().hex, q) for q in questions]),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# python bench_tts_batching.py --sessions 8 --batch 1 4 8
+
+"""
+Throughput benchmark: per-sentence vs micro-batched Piper synthesis.
+
+Simulates `--sessions` concurrent answers, each synthesising the sample
+sentences in order (the first with priority, as the API does). For every
+`--batch` size it reports the total wall time, sentences per second, the
+mean and p95 time to first audio per answer and the real-time factor.
+The PCM cache is disabled so every sentence is really synthesised.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(__file__)
+API_DIR = os.path.join(HERE, "..", "einstein_api")
+sys.path.insert(0, API_DIR)
+
+from tts_engine import TTSEngine, load_voice  # noqa: E402
+
+SENTENCES = [
+    "Ah, a splendid question!",
+    "The MSc Machine Learning in Science is run by the School of Physics and Astronomy.",
+    "It blends statistics, programming and real scientific data.",
+    "Just a quick heads-up: course details may change, so please check the University website.",
+    "Open days usually start at ten and finish around half past three.",
+]
+
+
+async def answer(engine: TTSEngine, session: int) -> float:
+    started = time.perf_counter()
+    first_audio = None
+    for index, sentence in enumerate(SENTENCES):
+        # Vary the text per session so nothing is shared between answers
+        await engine.synthesize(f"{sentence} ({session})" if index else sentence, index == 0)
+        if first_audio is None:
+            first_audio = time.perf_counter() - started
+    return first_audio
+
+
+async def run(voice, sessions: int, workers: int, batch: int) -> dict:
+    engine = TTSEngine(voice, max_workers=workers, max_queue=sessions * len(SENTENCES), max_batch=batch)
+    started = time.perf_counter()
+    first_audio = await asyncio.gather(*(answer(engine, i) for i in range(sessions)))
+    wall_s = time.perf_counter() - started
+    stats = engine.stats()
+    engine.shutdown()
+
+    first_audio.sort()
+    return {
+        "batch": batch,
+        "wall_s": round(wall_s, 3),
+        "sentences_per_s": round(sessions * len(SENTENCES) / wall_s, 2),
+        "first_audio_mean_s": round(statistics.mean(first_audio), 3),
+        "first_audio_p95_s": round(first_audio[max(0, int(len(first_audio) * 0.95) - 1)], 3),
+        "rtf": stats["rtf"],
+        "avg_batch_size": stats["avg_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--model", default=os.path.join(API_DIR, "piper_model", "en_GB-alaneinstein-medium.onnx")
+    )
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent answers")
+    parser.add_argument("--workers", type=int, default=1, help="synthesis workers")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads")
+    args = parser.parse_args()
+
+    voice = load_voice(args.model, intra_op_threads=args.threads)
+    # Warm up so the first configuration does not pay for session initialisation
+    list(voice.synthesize(SENTENCES[0]))
+
+    results = [asyncio.run(run(voice, args.sessions, args.workers, b)) for b in args.batch]
+    print(json.dumps({"sessions": args.sessions, "workers": args.workers, "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# python fake_adk.py --port 8965 --tokens-per-second 40 --first-token-ms 600
+
+"""
+Local stand-in for the ADK api_server, for load tests without Gemini.
+
+Implements the endpoints einstein_api uses (create, get, update and delete
+session, and `run_sse`) and replays recorded `run_sse` event streams from
+data/adk_recordings.json. The recording whose prompt matches the request is
+used, otherwise one is picked by hashing the prompt, so the same question
+always gets the same answer. Partial text events are paced at
+`--tokens-per-second` (one token per word) after a `--first-token-ms` delay
+that stands in for model latency; tool events cost `--tool-ms` each.
+
+Recording format: [{"prompt": "...", "events": [<ADK event JSON>, ...]}]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+HERE = os.path.dirname(__file__)
+
+
+def load_recordings(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pick_recording(recordings: list[dict], prompt: str) -> dict:
+    for recording in recordings:
+        if recording["prompt"].lower() == prompt.lower():
+            return recording
+    return recordings[zlib.crc32(prompt.encode("utf-8")) % len(recordings)]
+
+
+def event_delay(event: dict, tokens_per_second: float, tool_s: float) -> float:
+    """Seconds to wait before sending `event`."""
+    parts = (event.get("content") or {}).get("parts") or []
+    if any("functionCall" in part or "functionResponse" in part for part in parts):
+        return tool_s
+    if not event.get("partial"):
+        # The final, complete text follows the last partial immediately
+        return 0.0
+    tokens = sum(len(part.get("text", "").split()) for part in parts)
+    return tokens / tokens_per_second if tokens_per_second > 0 else 0.0
+
+
+def create_app(
+    recordings: list[dict],
+    tokens_per_second: float = 40.0,
+    first_token_s: float = 0.6,
+    tool_s: float = 0.4,
+) -> FastAPI:
+    app = FastAPI(title="Fake ADK api_server")
+    sessions: dict[tuple[str, str, str], dict] = {}
+    stats = {"runs": 0, "active": 0, "peak_active": 0}
+
+    def append_event(session: dict, event: dict, state_delta: dict | None = None):
+        session["events"].append(event)
+        session["state"].update(state_delta or {})
+        session["lastUpdateTime"] = time.time()
+
+    @app.post("/apps/{app_name}/users/{uid}/sessions/{sid}")
+    async def create_session(app_name: str, uid: str, sid: str):
+        if (app_name, uid, sid) in sessions:
+            raise HTTPException(status_code=409, detail=f"Session already exists: {sid}")
+        session = {"id": sid, "appName": app_name, "userId": uid, "state": {}, "events": [], "lastUpdateTime": time.time()}
+        sessions[(app_name, uid, sid)] = session
+        return session
+
+    @app.get("/apps/{app_name}/users/{uid}/sessions/{sid}")
+    async def get_session(app_name: str, uid: str, sid: str):
+        if (app_name, uid, sid) not in sessions:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return sessions[(app_name, uid, sid)]
+
+    @app.patch("/apps/{app_name}/users/{uid}/sessions/{sid}")
+    async def update_session(app_name: str, uid: str, sid: str, request: Request):
+        session = sessions.get((app_name, uid, sid))
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        body = await request.json()
+        append_event(session, {"author": "user"}, body.get("stateDelta") or body.get("state_delta"))
+        return session
+
+    @app.delete("/apps/{app_name}/users/{uid}/sessions/{sid}")
+    async def delete_session(app_name: str, uid: str, sid: str):
+        sessions.pop((app_name, uid, sid), None)
+        return {}
+
+    @app.post("/run_sse")
+    async def run_sse(request: Request):
+        body = await request.json()
+        session = sessions.get((body.get("appName"), body.get("userId"), body.get("sessionId")))
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        message = body.get("newMessage", {})
+        parts = message.get("parts") or [{}]
+        recording = pick_recording(recordings, parts[0].get("text", ""))
+        append_event(session, {"author": "user", "content": message}, body.get("stateDelta"))
+
+        async def replay():
+            stats["runs"] += 1
+            stats["active"] += 1
+            stats["peak_active"] = max(stats["peak_active"], stats["active"])
+            try:
+                await asyncio.sleep(first_token_s)
+                for event in recording["events"]:
+                    delay = event_delay(event, tokens_per_second, tool_s)
+                    if delay:
+                        await asyncio.sleep(delay)
+                    if not event.get("partial"):
+                        append_event(session, event)
+                    yield f"data: {json.dumps(event)}\n\n"
+            finally:
+                stats["active"] -= 1
+
+        return StreamingResponse(replay(), media_type="text/event-stream")
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        return {**stats, "sessions": len(sessions)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8965)
+    parser.add_argument(
+        "--recordings", default=os.path.join(HERE, "data", "adk_recordings.json")
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--first-token-ms", type=float, default=600.0)
+    parser.add_argument("--tool-ms", type=float, default=400.0)
+    args = parser.parse_args()
+
+    app = create_app(
+        load_recordings(args.recordings),
+        tokens_per_second=args.tokens_per_second,
+        first_token_s=args.first_token_ms / 1000,
+        tool_s=args.tool_ms / 1000,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# python load_test.py --sessions 20 --turns 3 --mode ask --output run.json --baseline last.json
+
+"""
+Load test: N concurrent visitor sessions against a running einstein_api.
+
+Each session calls /init, then asks `--turns` questions through /ask (or
+uploads `--audio` through /speak) and reads the SSE stream to the end.
+Reported as JSON: time to first text (TTFT), time to first audio (TTFA),
+total answer time and /init latency as p50/p95/p99, answers per second, and
+Piper's real-time factor over the run (from /tts/status).
+
+Run against fake_adk.py to measure the backend alone:
+
+    python fake_adk.py &
+    (cd ../einstein_api && uvicorn main:app --port 8964) &
+    python load_test.py --sessions 20
+
+With `--baseline` the p95 latencies and throughput are compared against an
+earlier report and the script exits non-zero on a regression beyond
+`--tolerance`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+HERE = os.path.dirname(__file__)
+
+LATENCY_METRICS = ("init_ms", "ttft_ms", "ttfa_ms", "total_ms")
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(values: list[float]) -> dict | None:
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "mean": round(statistics.mean(values), 1),
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(max(values), 1),
+    }
+
+
+async def read_answer(response: httpx.Response, started: float) -> dict:
+    """Consume one SSE answer and time its milestones."""
+    result = {"ttft_ms": None, "ttfa_ms": None, "audio_bytes": 0, "error": None, "cached": False}
+    sample_rate, audio_format = 22050, "pcm"
+
+    async for line in response.aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        event = json.loads(line[6:])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if event["type"] == "header":
+            sample_rate = event.get("sampleRate", sample_rate)
+            audio_format = event.get("format", audio_format)
+        elif event["type"] == "text" and result["ttft_ms"] is None:
+            result["ttft_ms"] = elapsed_ms
+        elif event["type"] == "audio":
+            if result["ttfa_ms"] is None:
+                result["ttfa_ms"] = elapsed_ms
+            result["audio_bytes"] += len(event["audio"]) // 2
+        elif event["type"] == "error":
+            result["error"] = event.get("message")
+        elif event["type"] == "done":
+            result["cached"] = bool(event.get("cached"))
+
+    result["total_ms"] = (time.perf_counter() - started) * 1000
+    # Playback length is only known without decoding for raw PCM
+    result["audio_s"] = result["audio_bytes"] / 2 / sample_rate if audio_format == "pcm" else 0.0
+    return result
+
+
+async def run_session(client: httpx.AsyncClient, args, prompts: list[str], index: int) -> list[dict]:
+    uid, sid = f"load-{index}", uuid.uuid4().hex
+    results = []
+
+    started = time.perf_counter()
+    response = await client.get(f"/uid/{uid}/sid/{sid}/init")
+    init_ms = (time.perf_counter() - started) * 1000
+    if response.status_code >= 400:
+        return [{"status": response.status_code, "init_ms": init_ms, "error": "init failed"}]
+
+    for turn in range(args.turns):
+        prompt = prompts[(index + turn) % len(prompts)]
+        if args.mode == "speak":
+            with open(args.audio, "rb") as f:
+                audio = f.read()
+            request = client.build_request(
+                "POST",
+                f"/uid/{uid}/sid/{sid}/speak",
+                params={"format": args.format},
+                files={"audio": (os.path.basename(args.audio), audio)},
+            )
+        else:
+            request = client.build_request(
+                "POST",
+                f"/uid/{uid}/sid/{sid}/ask",
+                params={"format": args.format},
+                json={"prompt": prompt},
+            )
+
+        started = time.perf_counter()
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            results.append({"status": None, "error": str(e)})
+            continue
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                results.append({"status": response.status_code, "error": response.text})
+                continue
+            result = await read_answer(response, started)
+        finally:
+            await response.aclose()
+
+        result["status"] = 200
+        if turn == 0:
+            result["init_ms"] = init_ms
+        results.append(result)
+
+    await client.get(f"/uid/{uid}/sid/{sid}/delete")
+    return results
+
+
+async def tts_status(client: httpx.AsyncClient) -> dict:
+    try:
+        return (await client.get("/tts/status")).json()
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+async def run(args, prompts: list[str]) -> dict:
+    limits = httpx.Limits(max_connections=args.sessions * 2, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        tts_before = await tts_status(client)
+        started = time.perf_counter()
+        sessions = await asyncio.gather(
+            *(run_session(client, args, prompts, i) for i in range(args.sessions))
+        )
+        wall_s = time.perf_counter() - started
+        tts_after = await tts_status(client)
+
+    results = [result for session in sessions for result in session]
+    answered = [r for r in results if r.get("status") == 200 and not r.get("error")]
+
+    report = {
+        "config": {
+            "base_url": args.base_url,
+            "mode": args.mode,
+            "format": args.format,
+            "sessions": args.sessions,
+            "turns": args.turns,
+        },
+        "requests": len(results),
+        "answered": len(answered),
+        "cached": sum(r["cached"] for r in answered),
+        "errors": len(results) - len(answered),
+        "rejected": sum(r.get("status") in (429, 503) for r in results),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(answered) / wall_s, 3) if wall_s else None,
+        "audio_s": round(sum(r["audio_s"] for r in answered), 3),
+    }
+    for metric in LATENCY_METRICS:
+        report[metric] = summarize([r[metric] for r in answered if r.get(metric) is not None])
+
+    # Piper real-time factor over this run only: synthesis wall time / audio produced
+    synthesis_s = tts_after.get("synthesis_s", 0) - tts_before.get("synthesis_s", 0)
+    audio_s = tts_after.get("audio_s", 0) - tts_before.get("audio_s", 0)
+    report["tts"] = {
+        "synthesis_s": round(synthesis_s, 3),
+        "audio_s": round(audio_s, 3),
+        "rtf": round(synthesis_s / audio_s, 3) if audio_s > 0 else None,
+        "rejected": tts_after.get("rejected", 0) - tts_before.get("rejected", 0),
+    }
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe every metric that got worse than `baseline` by more than `tolerance`."""
+    regressions = []
+    for metric in LATENCY_METRICS:
+        now, before = report.get(metric), baseline.get(metric)
+        if now and before and now["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{metric} p95 {before['p95']} -> {now['p95']} ms")
+
+    now, before = report.get("throughput_rps"), baseline.get("throughput_rps")
+    if now is not None and before and now < before * (1 - tolerance):
+        regressions.append(f"throughput {before} -> {now} answers/s")
+
+    now, before = report["tts"].get("rtf"), (baseline.get("tts") or {}).get("rtf")
+    if now is not None and before and now > before * (1 + tolerance):
+        regressions.append(f"tts rtf {before} -> {now}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8964")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent visitor sessions")
+    parser.add_argument("--turns", type=int, default=2, help="questions per session")
+    parser.add_argument("--mode", choices=("ask", "speak"), default="ask")
+    parser.add_argument("--audio", help="recording to upload in speak mode")
+    parser.add_argument("--format", default="pcm", help="audio format requested from the API")
+    parser.add_argument(
+        "--prompts",
+        default=os.path.join(HERE, "data", "adk_recordings.json"),
+        help="JSON list of prompts, or of recordings with a `prompt` field",
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.mode == "speak" and not args.audio:
+        parser.error("--audio is required in speak mode")
+
+    with open(args.prompts, encoding="utf-8") as f:
+        prompts = [p["prompt"] if isinstance(p, dict) else p for p in json.load(f)]
+
+    report = asyncio.run(run(args, prompts))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
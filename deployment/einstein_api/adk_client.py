@@ -0,0 +1,242 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass
+class ADKChunk:
+    """
+    One item surfaced from an ADK `run_sse` event.
+
+    kind is "text" (partial model text), "final" (the complete, non-partial
+    model text), "tool_call", "tool_result" or "error".
+    """
+
+    kind: str
+    text: str = ""
+    data: dict = field(default_factory=dict)
+
+
+def parse_adk_event(event: dict) -> list[ADKChunk]:
+    """Split one decoded ADK event into the chunks callers care about."""
+    if event.get("errorMessage") or event.get("errorCode"):
+        return [ADKChunk("error", event.get("errorMessage") or event["errorCode"])]
+
+    content = event.get("content") or {}
+    partial = bool(event.get("partial"))
+    chunks = []
+
+    for part in content.get("parts") or []:
+        if "functionCall" in part:
+            call = part["functionCall"]
+            chunks.append(
+                ADKChunk("tool_call", call.get("name", ""), {"args": call.get("args", {})})
+            )
+        elif "functionResponse" in part:
+            chunks.append(ADKChunk("tool_result", part["functionResponse"].get("name", "")))
+        elif part.get("text") and not part.get("thought"):
+            chunks.append(ADKChunk("text" if partial else "final", part["text"]))
+    return chunks
+
+
+class UpstreamStats:
+    """Latency and error counters for one kind of upstream call."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms: float, error: bool = False):
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 2),
+            "last_ms": round(self.last_ms, 2),
+        }
+
+
+class ADKClient:
+    """
+    Application-scoped, keep-alive HTTP client for the ADK api_server.
+
+    One connection pool is shared by every request in the worker; call
+    `start()` / `aclose()` from the app lifespan. Each call is timed per
+    operation and the pool reports how often it ran out of connections.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        stream_read_timeout: float = 120.0,
+        pool_timeout: float = 10.0,
+        http2: bool = True,
+    ):
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=pool_timeout,
+        )
+        # Model answers with a live web search can pause for a long time
+        # between events, so streams get a longer read timeout.
+        self.stream_timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=stream_read_timeout,
+            write=read_timeout,
+            pool=pool_timeout,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+
+        self._client: httpx.AsyncClient | None = None
+        self._stats: dict[str, UpstreamStats] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated_waits = 0
+        self.pool_timeouts = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Outside the lifespan (e.g. scripts), create the pool lazily.
+            self.start()
+        return self._client
+
+    def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+            )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def warm_up(self, connections: int = 2, path: str = "/list-apps") -> int:
+        """
+        Open up to `connections` pooled connections ahead of the first
+        answer with cheap concurrent requests. Returns how many succeeded;
+        over HTTP/2 they share one connection.
+        """
+        results = await asyncio.gather(
+            *(self.request("warm_up", "GET", path) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if len(errors) == len(results) and errors:
+            raise errors[0]
+        return len(results) - len(errors)
+
+    def _enter(self):
+        if self.in_flight >= self.limits.max_connections:
+            self.saturated_waits += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _record(self, operation: str, started: float, error: bool):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stats.setdefault(operation, UpstreamStats()).record(elapsed_ms, error)
+
+    async def request(self, operation: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        self._enter()
+        error = True
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            error = response.is_server_error
+            return response
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._record(operation, started, error)
+
+    @asynccontextmanager
+    async def stream(self, operation: str, method: str, url: str, **kwargs):
+        """
+        Stream a response. The recorded latency is the time to response
+        headers, i.e. connect plus the upstream's time to first byte.
+        """
+        started = time.perf_counter()
+        self._enter()
+        recorded = False
+        try:
+            async with self.client.stream(
+                method, url, timeout=self.stream_timeout, **kwargs
+            ) as response:
+                self._record(operation, started, response.is_server_error)
+                recorded = True
+                yield response
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            raise
+        finally:
+            # The connection stays checked out until the stream is closed
+            self.in_flight -= 1
+            if not recorded:
+                self._record(operation, started, True)
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "saturated_waits": self.saturated_waits,
+            "pool_timeouts": self.pool_timeouts,
+            "upstream": {op: s.as_dict() for op, s in self._stats.items()},
+        }
+
+
+def client_from_env(base_url: str) -> ADKClient:
+    """Build an ADKClient configured by the ADK_* environment variables."""
+    return ADKClient(
+        base_url,
+        max_connections=int(os.environ.get("ADK_MAX_CONNECTIONS", "32")),
+        max_keepalive_connections=int(os.environ.get("ADK_MAX_KEEPALIVE", "16")),
+        keepalive_expiry=float(os.environ.get("ADK_KEEPALIVE_EXPIRY", "30")),
+        connect_timeout=float(os.environ.get("ADK_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.environ.get("ADK_READ_TIMEOUT", "30")),
+        stream_read_timeout=float(os.environ.get("ADK_STREAM_READ_TIMEOUT", "120")),
+        pool_timeout=float(os.environ.get("ADK_POOL_TIMEOUT", "10")),
+        http2=os.environ.get("ADK_HTTP2", "1") == "1",
+    )
@@ -0,0 +1,235 @@
+"""
+Admission control for answer-producing requests.
+
+Every answer costs a Gemini call and a stream of Piper synthesis, so only
+`max_in_flight` answers are produced at once. Requests beyond that wait in a
+bounded FIFO queue and are told their position; when the queue is full, or
+the expected wait would exceed `max_wait_s`, they are turned away at once
+with a 429 rather than slowing every stream down. Each session also has a
+token bucket so one visitor cannot monopolise the queue.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token. Returns 0 on success, else the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Ticket:
+    """One request's place in the admission queue; release it when the answer ends."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._changed = asyncio.Event()
+        self.created = time.monotonic()
+        self.granted_at: float | None = None
+        self.released = False
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+    @property
+    def position(self) -> int:
+        """1-based place in the wait queue, 0 once admitted."""
+        if self.granted:
+            return 0
+        return self._controller._waiting.index(self) + 1
+
+    def _grant(self):
+        self.granted_at = time.monotonic()
+        ADMISSION_WAIT.observe(self.granted_at - self.created)
+        self._changed.set()
+
+    async def wait(self) -> AsyncIterator[int]:
+        """
+        Yield the queue position whenever it changes, until admitted.
+        Raises AdmissionRejected if the wait exceeds the controller's budget.
+        """
+        deadline = self.created + self._controller.max_wait_s
+        while not self.granted:
+            yield self.position
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                if self.granted:
+                    break
+                self.release()
+                ADMISSION_REJECTED.inc(reason="timeout")
+                self._controller.timeouts += 1
+                raise AdmissionRejected(
+                    "Einstein is busy talking to other visitors, please try again shortly.",
+                    self._controller.retry_after(),
+                )
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._controller._release(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        max_wait_s: float = 20.0,
+        session_rate: float = 0.2,
+        session_burst: float = 3,
+        max_sessions: int = 10000,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.max_sessions = max_sessions
+
+        self.in_flight = 0
+        self._waiting: deque[Ticket] = deque()
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+        # Moving average of how long an admitted answer holds its slot
+        self._service_s = 5.0
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.timeouts = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def expected_wait(self, position: int) -> float:
+        """Estimated seconds until the request at `position` in the queue is admitted."""
+        return position * self._service_s / self.max_in_flight
+
+    def retry_after(self) -> float:
+        return max(1.0, self.expected_wait(len(self._waiting) + 1))
+
+    def _bucket(self, uid: str, sid: str) -> TokenBucket:
+        key = (uid, sid)
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = TokenBucket(self.session_rate, self.session_burst)
+        self._buckets[key] = bucket
+        while len(self._buckets) > self.max_sessions:
+            self._buckets.popitem(last=False)
+        return bucket
+
+    def admit(self, uid: str, sid: str) -> Ticket:
+        """
+        Take a place for a new answer, admitted at once or queued.
+        Raises AdmissionRejected straight away when the request cannot be served in time.
+        """
+        wait = self._bucket(uid, sid).take()
+        if wait:
+            self.rate_limited += 1
+            ADMISSION_REJECTED.inc(reason="rate_limited")
+            raise AdmissionRejected("You are asking questions too quickly, please slow down.", wait)
+
+        ticket = Ticket(self)
+        if self.in_flight < self.max_in_flight and not self._waiting:
+            self.in_flight += 1
+            ticket._grant()
+        elif (
+            len(self._waiting) >= self.max_queue
+            or self.expected_wait(len(self._waiting) + 1) > self.max_wait_s
+        ):
+            self.overloaded += 1
+            ADMISSION_REJECTED.inc(reason="overloaded")
+            raise AdmissionRejected(
+                "Einstein is busy talking to other visitors, please try again shortly.",
+                self.retry_after(),
+            )
+        else:
+            self._waiting.append(ticket)
+
+        self.admitted += 1
+        self._update_gauges()
+        return ticket
+
+    def _release(self, ticket: Ticket):
+        if ticket.granted:
+            self.in_flight -= 1
+            held = time.monotonic() - ticket.granted_at
+            self._service_s = 0.8 * self._service_s + 0.2 * held
+        else:
+            self._waiting.remove(ticket)
+
+        while self.in_flight < self.max_in_flight and self._waiting:
+            self.in_flight += 1
+            self._waiting.popleft()._grant()
+        # Everyone still waiting has moved up
+        for waiting in self._waiting:
+            waiting._changed.set()
+        self._update_gauges()
+
+    def _update_gauges(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUED.set(len(self._waiting))
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait_s,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiting),
+            "avg_service_s": round(self._service_s, 3),
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "overloaded": self.overloaded,
+            "timeouts": self.timeouts,
+            "sessions": len(self._buckets),
+        }
+
+
+def admission_from_env() -> AdmissionController:
+    """
+    Build the controller from ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_S, SESSION_QUESTIONS_PER_MIN and SESSION_BURST.
+    """
+    return AdmissionController(
+        max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "8")),
+        max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", "32")),
+        max_wait_s=float(os.environ.get("ADMISSION_MAX_WAIT_S", "20")),
+        session_rate=float(os.environ.get("SESSION_QUESTIONS_PER_MIN", "12")) / 60,
+        session_burst=float(os.environ.get("SESSION_BURST", "3")),
+    )
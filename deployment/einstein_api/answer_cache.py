@@ -0,0 +1,234 @@
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+# ADK session state written when a session's first question is answered from
+# the cache; the agent's instruction (agent.py) reads CACHED_EXCHANGE_STATE
+CACHED_ANSWER_STATE = "einstein_cached_answer"
+CACHED_EXCHANGE_STATE = "cached_exchange"
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form of a visitor question: case, punctuation and spacing removed."""
+    prompt = unicodedata.normalize("NFKC", prompt).lower()
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", prompt)).strip()
+
+
+def trigram_vector(normalized: str) -> tuple[Counter, float]:
+    """Character-trigram counts of a normalized prompt and their norm."""
+    padded = f"  {normalized} "
+    counts = Counter(padded[i : i + 3] for i in range(len(padded) - 2))
+    return counts, math.sqrt(sum(c * c for c in counts.values()))
+
+
+def cosine(a: tuple[Counter, float], b: tuple[Counter, float]) -> float:
+    (counts_a, norm_a), (counts_b, norm_b) = a, b
+    if not norm_a or not norm_b:
+        return 0.0
+    if len(counts_a) > len(counts_b):
+        counts_a, counts_b = counts_b, counts_a
+    dot = sum(c * counts_b.get(gram, 0) for gram, c in counts_a.items())
+    return dot / (norm_a * norm_b)
+
+
+def session_turns(session: dict) -> int:
+    """
+    Questions asked so far in an ADK session (a get_session payload): user
+    messages the agent saw, plus a first question answered from the cache.
+    """
+    asked = sum(1 for event in session.get("events") or [] if event.get("author") == "user" and event.get("content"))
+    return asked + int(bool((session.get("state") or {}).get(CACHED_ANSWER_STATE)))
+
+
+def cached_exchange_note(prompt: str, answer: str) -> str:
+    """The cached exchange as the agent's instruction sees it."""
+    return (
+        f"Earlier in this conversation the visitor asked: \"{prompt}\" "
+        f"and you answered: \"{answer}\""
+    )
+
+
+@dataclass
+class CachedAnswer:
+    prompt: str
+    audio_format: str
+    events: list[dict]
+    text: str
+    created: float
+    size: int
+    vector: tuple[Counter, float] = field(repr=False, default=None)
+    hits: int = 0
+
+
+class AnswerCache:
+    """
+    Complete answers to first questions, replayed without calling ADK.
+
+    An entry holds every text and audio event of one live answer in a given
+    audio format, so a hit replays exactly what the visitor would have heard.
+    Lookups match the normalized prompt; with `similarity` set, the closest
+    earlier prompt by character-trigram cosine also counts when it scores at
+    least that high. Entries expire after `ttl_s` and the store is an LRU
+    bounded by total audio bytes.
+
+    Only a session's first turn is served from or stored in the cache: later
+    answers depend on the conversation so far. Whether a turn is the first is
+    decided from the ADK session, which every worker shares (see
+    `answered_before`); the turn count kept here only spares that lookup for
+    sessions this worker has already answered in.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 128 * 1024 * 1024,
+        ttl_s: float = 3600.0,
+        similarity: float = 0.0,
+        max_sessions: int = 10000,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self.max_sessions = max_sessions
+
+        self._entries: OrderedDict[tuple[str, str], CachedAnswer] = OrderedDict()
+        self._bytes = 0
+        # (uid, sid) -> turns started on this worker
+        self._sessions: OrderedDict[tuple[str, str], int] = OrderedDict()
+
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expired = 0
+        self.evictions = 0
+
+    # ── session context rules ────────────
+    def start_turn(self, uid: str, sid: str) -> bool:
+        """Count a new turn for the session; True if it is the first one this worker has seen."""
+        key = (uid, sid)
+        turns = self._sessions.pop(key, 0)
+        self._sessions[key] = turns + 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return turns == 0
+
+    def forget_session(self, uid: str, sid: str):
+        self._sessions.pop((uid, sid), None)
+
+    # ── answers ──────────────────────────
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created > self.ttl_s
+
+    def _drop(self, key: tuple[str, str]):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def lookup(self, prompt: str, audio_format: str) -> CachedAnswer | None:
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+        key = (audio_format, normalized)
+
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            self._drop(key)
+            self.expired += 1
+            entry = None
+
+        if entry is None and self.similarity > 0:
+            key, entry = self._closest(normalized, audio_format, now)
+            if entry is not None:
+                self.similar_hits += 1
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        return entry
+
+    def _closest(self, normalized: str, audio_format: str, now: float):
+        vector = trigram_vector(normalized)
+        best_key, best, best_score = None, None, self.similarity
+        for key, entry in list(self._entries.items()):
+            if self._expired(entry, now):
+                self._drop(key)
+                self.expired += 1
+                continue
+            if key[0] != audio_format:
+                continue
+            score = cosine(vector, entry.vector)
+            if score >= best_score:
+                best_key, best, best_score = key, entry, score
+        return best_key, best
+
+    def store(self, prompt: str, audio_format: str, events: list[dict]):
+        """Keep a completed answer; `events` are the text and audio events in order."""
+        normalized = normalize_prompt(prompt)
+        if not normalized:
+            return
+        text = "".join(e["content"] for e in events if e["type"] == "text")
+        if not text.strip():
+            return
+        size = sum(len(e.get("audio") or b"") for e in events) + len(text)
+        if size > self.max_bytes:
+            return
+
+        key = (audio_format, normalized)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = CachedAnswer(
+            prompt=prompt,
+            audio_format=audio_format,
+            events=events,
+            text=text,
+            created=time.time(),
+            size=size,
+            vector=trigram_vector(normalized),
+        )
+        self._bytes += size
+        self.stores += 1
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            "similarity": self.similarity,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "sessions": len(self._sessions),
+        }
+
+
+def answer_cache_from_env() -> AnswerCache | None:
+    """
+    Build the answer cache from ANSWER_CACHE_MAX_MB (0 disables it),
+    ANSWER_CACHE_TTL_S and ANSWER_CACHE_SIMILARITY (0 = exact prompts only).
+    """
+    max_mb = float(os.environ.get("ANSWER_CACHE_MAX_MB", "128"))
+    if max_mb <= 0:
+        return None
+    return AnswerCache(
+        max_bytes=int(max_mb * 1024 * 1024),
+        ttl_s=float(os.environ.get("ANSWER_CACHE_TTL_S", "3600")),
+        similarity=float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0")),
+    )
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
+
+# format -> (MIME type, ffmpeg output arguments). "pcm" is passed through as
+# raw int16 samples. Bitrates are tuned for speech over campus Wi-Fi.
+AUDIO_FORMATS = {
+    "pcm": ("audio/L16", None),
+    "opus": (
+        "audio/ogg; codecs=opus",
+        ["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-ar", "24000", "-f", "ogg"],
+    ),
+    "mp3": (
+        "audio/mpeg",
+        ["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"],
+    ),
+}
+
+
+class AudioEncodingError(RuntimeError):
+    """Raised when ffmpeg fails to encode a sentence."""
+
+
+async def encode_sentence(pcm: bytes, audio_format: str, sample_rate: int) -> bytes:
+    """
+    Encode one sentence of int16 mono PCM to `audio_format`.
+
+    Every sentence becomes a self-contained OGG/MP3 segment, so the client can
+    decode and play it as soon as it arrives, exactly like the raw PCM chunks.
+    """
+    _, output_args = AUDIO_FORMATS[audio_format]
+    if output_args is None:
+        return pcm
+
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_PATH,
+        "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        *output_args,
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        encoded, errors = await process.communicate(pcm)
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+
+    if process.returncode != 0:
+        raise AudioEncodingError(
+            f"ffmpeg failed to encode {audio_format}: {errors.decode(errors='replace').strip()}"
+        )
+    return encoded
@@ -0,0 +1,152 @@
+"""
+Packed store of pre-rendered sentences, written by prerender.py.
+
+One file holds every sentence's int16 PCM back to back behind a JSON index:
+
+    magic "EINSTPCM" | version (u32 LE) | index length (u32 LE) | index JSON
+    | padding to a page boundary | PCM data
+
+The index maps each sentence (normalized as in tts_cache.normalize_text) to
+the offset and length of its PCM, and records the model fingerprint and
+sample rate it was rendered with. The API maps the file read-only and hands
+out memoryview slices of the mapping, so serving a sentence copies nothing
+and every worker process shares the same pages through the page cache.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Iterable
+
+from metrics import logger
+from tts_cache import model_fingerprint, normalize_text
+
+MAGIC = b"EINSTPCM"
+VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_PAGE = mmap.ALLOCATIONGRANULARITY
+
+
+class AudioStore:
+    def __init__(self, path: str, model_id: str | None = None):
+        """
+        Map the store at `path`. With `model_id`, a store rendered by a
+        different voice or with different inference parameters is refused.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} audio store")
+        index = json.loads(self._mmap[_HEADER.size : _HEADER.size + index_length])
+        if model_id is not None and index["model"] != model_id:
+            raise ValueError(f"{path} was rendered with a different voice or inference parameters")
+
+        self.path = path
+        self.model_id = index["model"]
+        self.sample_rate = index["sample_rate"]
+        self.created = index.get("created")
+        self._data_start = index["data_start"]
+        self._entries: dict[str, tuple[int, int]] = {
+            text: (offset, length) for text, (offset, length) in index["entries"].items()
+        }
+        self._view = memoryview(self._mmap)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, text: str) -> bool:
+        return normalize_text(text) in self._entries
+
+    def texts(self) -> list[str]:
+        return list(self._entries)
+
+    def get(self, text: str) -> memoryview | None:
+        """The sentence's PCM as a view into the mapping, or None if it was not pre-rendered."""
+        entry = self._entries.get(normalize_text(text))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        start = self._data_start + entry[0]
+        return self._view[start : start + entry[1]]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "sentences": len(self._entries),
+            "bytes": len(self._mmap),
+            "audio_s": round(sum(length for _, length in self._entries.values()) / 2 / self.sample_rate, 1),
+            "created": self.created,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def write_store(path: str, model_id: str, sample_rate: int, sentences: Iterable[tuple[str, bytes]]):
+    """
+    Pack (text, PCM) pairs into a store at `path`. The file is written next
+    to it and renamed into place, so running workers keep their old mapping.
+    """
+    entries: dict[str, tuple[int, int]] = {}
+    chunks: list[bytes] = []
+    offset = 0
+    for text, pcm in sentences:
+        key = normalize_text(text)
+        if key in entries or not pcm:
+            continue
+        entries[key] = (offset, len(pcm))
+        chunks.append(pcm)
+        offset += len(pcm)
+
+    index = {
+        "model": model_id,
+        "sample_rate": sample_rate,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "data_start": 0,
+        "entries": entries,
+    }
+    # data_start is part of the index, so size the index with a placeholder first
+    index_length = len(json.dumps(index).encode("utf-8")) + 16
+    data_start = -(-(_HEADER.size + index_length) // _PAGE) * _PAGE
+    index["data_start"] = data_start
+    encoded = json.dumps(index).encode("utf-8")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * (data_start - _HEADER.size - len(encoded)))
+        f.writelines(chunks)
+    os.replace(tmp_path, path)
+
+
+DEFAULT_STORE = os.path.join(os.path.dirname(__file__), "piper_model", "prerendered.pcmpack")
+
+
+def audio_store_from_env(model_path: str) -> AudioStore | None:
+    """
+    Open the store at AUDIO_STORE_PATH (default piper_model/prerendered.pcmpack;
+    empty disables it). A missing store is not an error, and a store rendered
+    for another voice is ignored with a warning.
+    """
+    path = os.environ.get("AUDIO_STORE_PATH", DEFAULT_STORE)
+    if not path or not os.path.exists(path):
+        return None
+    model_id = model_fingerprint(model_path) if os.path.exists(model_path) else None
+    try:
+        store = AudioStore(path, model_id)
+    except (OSError, ValueError) as e:
+        logger.warning("Not using audio store %s: %s", path, e)
+        return None
+    logger.info("Audio store %s: %d pre-rendered sentences", path, len(store))
+    return store
@@ -14,25 +14,107 @@ from fastapi import (
     UploadFile,
     Body,
 )
-from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import httpx
 import asyncio
 import json
 import io
+import itertools
+import math
+import logging
 import wave
-from piper import PiperVoice
 import os
 from collections.abc import AsyncGenerator
 from httpx import Response as HttpxResponse
-import re
-import speech_recognition as sr
-import tempfile
-from pydub import AudioSegment
+import time
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from tts_engine import TTSEngine, TTSSaturatedError, engine_from_env, load_voice_from_env
+from tts_server import RemoteTTSEngine
+from startup import Readiness, prerender_lexicon
+from adk_client import ADKChunk, client_from_env, parse_adk_event
+from sse_decoder import aiter_events
+from pipeline import ResponsePipeline
+from speech_text import normalize_for_speech
+from answer_cache import (
+    CACHED_ANSWER_STATE,
+    CACHED_EXCHANGE_STATE,
+    CachedAnswer,
+    answer_cache_from_env,
+    cached_exchange_note,
+    session_turns,
+)
+from audio_store import audio_store_from_env
+from admission import AdmissionRejected, Ticket, admission_from_env
+from sessions import CREATED_STATUSES, sessions_from_env
+from metrics import (
+    ACTIVE_STREAMS,
+    ADK_CONNECT,
+    ADK_FIRST_TOKEN,
+    ADK_IN_FLIGHT,
+    ADK_TOKEN_RATE,
+    ANSWER_ERRORS,
+    ANSWER_SECONDS,
+    ANSWERS,
+    CANCELLED_ANSWERS,
+    STREAMED_BYTES,
+    STT_STAGE,
+    TIME_TO_FIRST_AUDIO,
+    TTS_QUEUE_DEPTH,
+    TTS_SENTENCE,
+    TTS_STORE_LOOKUPS,
+    Span,
+    configure_tracing,
+    export_snapshots,
+    logger,
+    render_metrics,
+)
+from stt_engine import (
+    STT_SAMPLE_RATE,
+    AudioDecodeError,
+    EnergyVAD,
+    RecognizerUnavailableError,
+    StreamingDecoder,
+    STTError,
+    Transcript,
+    UnintelligibleAudioError,
+    stt_from_env,
+)
+from audio_codecs import AUDIO_FORMATS, AudioEncodingError, encode_sentence
 
-app = FastAPI(title="ADK Einstein Chat + Real-time Voice")
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+# Spans are exported only when OTEL_EXPORTER_OTLP_ENDPOINT is set
+configure_tracing()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global tts_engine
+    adk.start()
+    sessions.start()
+    with readiness.stage("model"):
+        tts_engine = await asyncio.to_thread(create_tts_engine)
+    warm_up_task = asyncio.create_task(warm_up_worker())
+    # Lets whichever worker serves /metrics report every worker's metrics
+    metrics_task = asyncio.create_task(export_snapshots(update_gauges))
+    yield
+    warm_up_task.cancel()
+    metrics_task.cancel()
+    await asyncio.gather(metrics_task, return_exceptions=True)
+    await sessions.aclose()
+    await adk.aclose()
+    tts_engine.shutdown()
+    stt_engine.shutdown()
+
+
+app = FastAPI(title="ADK Einstein Chat + Real-time Voice", lifespan=lifespan)
 
 # ─────────────────────────────────────
 # Model loading (fails fast if missing)
@@ -40,23 +122,102 @@ app = FastAPI(title="ADK Einstein Chat + Real-time Voice")
 MODEL_PATH = (
     "./piper_model/en_GB-alaneinstein-medium.onnx"
 )
-if not os.path.exists(MODEL_PATH):
+TTS_SERVER_SOCKET = os.environ.get("TTS_SERVER_SOCKET")
+
+if not TTS_SERVER_SOCKET and not os.path.exists(MODEL_PATH):
     raise RuntimeError(f"Model not found: {MODEL_PATH}")
 
-try:
-    voice = PiperVoice.load(MODEL_PATH, use_cuda=True)
-    print("Model loaded successfully on GPU (CUDA).")
-except Exception as e:
-    # Fall back to the CPU
-    voice = PiperVoice.load(MODEL_PATH, use_cuda=False)
+
+def create_tts_engine() -> TTSEngine | RemoteTTSEngine:
+    if TTS_SERVER_SOCKET:
+        # Synthesis server mode: tts_server.py owns the only copy of the model
+        # and every uvicorn worker forwards sentences to it over a Unix socket.
+        return RemoteTTSEngine(TTS_SERVER_SOCKET)
+    # Synthesis runs on a bounded worker pool so ONNX inference never blocks
+    # the event loop (sized by TTS_MAX_WORKERS / TTS_MAX_QUEUE).
+    return engine_from_env(load_voice_from_env(MODEL_PATH), MODEL_PATH)
 
 
+# Created by the lifespan, off the event loop, before any request is served
+tts_engine: TTSEngine | RemoteTTSEngine | None = None
+
+# Sentences pre-rendered by prerender.py, memory-mapped and served without
+# synthesis; the mapping is shared by every worker through the page cache
+audio_store = audio_store_from_env(MODEL_PATH)
+
 SAMPLE_RATE = 22050
 
 ADK_BASE_URL = "http://127.0.0.1:8965"
 ADK_SSE_URL = f"{ADK_BASE_URL}/run_sse"
 APP_NAME = "uon_agent_albeee"
 
+# One keep-alive connection pool per worker, opened and closed by the lifespan
+adk = client_from_env(ADK_BASE_URL)
+
+# Complete answers to common first questions (ANSWER_CACHE_MAX_MB=0 disables)
+answer_cache = answer_cache_from_env()
+
+# Global in-flight cap, wait queue and per-session rate limits for answers
+admission = admission_from_env()
+
+# Speech-to-text backend (STT_BACKEND: google, whisper, faster_whisper, vosk, sphinx)
+stt_engine = stt_from_env()
+
+
+# ─────────────────────────────────────
+# Warm-up
+# ─────────────────────────────────────
+readiness = Readiness()
+
+
+async def warm_up_worker():
+    """
+    Warm the worker in the background once the model is loaded: one
+    synthesis per TTS worker, the ADK connection pool and a local STT model,
+    then (WARMUP_PRERENDER=1) the lexicon phrases into the PCM cache.
+    /ready reports ready as soon as synthesis is warm; the ADK server may
+    still be starting, so its connections are best effort within
+    WARMUP_TIMEOUT_S.
+    """
+    timeout_s = float(os.environ.get("WARMUP_TIMEOUT_S", "60"))
+
+    async def warm_tts():
+        with readiness.stage("tts"):
+            if isinstance(tts_engine, RemoteTTSEngine):
+                await tts_engine.warm_up(timeout_s)
+            else:
+                await tts_engine.warm_up()
+
+    async def warm_adk():
+        with readiness.stage("adk", required=False):
+            deadline = time.monotonic() + timeout_s
+            while True:
+                try:
+                    await adk.warm_up(int(os.environ.get("WARMUP_ADK_CONNECTIONS", "2")))
+                    # ADK is up, so the session pool can be filled
+                    sessions.refill()
+                    return
+                except httpx.TransportError:
+                    if time.monotonic() >= deadline:
+                        raise
+                    await asyncio.sleep(1.0)
+
+    async def warm_stt():
+        with readiness.stage("stt", required=False):
+            await stt_engine.warm_up()
+
+    try:
+        await asyncio.gather(warm_tts(), warm_adk(), warm_stt())
+    except Exception as e:
+        logger.error("Warm-up failed, worker stays not ready: %s", e)
+        return
+    readiness.mark_ready()
+
+    # In server mode the TTS server pre-renders into its own cache
+    if isinstance(tts_engine, TTSEngine):
+        with readiness.stage("prerender", required=False):
+            await prerender_lexicon(tts_engine)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -82,31 +243,52 @@ async def create_adk_session(uid: str, sid: str) -> HttpxResponse | None:
         status.HTTP_409_CONFLICT,
     )
 
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(url, json={"initial_state": {}})
+    try:
+        resp = await adk.request(
+            "create_session", "POST", url, json={"initial_state": {}}
+        )
 
-            if resp.status_code in SUCCESS_STATUSES:
-                return resp
-            else:
-                print(f"ADK returned unexpected status code: {resp.status_code}")
-                return resp
+        if resp.status_code in SUCCESS_STATUSES:
+            return resp
+        else:
+            logger.warning("ADK returned unexpected status code: %s", resp.status_code)
+            return resp
 
-        except httpx.RequestError as e:
-            print(f"Failed to contact ADK: {e}")
-            return None
+    except httpx.RequestError as e:
+        logger.warning("Failed to contact ADK: %s", e)
+        return None
 
 
 async def delete_adk_session(uid: str, sid: str) -> HttpxResponse | None:
     url = f"{ADK_BASE_URL}/apps/{APP_NAME}/users/{uid}/sessions/{sid}"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.delete(url)
-            return resp
-        except httpx.RequestError as e:
-            print(f"Failed to contact ADK: {e}")
-            return None
+    try:
+        resp = await adk.request("delete_session", "DELETE", url)
+        return resp
+    except httpx.RequestError as e:
+        logger.warning("Failed to contact ADK: %s", e)
+        return None
+
+
+async def get_adk_session(uid: str, sid: str) -> HttpxResponse | None:
+    url = f"{ADK_BASE_URL}/apps/{APP_NAME}/users/{uid}/sessions/{sid}"
+
+    try:
+        return await adk.request("get_session", "GET", url)
+    except httpx.RequestError as e:
+        logger.warning("Failed to contact ADK: %s", e)
+        return None
+
+
+# Known sessions, pre-created sessions and idle eviction (SESSION_TTL_S,
+# SESSION_POOL_SIZE); an evicted session's cached-answer state goes with it
+sessions = sessions_from_env(
+    create_adk_session,
+    delete_adk_session,
+    get_adk_session,
+    on_evict=answer_cache.forget_session if answer_cache is not None else None,
+)
+
 
 def create_wav_header(
     sample_rate: int = 22050, channels: int = 1, width: int = 2
@@ -119,18 +301,257 @@ def create_wav_header(
     return buffer.getvalue()
 
 
+async def synthesize_chunks(text: str, priority: bool = False) -> list[bytes | memoryview]:
+    """
+    PCM chunks for one sentence: a zero-copy view into the pre-rendered
+    store when it has the sentence, live synthesis otherwise.
+    """
+    if audio_store is not None:
+        pcm = audio_store.get(text)
+        TTS_STORE_LOOKUPS.inc(result="hit" if pcm is not None else "miss")
+        if pcm is not None:
+            return [pcm]
+    return await tts_engine.synthesize(text, priority)
+
+
 async def tts_stream_generator(text: str):
     if not text or not text.strip():
         raise HTTPException(status_code=400, detail="Prompt cannot be empty")
 
     yield create_wav_header(sample_rate=SAMPLE_RATE, channels=1, width=2)
 
-    for chunk in voice.synthesize(text.strip()):
-        yield chunk.audio_int16_bytes
+    for chunk in await synthesize_chunks(text.strip()):
+        yield chunk
+
+
+async def synthesize_events(
+    text: str,
+    audio_format: str = "pcm",
+    parent: Span | None = None,
+    priority: bool = False,
+):
+    """
+    Synthesise `text` off the event loop and yield audio events.
+
+    PCM is streamed chunk by chunk; compressed formats are encoded per
+    sentence, so each audio event is an independently playable segment.
+    `priority` marks an answer's first sentence for the batching scheduler.
+    """
+    text = text.strip()
+    if not text:
+        return
+
+    with Span("tts.sentence", parent, chars=len(text)) as span:
+        try:
+            chunks = await synthesize_chunks(text, priority)
+        except TTSSaturatedError as e:
+            ANSWER_ERRORS.inc(stage="tts")
+            span.set("saturated", True)
+            yield {"type": "error", "message": str(e)}
+            return
+        TTS_SENTENCE.observe(span.elapsed)
+
+        if audio_format == "pcm":
+            for chunk in chunks:
+                yield {"type": "audio", "audio": chunk}
+            return
+
+        try:
+            encoded = await encode_sentence(b"".join(chunks), audio_format, SAMPLE_RATE)
+        except AudioEncodingError as e:
+            ANSWER_ERRORS.inc(stage="encode")
+            yield {"type": "error", "message": str(e)}
+            return
+        yield {"type": "audio", "audio": encoded}
+
+
+def header_event(audio_format: str = "pcm") -> dict:
+    return {
+        "type": "header",
+        "sampleRate": SAMPLE_RATE,
+        "format": audio_format,
+        "mimeType": AUDIO_FORMATS[audio_format][0],
+        "audio": create_wav_header(sample_rate=SAMPLE_RATE, channels=1, width=2),
+    }
+
+
+def validate_audio_format(audio_format: str) -> str:
+    if audio_format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported audio format '{audio_format}'. Choose one of: {', '.join(AUDIO_FORMATS)}",
+        )
+    return audio_format
+
+
+def sse_event(event: dict) -> str:
+    """Format a response event for the SSE transport (binary payloads as hex)."""
+    if isinstance(event.get("audio"), (bytes, memoryview)):
+        event = {**event, "audio": event["audio"].hex()}
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def sse_stream(events):
+    """Frame events for SSE, counting the stream and the bytes it sends."""
+    ACTIVE_STREAMS.inc(transport="sse")
+    try:
+        async for event in events:
+            frame = sse_event(event)
+            STREAMED_BYTES.inc(len(frame), transport="sse")
+            yield frame
+    finally:
+        ACTIVE_STREAMS.dec(transport="sse")
+
+
+def admit_answer(uid: str, sid: str) -> Ticket:
+    """Reserve a place for a new answer, or fail fast with 429 and Retry-After."""
+    try:
+        return admission.admit(uid, sid)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
+
+async def admitted_events(ticket: Ticket, events):
+    """Queue-position events until `ticket` is admitted, then `events`; releases the ticket."""
+    async with ticket:
+        try:
+            async for position in ticket.wait():
+                yield {
+                    "type": "queued",
+                    "position": position,
+                    "expectedWaitS": round(admission.expected_wait(position), 1),
+                }
+        except AdmissionRejected as e:
+            yield {"type": "error", "message": str(e), "retryAfter": math.ceil(e.retry_after)}
+            return
+
+        async for event in events:
+            yield event
+
+
+# ─────────────────────────────────────
+# Cancellation
+# ─────────────────────────────────────
+# (uid, sid) -> set when a newer request for the same session arrives
+active_answers: dict[tuple[str, str], asyncio.Event] = {}
 
 
+def claim_session(uid: str, sid: str) -> asyncio.Event:
+    """Supersede any answer still streaming for the session (barge-in) and register a new one."""
+    previous = active_answers.get((uid, sid))
+    if previous is not None:
+        previous.set()
+    superseded = asyncio.Event()
+    active_answers[(uid, sid)] = superseded
+    return superseded
+
+
+def release_session(uid: str, sid: str, superseded: asyncio.Event):
+    if active_answers.get((uid, sid)) is superseded:
+        del active_answers[(uid, sid)]
+
+
+async def wait_for_disconnect(request: Request, poll_s: float = 0.25):
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_s)
+
+
+async def stream_until(events, stops: dict):
+    """
+    Relay `events` until one of the `stops` (reason -> awaitable) completes.
+
+    The pending step of `events` is then cancelled, which unwinds the whole
+    answer: the ADK stream is closed, synthesis jobs that have not started
+    are dropped and the admission slot is released. Unless the client is
+    gone, a final {"type": "cancelled"} event says why. Coroutines in `stops`
+    are owned and cancelled here; tasks passed in are left to the caller.
+    """
+    watchers = {
+        asyncio.ensure_future(stop): (reason, asyncio.iscoroutine(stop))
+        for reason, stop in stops.items()
+    }
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(anext(events))
+            done, _ = await asyncio.wait(
+                {step, *watchers}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if step in done:
+                try:
+                    event = step.result()
+                except StopAsyncIteration:
+                    return
+                step = None
+                yield event
+                continue
+
+            watcher = next(w for w in done if w in watchers)
+            # A watcher that failed (e.g. the WebSocket receive) means the client is gone
+            reason = "disconnect" if watcher.exception() else watchers[watcher][0]
+            CANCELLED_ANSWERS.inc(reason=reason)
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+            step = None
+            if reason != "disconnect":
+                yield {"type": "cancelled", "reason": reason}
+            return
+    finally:
+        if step is not None:
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        for watcher, (_, owned) in watchers.items():
+            if owned:
+                watcher.cancel()
+        await events.aclose()
+
+
+async def supervised_events(uid: str, sid: str, events, stops: dict | None = None):
+    """Stream an answer that stops when the session asks something new or `stops` fire."""
+    superseded = claim_session(uid, sid)
+    try:
+        async for event in stream_until(
+            events, {"barge_in": superseded.wait(), **(stops or {})}
+        ):
+            yield event
+    finally:
+        release_session(uid, sid, superseded)
+
+
+def observe_transcript(transcript: Transcript):
+    for stage in ("decode", "listen", "recognize"):
+        if f"{stage}_ms" in transcript.timings:
+            STT_STAGE.observe(transcript.timings[f"{stage}_ms"] / 1000, stage=stage)
+
+
+def ensure_tts_capacity():
+    """Reject new voice requests up front while the TTS pool is saturated."""
+    if tts_engine.saturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Einstein is busy talking to other visitors, please try again shortly.",
+            headers={"Retry-After": "2"},
+        )
+
+
+
+async def adk_sse_stream(uid: str, sid: str, user_prompt: str, parent: Span | None = None):
+    """
+    Stream Einstein's answer from ADK as ADKChunk items.
+
+    Partial text arrives as "text" chunks; tool calls, tool results, the
+    final complete answer and upstream errors are surfaced as their own kinds.
+    """
+    # Free for a session this worker knows; creates it on a visitor's first answer
+    if not await sessions.ensure(uid, sid):
+        ANSWER_ERRORS.inc(stage="adk")
+        yield ADKChunk("error", "Einstein could not start the conversation, please try again shortly.")
+        return
 
-async def adk_sse_stream(uid: str, sid: str, user_prompt: str):
     payload = {
         "appName": APP_NAME,
         "userId": uid,
@@ -139,94 +560,180 @@ async def adk_sse_stream(uid: str, sid: str, user_prompt: str):
         "streaming": True,
     }
 
-    async with httpx.AsyncClient(timeout=None) as client:
-        async with client.stream("POST", ADK_SSE_URL, json=payload) as response:
+    span = Span("adk.run_sse", parent)
+    first_token_at = None
+    tokens = 0
+    error = None
+    try:
+        async with adk.stream("run_sse", "POST", ADK_SSE_URL, json=payload) as response:
+            ADK_CONNECT.observe(span.elapsed)
             response.raise_for_status()
 
-            buffer = b""
-            async for chunk in response.aiter_bytes():
-                buffer += chunk
-                while b"\n" in buffer:
-                    line_bytes, buffer = buffer.split(b"\n", 1)
-                    line = line_bytes.decode("utf-8").strip()
-                    if not line.startswith("data:"):
-                        continue
-                    data = line[5:].strip()
-                    if not data:
-                        continue
-                    try:
-                        json_data = json.loads(data)
-                        if json_data.get("partial") and json_data.get("content"):
-                            text_part = json_data["content"]["parts"][0]["text"]
-                            if text_part.strip():
-                                yield text_part
-                    except (json.JSONDecodeError, KeyError, AttributeError):
-                        continue
-
-
-def refactor_to_speech(text):
-    # remove asterisks
-    text = text.replace("*", "")
-    # convert £ to pounds
-    pattern = r"(\u00A3)([\d,]+)"
-    replacement = r"\2 pounds"
-    text = re.sub(pattern, replacement, text)
-    # replace MSci to MSc
-    text = re.sub(r"msci", "MSc", text, flags=re.IGNORECASE)
-    # replacing physics formulas
-    text = re.sub(r'=mc\u00b2', r'= m c squared', text, flags=re.IGNORECASE)
-    text = re.sub(r'=mc', r'= m c', text, flags=re.IGNORECASE)
-    text = re.sub(r'\u00b2', r'squared', text, flags=re.IGNORECASE)
-    return text
-
-
-async def transcribe_audio(audio_data: bytes) -> str:
-    """Transcribe audio data to text using SpeechRecognition."""
-    temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=".webm")
-    temp_output = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+            async for event in aiter_events(response.aiter_bytes()):
+                try:
+                    adk_chunks = parse_adk_event(json.loads(event.data))
+                except (json.JSONDecodeError, AttributeError, TypeError):
+                    continue
+                for adk_chunk in adk_chunks:
+                    if adk_chunk.kind == "text" and adk_chunk.text.strip():
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            ADK_FIRST_TOKEN.observe(span.elapsed)
+                            span.event("first_token")
+                        tokens += len(adk_chunk.text.split())
+                    elif adk_chunk.kind == "error":
+                        ANSWER_ERRORS.inc(stage="adk")
+                    elif adk_chunk.kind == "tool_call":
+                        span.event("tool_call", tool=adk_chunk.text)
+                    if adk_chunk.kind != "text" or adk_chunk.text.strip():
+                        yield adk_chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if first_token_at is not None:
+            streaming_s = time.perf_counter() - first_token_at
+            if streaming_s > 0:
+                ADK_TOKEN_RATE.observe(tokens / streaming_s)
+        span.set("tokens", tokens)
+        span.end(error)
+
+
+async def adk_session_turns(uid: str, sid: str) -> int | None:
+    """Questions asked so far in the session, by any worker; None if ADK could not say."""
+    response = await get_adk_session(uid, sid)
+    if response is None:
+        return None
+    if response.status_code == 404:
+        return 0
+    if response.status_code != 200:
+        return None
+    try:
+        return session_turns(response.json())
+    except ValueError:
+        return None
 
+
+async def record_cached_answer(uid: str, sid: str, cached: CachedAnswer):
+    """
+    Write a cached first answer into the ADK session state, so other workers
+    no longer treat the session as new and the agent's instruction carries
+    the exchange it never saw.
+    """
+    if not await sessions.ensure(uid, sid):
+        return
+    url = f"{ADK_BASE_URL}/apps/{APP_NAME}/users/{uid}/sessions/{sid}"
+    state = {
+        CACHED_ANSWER_STATE: True,
+        CACHED_EXCHANGE_STATE: cached_exchange_note(cached.prompt, cached.text),
+    }
     try:
-        # Save uploaded audio data
-        with open(temp_input.name, "wb") as f:
-            f.write(audio_data)
+        response = await adk.request("update_session", "PATCH", url, json={"stateDelta": state})
+        if response.status_code != 200:
+            logger.warning("ADK did not record the cached answer: %s", response.status_code)
+    except httpx.RequestError as e:
+        logger.warning("Failed to contact ADK: %s", e)
 
-        # Convert to WAV format using pydub
-        audio = AudioSegment.from_file(temp_input.name)
-        audio = audio.set_channels(1)
-        audio = audio.set_frame_rate(16000)
-        audio.export(temp_output.name, format="wav")
 
-        # Create a recognizer instance
-        recognizer = sr.Recognizer()
+async def response_events(uid: str, sid: str, prompt: str, audio_format: str = "pcm"):
+    """
+    Einstein's answer to `prompt` as transport-neutral events.
 
-        # Load the WAV file
-        with sr.AudioFile(temp_output.name) as source:
-            audio_data_sr = recognizer.record(source)
+    Yields dicts with a `type` of header, text, audio, error or done. Audio
+    payloads are raw int16 PCM bytes, or one encoded segment per sentence for
+    compressed formats; each transport decides how to frame them. Text keeps
+    streaming while earlier sentences are synthesised (see pipeline.py).
+    A session's first question may be answered from the answer cache.
+    """
+    yield header_event(audio_format)
 
-        # Perform speech recognition
-        text = recognizer.recognize_google(audio_data_sr)
-        return text
+    span = Span("answer", session_id=sid, audio_format=audio_format)
+    source = "live"
+    first_audio = False
+    error = None
+    try:
+        first_turn = answer_cache is not None and answer_cache.start_turn(uid, sid)
+        cached = answer_cache.lookup(prompt, audio_format) if first_turn else None
+        if cached is not None and await adk_session_turns(uid, sid):
+            # Another worker has already answered in this session
+            first_turn, cached = False, None
+        if cached is not None:
+            source = "cache"
+            ANSWERS.inc(source=source)
+            for event in cached.events:
+                if event["type"] == "audio" and not first_audio:
+                    first_audio = True
+                    TIME_TO_FIRST_AUDIO.observe(span.elapsed, source=source)
+                yield event
+            await record_cached_answer(uid, sid, cached)
+            yield {
+                "type": "done",
+                "cached": True,
+                "timings": {"total_ms": round(span.elapsed * 1000, 1)},
+            }
+            return
 
-    except sr.UnknownValueError:
-        raise HTTPException(status_code=400, detail="Could not understand audio")
-    except sr.RequestError as e:
-        raise HTTPException(
-            status_code=500, detail=f"Recognition service error: {str(e)}"
+        ANSWERS.inc(source=source)
+        # Sentences are synthesised in order, so the first call is the first sentence
+        sentence_numbers = itertools.count()
+        pipeline = ResponsePipeline(
+            adk_sse_stream(uid, sid, prompt, span),
+            lambda sentence: synthesize_events(
+                normalize_for_speech(sentence),
+                audio_format,
+                span,
+                priority=next(sentence_numbers) == 0,
+            ),
         )
+        recorded = [] if first_turn else None
+        async for event in pipeline.events():
+            if event["type"] == "audio" and not first_audio:
+                first_audio = True
+                TIME_TO_FIRST_AUDIO.observe(span.elapsed, source=source)
+            if recorded is not None:
+                if event["type"] == "error":
+                    recorded = None
+                elif event["type"] in ("text", "final", "audio"):
+                    recorded.append(event)
+            yield event
+
+        # Only if this really was the session's first question; another worker may have answered earlier ones
+        if recorded and await adk_session_turns(uid, sid) == 1:
+            answer_cache.store(prompt, audio_format, recorded)
+        for name, value in pipeline.timings.items():
+            span.set(name, value)
+        yield {"type": "done", "timings": pipeline.timings}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+        error = e
+        ANSWER_ERRORS.inc(stage="answer")
+        logger.exception("Answer for session %s failed", sid)
+        raise
     finally:
-        try:
-            os.unlink(temp_input.name)
-            os.unlink(temp_output.name)
-        except:
-            pass
+        ANSWER_SECONDS.observe(span.elapsed, source=source)
+        span.set("source", source)
+        span.end(error)
+
+
+async def transcribe_audio(audio_data: bytes) -> Transcript:
+    """Transcribe an uploaded recording, with per-stage timings."""
+    try:
+        transcript = await stt_engine.transcribe(audio_data)
+        observe_transcript(transcript)
+        return transcript
+    except UnintelligibleAudioError:
+        raise HTTPException(status_code=400, detail="Could not understand audio")
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RecognizerUnavailableError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
 
 
 @app.get(
     "/uid/{uid}/sid/{sid}/init",
     summary="Create or ensure ADK session exists (idempotent)",
-    description="Call this once per user/session before using /ask. Returns the ADK service's response payload and status code.",
+    description="Optional: /ask and /speak create the session on first use. Returns the ADK service's response payload and status code.",
 )
 async def init_session(
     uid: str = Path(..., description="User ID"),
@@ -234,6 +741,8 @@ async def init_session(
     response: Response = Response(),
 ):
     adk_response = await create_adk_session(uid, sid)
+    if adk_response is not None and adk_response.status_code in CREATED_STATUSES:
+        sessions.register(uid, sid)
 
     if adk_response is None:
         raise HTTPException(
@@ -258,6 +767,22 @@ async def init_session(
         )
     
 
+@app.get(
+    "/session/new",
+    summary="Get a new session",
+    description="Hands out the IDs of a session already created in ADK (from this worker's pool when one is ready), so a new visitor can ask straight away.",
+)
+async def new_session():
+    try:
+        uid, sid, pooled = await sessions.new_session()
+    except ConnectionError:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to create a session at ADK backend {ADK_BASE_URL}. Is it running?",
+        )
+    return {"uid": uid, "sid": sid, "pooled": pooled}
+
+
 @app.get(
     "/uid/{uid}/sid/{sid}/delete",
     summary="Delete ADK session",
@@ -268,6 +793,9 @@ async def delete_session(
     response: Response = Response(),
 ):
     adk_response = await delete_adk_session(uid, sid)
+    sessions.forget(uid, sid)
+    if answer_cache is not None:
+        answer_cache.forget_session(uid, sid)
 
     if adk_response is None:
         raise HTTPException(
@@ -297,7 +825,7 @@ async def delete_session(
     responses={
         200: {
             "content": {"text/event-stream": {}},
-            "description": "Server-Sent Events with JSON events containing `text` and/or `audio` (base64)",
+            "description": "Server-Sent Events with JSON events containing `text` and/or `audio` (hex-encoded int16 PCM). Prefer the `/ws` endpoint, which sends audio as binary frames.",
         }
     },
 )
@@ -306,43 +834,28 @@ async def ask_tts_sse(
     sid: str = Path(..., description="Session ID"),
     ask_request: AskRequest = Body(..., description="Request body with prompt"),
     request: Request = None,
+    audio_format: str = Query(
+        "pcm", alias="format", description="Audio encoding: pcm, opus (OGG) or mp3"
+    ),
 ):
     prompt = ask_request.prompt
     
     if not prompt or len(prompt.strip()) == 0:
         raise HTTPException(status_code=400, detail="Prompt cannot be empty")
 
-    async def sse_generator():
-        wav_header = create_wav_header(sample_rate=SAMPLE_RATE, channels=1, width=2)
-        yield f"data: {json.dumps({'type': 'header', 'sampleRate': SAMPLE_RATE, 'audio': wav_header.hex()})}\n\n"
-
-        sentence_buffer = ""
-
-        async for text_chunk in adk_sse_stream(uid, sid, prompt):
-            sentence_buffer += text_chunk
-
-            yield f"data: {json.dumps({'type': 'text', 'content': text_chunk})}\n\n"
-
-            if any(text_chunk.endswith(p) for p in ".!?;:\n"):
-                if sentence_buffer.strip():
-                    for audio_chunk in voice.synthesize(
-                        refactor_to_speech(sentence_buffer).strip()
-                    ):
-                        audio_b64 = audio_chunk.audio_int16_bytes.hex()
-                        yield f"data: {json.dumps({'type': 'audio', 'audio': audio_b64})}\n\n"
-                    sentence_buffer = ""
-
-        if sentence_buffer.strip():
-            for audio_chunk in voice.synthesize(
-                refactor_to_speech(sentence_buffer.strip())
-            ):
-                audio_b64 = audio_chunk.audio_int16_bytes.hex()
-                yield f"data: {json.dumps({'type': 'audio', 'audio': audio_b64})}\n\n"
-
-        yield 'data: {"type": "done"}\n\n'
+    validate_audio_format(audio_format)
+    ensure_tts_capacity()
+    ticket = admit_answer(uid, sid)
 
+    events = admitted_events(ticket, response_events(uid, sid, prompt, audio_format))
     return StreamingResponse(
-        sse_generator(),
+        sse_stream(
+            supervised_events(
+                uid, sid, events, {"disconnect": wait_for_disconnect(request)}
+            )
+        ),
+        # Also frees the slot if the client leaves before the stream starts
+        background=BackgroundTask(ticket.release),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -367,6 +880,10 @@ async def speak_tts_sse(
     uid: str = Path(..., description="User ID"),
     sid: str = Path(..., description="Session ID"),
     audio: UploadFile = File(..., description="Audio file (webm, wav, etc.)"),
+    request: Request = None,
+    audio_format: str = Query(
+        "pcm", alias="format", description="Audio encoding: pcm, opus (OGG) or mp3"
+    ),
 ):
     """
     Complete voice conversation flow:
@@ -374,8 +891,11 @@ async def speak_tts_sse(
     2. Send to Einstein AI
     3. Stream back Einstein's text + audio response
     """
+    validate_audio_format(audio_format)
+    ensure_tts_capacity()
+    ticket = admit_answer(uid, sid)
 
-    async def sse_generator():
+    async def speak_events():
         # Step 1: Transcribe the audio
         audio_data = await audio.read()
 
@@ -383,48 +903,25 @@ async def speak_tts_sse(
             transcript = await transcribe_audio(audio_data)
 
             # Send the transcription to the client
-            yield f"data: {json.dumps({'type': 'transcription', 'text': transcript})}\n\n"
+            yield {"type": "transcription", "text": transcript.text, "timings": transcript.timings}
 
         except HTTPException as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': e.detail})}\n\n"
+            yield {"type": "error", "message": e.detail}
             return
 
-        # Step 2: Send WAV header for audio playback
-        wav_header = create_wav_header(sample_rate=SAMPLE_RATE, channels=1, width=2)
-        yield f"data: {json.dumps({'type': 'header', 'sampleRate': SAMPLE_RATE, 'audio': wav_header.hex()})}\n\n"
-
-        # Step 3: Get Einstein's response
-        sentence_buffer = ""
-
-        async for text_chunk in adk_sse_stream(uid, sid, transcript):
-            sentence_buffer += text_chunk
-
-            # Stream Einstein's text response
-            yield f"data: {json.dumps({'type': 'text', 'content': text_chunk})}\n\n"
-
-            # Generate and stream audio when sentence ends
-            if any(text_chunk.endswith(p) for p in ".!?;:\n"):
-                if sentence_buffer.strip():
-                    for audio_chunk in voice.synthesize(
-                        refactor_to_speech(sentence_buffer).strip()
-                    ):
-                        audio_b64 = audio_chunk.audio_int16_bytes.hex()
-                        yield f"data: {json.dumps({'type': 'audio', 'audio': audio_b64})}\n\n"
-                    sentence_buffer = ""
-
-        # Final leftover text
-        if sentence_buffer.strip():
-            for audio_chunk in voice.synthesize(
-                refactor_to_speech(sentence_buffer.strip())
-            ):
-                audio_b64 = audio_chunk.audio_int16_bytes.hex()
-                yield f"data: {json.dumps({'type': 'audio', 'audio': audio_b64})}\n\n"
-
-        # End of stream
-        yield 'data: {"type": "done"}\n\n'
+        # Step 2: Stream Einstein's text + audio response
+        async for event in response_events(uid, sid, transcript.text, audio_format):
+            yield event
 
     return StreamingResponse(
-        sse_generator(),
+        sse_stream(
+            supervised_events(
+                uid, sid,
+                admitted_events(ticket, speak_events()),
+                {"disconnect": wait_for_disconnect(request)},
+            )
+        ),
+        background=BackgroundTask(ticket.release),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -434,6 +931,315 @@ async def speak_tts_sse(
         },
     )
 
+async def send_ws_event(websocket: WebSocket, event: dict):
+    """Send audio as a binary frame and everything else as a JSON text frame."""
+    if event["type"] == "audio":
+        await websocket.send_bytes(event["audio"])
+        STREAMED_BYTES.inc(len(event["audio"]), transport="ws")
+    else:
+        text = json.dumps({k: v for k, v in event.items() if not isinstance(v, bytes)})
+        await websocket.send_text(text)
+        STREAMED_BYTES.inc(len(text), transport="ws")
+
+
+async def receive_ws_message(websocket: WebSocket) -> dict | bytes:
+    """Next client message: parsed JSON for text frames, raw bytes for binary ones."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("text") is not None:
+        return json.loads(message["text"])
+    return message.get("bytes") or b""
+
+
+async def receive_ws_command(websocket: WebSocket) -> dict:
+    """Next JSON message, skipping microphone chunks and "stop"s still in flight."""
+    while True:
+        message = await receive_ws_message(websocket)
+        if isinstance(message, dict) and message.get("type") != "stop":
+            return message
+
+
+async def receive_utterance(websocket: WebSocket, mime_type: str) -> Transcript:
+    """
+    Decode microphone chunks as they arrive until voice-activity detection
+    finds the end of the utterance (or the client sends {"type": "stop"}),
+    then transcribe what was heard.
+    """
+    started = time.perf_counter()
+    vad = EnergyVAD()
+    end_of_speech = asyncio.Event()
+
+    def on_pcm(pcm: bytes):
+        if vad.feed(pcm):
+            end_of_speech.set()
+
+    decoder = StreamingDecoder(mime_type, on_pcm=on_pcm)
+    await decoder.start()
+    try:
+        end_task = asyncio.create_task(end_of_speech.wait())
+        try:
+            while not end_of_speech.is_set():
+                receive_task = asyncio.create_task(receive_ws_message(websocket))
+                await asyncio.wait(
+                    {receive_task, end_task}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not receive_task.done():
+                    receive_task.cancel()
+                    break
+                message = receive_task.result()
+                if isinstance(message, bytes):
+                    await decoder.feed(message)
+                elif message.get("type") == "stop":
+                    break
+        finally:
+            end_task.cancel()
+
+        await send_ws_event(websocket, {"type": "end_of_speech"})
+        pcm = await decoder.finish()
+    finally:
+        decoder.close()
+
+    listened = time.perf_counter()
+    if not vad.speech_ms:
+        raise UnintelligibleAudioError("Could not understand audio")
+    text = await stt_engine.recognize_pcm(pcm)
+
+    transcript = Transcript(
+        text=text,
+        timings={
+            "backend": stt_engine.backend,
+            "audio_ms": round(len(pcm) / 2 / STT_SAMPLE_RATE * 1000, 1),
+            "speech_ms": vad.speech_ms,
+            "listen_ms": round((listened - started) * 1000, 1),
+            "recognize_ms": round((time.perf_counter() - listened) * 1000, 1),
+        },
+    )
+    observe_transcript(transcript)
+    return transcript
+
+
+@app.websocket("/uid/{uid}/sid/{sid}/ws")
+async def conversation_ws(websocket: WebSocket, uid: str, sid: str):
+    """
+    Binary streaming transport for /ask and /speak.
+
+    Client -> server:
+      text    {"type": "ask", "prompt": "...", "format": "pcm"}
+      text    {"type": "speak", "format": "pcm"}, then one binary frame holding the recording
+      text    {"type": "listen", "format": "pcm", "mimeType": "audio/webm"}, then
+              binary MediaRecorder chunks while the user talks; the server
+              replies {"type": "end_of_speech"} when it hears the user stop
+              (the client may also send {"type": "stop"})
+      text    {"type": "cancel"} stops the answer being streamed; any new
+              request does the same (barge-in). Either way the server
+              confirms with {"type": "cancelled"}.
+    Server -> client:
+      text    the same JSON events as the SSE endpoints, without audio payloads
+      binary  audio in the header's `format`: raw int16 PCM at `sampleRate`
+              one frame per chunk, or one OGG/MP3 segment per sentence
+    """
+    await websocket.accept()
+
+    # Read while an answer streams, so a new message can interrupt it
+    next_message: asyncio.Task | None = None
+    try:
+        while True:
+            if next_message is None:
+                message = await receive_ws_command(websocket)
+            else:
+                message, next_message = await next_message, None
+
+            if message.get("type") == "cancel":
+                # Nothing is streaming; confirm so the client stops discarding
+                await send_ws_event(websocket, {"type": "cancelled", "reason": "message"})
+                continue
+
+            audio_format = message.get("format", "pcm")
+            if audio_format not in AUDIO_FORMATS:
+                await send_ws_event(
+                    websocket,
+                    {"type": "error", "message": f"Unsupported audio format '{audio_format}'"},
+                )
+                continue
+
+            if tts_engine.saturated:
+                await send_ws_event(
+                    websocket,
+                    {"type": "error", "message": "Einstein is busy talking to other visitors, please try again shortly."},
+                )
+                continue
+
+            if message.get("type") == "ask":
+                prompt = (message.get("prompt") or "").strip()
+                if not prompt:
+                    await send_ws_event(
+                        websocket, {"type": "error", "message": "Prompt cannot be empty"}
+                    )
+                    continue
+
+            elif message.get("type") == "speak":
+                audio_data = await websocket.receive_bytes()
+                try:
+                    transcript = await transcribe_audio(audio_data)
+                except HTTPException as e:
+                    await send_ws_event(websocket, {"type": "error", "message": e.detail})
+                    continue
+                prompt = transcript.text
+                await send_ws_event(
+                    websocket,
+                    {"type": "transcription", "text": prompt, "timings": transcript.timings},
+                )
+
+            elif message.get("type") == "listen":
+                try:
+                    transcript = await receive_utterance(
+                        websocket, message.get("mimeType", "")
+                    )
+                except UnintelligibleAudioError:
+                    await send_ws_event(
+                        websocket, {"type": "error", "message": "Could not understand audio"}
+                    )
+                    continue
+                except STTError as e:
+                    await send_ws_event(websocket, {"type": "error", "message": str(e)})
+                    continue
+                prompt = transcript.text
+                await send_ws_event(
+                    websocket,
+                    {"type": "transcription", "text": prompt, "timings": transcript.timings},
+                )
+
+            else:
+                await send_ws_event(
+                    websocket,
+                    {"type": "error", "message": f"Unknown message type: {message.get('type')}"},
+                )
+                continue
+
+            try:
+                ticket = admission.admit(uid, sid)
+            except AdmissionRejected as e:
+                await send_ws_event(
+                    websocket,
+                    {"type": "error", "message": str(e), "retryAfter": math.ceil(e.retry_after)},
+                )
+                continue
+
+            ACTIVE_STREAMS.inc(transport="ws")
+            next_message = asyncio.create_task(receive_ws_command(websocket))
+            events = supervised_events(
+                uid, sid,
+                admitted_events(ticket, response_events(uid, sid, prompt, audio_format)),
+                {"message": next_message},
+            )
+            try:
+                async for event in events:
+                    await send_ws_event(websocket, event)
+            finally:
+                # Closes the answer (and frees its slot) even if the socket dropped
+                await events.aclose()
+                ACTIVE_STREAMS.dec(transport="ws")
+
+            if (
+                next_message.done()
+                and not next_message.exception()
+                and next_message.result().get("type") == "cancel"
+            ):
+                # Already answered with {"type": "cancelled"}
+                next_message = None
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if next_message is not None:
+            next_message.cancel()
+
+
+@app.get(
+    "/ready",
+    summary="Readiness probe",
+    description="200 once this worker's model is loaded and warm, 503 until then, with the time each start-up stage finished.",
+)
+async def ready(response: Response):
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness.status()
+
+
+@app.get(
+    "/adk/status",
+    summary="ADK connection pool status",
+    description="Pool limits, in-flight and saturation counters, and per-operation upstream latency.",
+)
+async def adk_status():
+    return adk.stats()
+
+
+@app.get(
+    "/tts/status",
+    summary="TTS worker pool status",
+    description="Concurrency limit, queue depth and back-pressure state of the Piper synthesis pool, and the pre-rendered audio store.",
+)
+async def tts_status():
+    store = audio_store.stats() if audio_store is not None else None
+    if isinstance(tts_engine, RemoteTTSEngine):
+        try:
+            return {**await tts_engine.refresh_stats(), "store": store}
+        except OSError as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Failed to contact TTS server at {TTS_SERVER_SOCKET}: {e}",
+            )
+    return {**tts_engine.stats(), "store": store}
+
+
+@app.get(
+    "/answers/status",
+    summary="Answer cache status",
+    description="Entries, hit ratio, expiry and eviction counters of the first-question answer cache.",
+)
+async def answers_status():
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
+
+
+@app.get(
+    "/admission/status",
+    summary="Admission control status",
+    description="In-flight answers, queue depth, average answer time and rejection counters.",
+)
+async def admission_status():
+    return admission.stats()
+
+
+@app.get(
+    "/sessions/status",
+    summary="Session manager status",
+    description="Live and pooled sessions, creation and eviction counters, and registry and process memory.",
+)
+async def sessions_status():
+    return sessions.stats()
+
+
+def update_gauges():
+    """Set the gauges that are sampled on demand rather than as they change."""
+    TTS_QUEUE_DEPTH.set(tts_engine.queue_depth)
+    ADK_IN_FLIGHT.set(adk.in_flight)
+    sessions.update_gauges()
+
+
+@app.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Latency histograms for ADK, segmentation, TTS and STT, plus stream and byte counters, in the Prometheus text format. With METRICS_DIR set, merged across every worker and the TTS server: counters and histograms summed, gauges labelled by pid.",
+    response_class=PlainTextResponse,
+)
+async def metrics():
+    update_gauges()
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # @app.get("/{full_path:path}")
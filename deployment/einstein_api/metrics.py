@@ -0,0 +1,443 @@
+"""
+Instrumentation for the voice pipeline: Prometheus metrics and request spans.
+
+Metrics are kept in-process and rendered in the Prometheus text format by the
+`/metrics` endpoint; nothing here needs a Prometheus client library. Metrics
+observed from synthesis worker threads are guarded by a lock.
+
+uvicorn runs several workers and the TTS server is a process of its own, so
+with METRICS_DIR set every process writes a snapshot of its metrics there
+each second (`export_snapshots`) and `/metrics`, whichever worker serves it,
+merges them all: counters and histograms are summed, including those of
+exited processes so totals never go backwards, and gauges are reported per
+live process with a `pid` label.
+
+Spans go to OpenTelemetry when the SDK is installed and an exporter endpoint
+is configured (OTEL_EXPORTER_OTLP_ENDPOINT or OTEL_EXPORTER_OTLP_TRACES_ENDPOINT);
+otherwise `Span` only measures its own duration. Spans are started and ended
+explicitly with a parent, rather than through the current context, because
+answers are produced by async generators whose context does not survive
+across `yield`.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+
+try:
+    from opentelemetry import trace as otel_trace
+
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+logger = logging.getLogger("einstein")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160, 320)
+
+
+# ─────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple[tuple[str, str], ...]:
+        return tuple((name, str(labels.get(name, ""))) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> ([count per bucket], sum, count)
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+REGISTRY: list[Metric] = []
+
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+
+
+def render_metrics() -> str:
+    if METRICS_DIR:
+        return render_merged(METRICS_DIR)
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# ─────────────────────────────────────
+# Merging across processes
+# ─────────────────────────────────────
+def _snapshot() -> dict:
+    return {
+        "pid": os.getpid(),
+        "metrics": {
+            metric.name: [[name, list(labels), value] for name, labels, value in metric.samples()]
+            for metric in REGISTRY
+        },
+    }
+
+
+def write_snapshot(directory: str):
+    """Write this process's metrics to `directory`/<pid>.json, atomically."""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(_snapshot(), f, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_snapshots(directory: str) -> list[dict]:
+    """Every other process's last snapshot, plus this one's current metrics."""
+    snapshots = [_snapshot()]
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not name.endswith(".json") or name == f"{os.getpid()}.json":
+            continue
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # Removed, or replaced between listing and reading
+            continue
+    return snapshots
+
+
+def render_merged(directory: str) -> str:
+    """Render the metrics of every process that has written to `directory`."""
+    snapshots = _read_snapshots(directory)
+    live = {snapshot["pid"] for snapshot in snapshots if _alive(snapshot["pid"])}
+    blocks = []
+    for metric in REGISTRY:
+        merged: dict[tuple, float] = {}
+        for snapshot in snapshots:
+            pid = snapshot["pid"]
+            if metric.kind == "gauge" and pid not in live:
+                continue
+            for name, labels, value in snapshot["metrics"].get(metric.name, []):
+                labels = tuple((k, v) for k, v in labels)
+                if metric.kind == "gauge":
+                    merged[(name, labels + (("pid", str(pid)),))] = value
+                else:
+                    merged[(name, labels)] = merged.get((name, labels), 0) + value
+        lines = [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+        for (name, labels), value in merged.items():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        blocks.append("\n".join(lines))
+    return "\n".join(blocks) + "\n"
+
+
+async def export_snapshots(refresh: Callable[[], None] | None = None, interval_s: float = 1.0):
+    """
+    Write this process's snapshot to METRICS_DIR every `interval_s` until
+    cancelled, then once more so its final counts are kept. `refresh` sets
+    the gauges that are only sampled on demand. No-op without METRICS_DIR.
+    """
+    if not METRICS_DIR:
+        return
+    try:
+        while True:
+            if refresh is not None:
+                refresh()
+            try:
+                await asyncio.to_thread(write_snapshot, METRICS_DIR)
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot to %s: %s", METRICS_DIR, e)
+            await asyncio.sleep(interval_s)
+    finally:
+        try:
+            write_snapshot(METRICS_DIR)
+        except OSError:
+            pass
+
+
+ANSWERS = Counter(
+    "einstein_answers_total", "Answers started, by source (live or cache).", ("source",)
+)
+CANCELLED_ANSWERS = Counter(
+    "einstein_cancelled_answers_total",
+    "Answers stopped early, by reason (disconnect, barge_in, message).",
+    ("reason",),
+)
+ANSWER_ERRORS = Counter(
+    "einstein_answer_errors_total", "Error events sent to clients, by stage.", ("stage",)
+)
+ACTIVE_STREAMS = Gauge(
+    "einstein_active_streams", "Answers currently streaming, by transport.", ("transport",)
+)
+STREAMED_BYTES = Counter(
+    "einstein_streamed_bytes_total", "Bytes sent to clients, by transport.", ("transport",)
+)
+TIME_TO_FIRST_AUDIO = Histogram(
+    "einstein_time_to_first_audio_seconds", "Prompt received to first audio event.", ("source",)
+)
+ANSWER_SECONDS = Histogram(
+    "einstein_answer_seconds", "Prompt received to the end of the answer.", ("source",)
+)
+
+ADK_CONNECT = Histogram(
+    "einstein_adk_connect_seconds", "ADK run_sse request to response headers."
+)
+ADK_FIRST_TOKEN = Histogram(
+    "einstein_adk_first_token_seconds", "ADK run_sse request to the first text chunk."
+)
+ADK_TOKEN_RATE = Histogram(
+    "einstein_adk_tokens_per_second",
+    "Streamed model text rate per answer (whitespace-separated tokens).",
+    buckets=RATE_BUCKETS,
+)
+SENTENCE_WAIT = Histogram(
+    "einstein_sentence_wait_seconds",
+    "Time a sentence spent in the segmenter, from its first text to its release.",
+)
+
+TTS_SENTENCE = Histogram(
+    "einstein_tts_sentence_seconds", "Sentence submitted to its audio ready, queueing included."
+)
+TTS_SYNTHESIS = Histogram(
+    "einstein_tts_synthesis_seconds",
+    "Piper inference time per run: one sentence, or one batch (cache misses only).",
+)
+TTS_RTF = Histogram(
+    "einstein_tts_real_time_factor",
+    "Piper inference time divided by the duration of the audio it produced.",
+    buckets=RTF_BUCKETS,
+)
+TTS_BATCH_SIZE = Histogram(
+    "einstein_tts_batch_size",
+    "Sentences synthesised together per batched inference.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+)
+TTS_QUEUE_DEPTH = Gauge("einstein_tts_queue_depth", "Sentences waiting for a synthesis worker.")
+TTS_STORE_LOOKUPS = Counter(
+    "einstein_tts_store_lookups_total",
+    "Sentences looked up in the pre-rendered audio store, by result (hit or miss).",
+    ("result",),
+)
+
+STT_STAGE = Histogram(
+    "einstein_stt_stage_seconds", "Speech-to-text time by stage (decode, listen, recognize).", ("stage",)
+)
+
+ADMISSION_IN_FLIGHT = Gauge("einstein_admission_in_flight", "Answers admitted and being produced.")
+ADMISSION_QUEUED = Gauge("einstein_admission_queued", "Answers waiting for admission.")
+ADMISSION_REJECTED = Counter(
+    "einstein_admission_rejected_total",
+    "Requests turned away, by reason (rate_limited, overloaded, timeout).",
+    ("reason",),
+)
+ADMISSION_WAIT = Histogram("einstein_admission_wait_seconds", "Time spent queued before admission.")
+
+ADK_IN_FLIGHT = Gauge("einstein_adk_in_flight", "ADK requests currently holding a connection.")
+
+COLD_START = Gauge(
+    "einstein_cold_start_seconds",
+    "Seconds from process start until each start-up stage finished.",
+    ("stage",),
+)
+READY = Gauge("einstein_ready", "1 once this worker has finished warming up.")
+
+SESSIONS = Gauge(
+    "einstein_sessions", "ADK sessions this worker knows of, by state (live or pooled).", ("state",)
+)
+SESSIONS_EVICTED = Counter(
+    "einstein_sessions_evicted_total",
+    "ADK sessions deleted by the sweep, by reason (idle or capacity).",
+    ("reason",),
+)
+SESSION_REGISTRY_BYTES = Gauge(
+    "einstein_session_registry_bytes", "Approximate memory held by this worker's session registry."
+)
+PROCESS_RESIDENT_BYTES = Gauge("einstein_process_resident_bytes", "Resident memory of this worker process.")
+
+
+# ─────────────────────────────────────
+# Tracing
+# ─────────────────────────────────────
+_tracer = None
+
+
+def configure_tracing(service_name: str = "einstein-api"):
+    """Export spans over OTLP/HTTP when an endpoint is configured and the SDK is installed."""
+    global _tracer
+    if not OTEL_AVAILABLE:
+        return
+    if not (
+        os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+        or os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+    ):
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning("Tracing disabled, OpenTelemetry SDK unavailable: %s", e)
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create(
+            {"service.name": os.environ.get("OTEL_SERVICE_NAME", service_name)}
+        )
+    )
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    otel_trace.set_tracer_provider(provider)
+    _tracer = otel_trace.get_tracer("einstein")
+    logger.info("Exporting traces over OTLP")
+
+
+class Span:
+    """A timed unit of work, exported to OpenTelemetry when tracing is on."""
+
+    def __init__(self, name: str, parent: "Span | None" = None, **attributes):
+        self.name = name
+        self.started = time.perf_counter()
+        self._otel = None
+        if _tracer is not None:
+            context = None
+            if parent is not None and parent._otel is not None:
+                context = otel_trace.set_span_in_context(parent._otel)
+            self._otel = _tracer.start_span(name, context=context, attributes=attributes)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def set(self, key: str, value):
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def event(self, name: str, **attributes):
+        if self._otel is not None:
+            self._otel.add_event(name, attributes)
+
+    def end(self, error: BaseException | None = None):
+        if self._otel is None:
+            return
+        if error is not None:
+            self._otel.record_exception(error)
+            self._otel.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, str(error)))
+        self._otel.end()
+        self._otel = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc)
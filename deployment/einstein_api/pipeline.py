@@ -0,0 +1,139 @@
+"""
+Pipelined response engine: ADK text -> sentences -> speech, all overlapping.
+
+    producer      reads ADK chunks, forwards text/tool events at once and
+                  cuts the text into sentences
+    synth queue   bounded queue of sentences waiting for synthesis
+    synthesizer   renders sentences in order while the producer keeps reading
+    emitter       `events()` merges both streams for the transport
+
+Previously the generator stopped reading from ADK while a sentence was being
+synthesised. Here text keeps flowing during synthesis, and sentence N+1 is
+already queued when sentence N's audio has been sent.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+
+from adk_client import ADKChunk
+from metrics import SENTENCE_WAIT
+from segmenter import SentenceSegmenter
+
+_END = object()
+
+
+class ResponsePipeline:
+    def __init__(
+        self,
+        adk_chunks: AsyncIterator[ADKChunk],
+        synthesize: Callable[[str], AsyncIterator[dict]],
+        max_pending_sentences: int = 4,
+        max_pending_events: int = 64,
+        segmenter: SentenceSegmenter | None = None,
+    ):
+        """
+        `synthesize(sentence)` must yield the audio (or error) events for one
+        sentence. The bounded queues apply back-pressure: a slow client
+        eventually pauses the ADK read instead of buffering without limit.
+        """
+        self.adk_chunks = adk_chunks
+        self.synthesize = synthesize
+        self.segmenter = segmenter or SentenceSegmenter()
+        self._sentences: asyncio.Queue = asyncio.Queue(maxsize=max_pending_sentences)
+        self._events: asyncio.Queue = asyncio.Queue(maxsize=max_pending_events)
+
+        self._started = 0.0
+        self.timings: dict[str, float] = {}
+
+    def _mark(self, name: str):
+        if name not in self.timings:
+            self.timings[name] = round((time.perf_counter() - self._started) * 1000, 1)
+
+    async def _produce(self):
+        streamed_text = False
+        # When the oldest text still sitting in the segmenter arrived
+        pending_since = None
+
+        async for adk_chunk in self.adk_chunks:
+            if adk_chunk.kind in ("tool_call", "tool_result"):
+                await self._events.put({"type": adk_chunk.kind, "name": adk_chunk.text})
+                continue
+            if adk_chunk.kind == "error":
+                await self._events.put({"type": "error", "message": adk_chunk.text})
+                continue
+            if adk_chunk.kind == "final":
+                await self._events.put({"type": "final", "content": adk_chunk.text})
+                # Partial text has already been spoken; only fall back to
+                # the final answer when the model did not stream.
+                if streamed_text:
+                    continue
+
+            streamed_text = True
+            text_chunk = adk_chunk.text
+
+            self._mark("first_text_ms")
+            await self._events.put({"type": "text", "content": text_chunk})
+
+            now = time.perf_counter()
+            if pending_since is None:
+                pending_since = now
+            for sentence in self.segmenter.feed(text_chunk):
+                self._mark("first_sentence_ms")
+                SENTENCE_WAIT.observe(now - pending_since)
+                pending_since = now
+                await self._sentences.put(sentence)
+            if not self.segmenter.pending:
+                pending_since = None
+
+        # Final leftover text
+        rest = self.segmenter.flush()
+        if rest:
+            self._mark("first_sentence_ms")
+            SENTENCE_WAIT.observe(time.perf_counter() - pending_since)
+            await self._sentences.put(rest)
+
+        await self._sentences.put(_END)
+
+    async def _synthesize(self):
+        while True:
+            sentence = await self._sentences.get()
+            if sentence is _END:
+                return
+            async for event in self.synthesize(sentence):
+                if event["type"] == "audio":
+                    self._mark("first_audio_ms")
+                await self._events.put(event)
+
+    async def _run_stage(self, stage):
+        # No `finally` here: a cancelled stage must not block on a full queue
+        try:
+            await stage()
+        except Exception as e:
+            await self._events.put(e)
+        await self._events.put(_END)
+
+    async def events(self) -> AsyncIterator[dict]:
+        """Yield text, tool, audio and error events until the answer is complete."""
+        self._started = time.perf_counter()
+        stages = [
+            asyncio.create_task(self._run_stage(self._produce)),
+            asyncio.create_task(self._run_stage(self._synthesize)),
+        ]
+        running = len(stages)
+
+        try:
+            while running:
+                event = await self._events.get()
+                if event is _END:
+                    running -= 1
+                elif isinstance(event, Exception):
+                    raise event
+                else:
+                    yield event
+            self._mark("total_ms")
+        finally:
+            # Also runs when the consumer goes away mid-answer
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
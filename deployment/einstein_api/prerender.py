@@ -0,0 +1,191 @@
+# python prerender.py answers.csv --workers 4
+
+"""
+Pre-render sentences in the Einstein voice into a packed audio store.
+
+Takes text files (one entry per line, # comments skipped) and CSV files
+(the --column column), plus by default the domain lexicon and the phrases
+the agent is told to say word for word in agent.py. Each entry is streamed
+through a SentenceSegmenter a word at a time and normalized exactly as live
+answers are (see `spoken_sentences`), and the sentences are synthesised across a pool
+of processes, each holding its own single-threaded Piper session. The result
+is written to an AudioStore (audio_store.py) that the API maps and serves
+before falling back to live synthesis.
+
+Reports the real-time factor (synthesis time / audio time) and throughput in
+seconds of audio per wall-clock second, overall and per core.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import time
+
+from audio_store import DEFAULT_STORE, AudioStore, write_store
+from segmenter import SentenceSegmenter
+from speech_text import normalize_for_speech
+from tts_cache import DEFAULT_LEXICON, load_lexicon, model_fingerprint, normalize_text
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(HERE, "piper_model", "en_GB-alaneinstein-medium.onnx")
+DEFAULT_AGENT = os.path.join(HERE, "..", "uon_agent_albeee", "agent.py")
+
+# A prompt string that is entirely a 'quoted phrase' is one the agent says verbatim
+_VERBATIM = re.compile(r"\"'([^'\"\n]+)'\"")
+# A word and the whitespace after it, roughly how ADK streams text
+_STREAMED_WORD = re.compile(r"\S+\s*")
+
+
+def read_corpus(path: str, column: str) -> list[str]:
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return [row[column] for row in csv.DictReader(f) if row.get(column)]
+    return load_lexicon(path)
+
+
+def agent_phrases(path: str) -> list[str]:
+    """Phrases the agent's instructions quote for it to say word for word (the disclaimer)."""
+    with open(path, "r", encoding="utf-8") as f:
+        source = "\n".join(line for line in f if not line.lstrip().startswith("#"))
+    return [match.group(1).strip() for match in _VERBATIM.finditer(source)]
+
+
+def streamed_segments(entry: str, segmenter: SentenceSegmenter) -> list[str]:
+    """Feed `entry` to the segmenter a word at a time, as the live pipeline does, then flush."""
+    parts = []
+    for word in _STREAMED_WORD.findall(entry):
+        parts += segmenter.feed(word)
+    rest = segmenter.flush()
+    return parts + ([rest] if rest else [])
+
+
+def spoken_sentences(entries: list[str]) -> list[str]:
+    """
+    The sentences live answers would synthesise for `entries`, normalized for
+    speech and deduplicated. Each entry is segmented both as the opening of an
+    answer, where the first clause is released early at a comma, and as text
+    further into one, where it is not.
+    """
+    seen, sentences = set(), []
+    for entry in entries:
+        for segmenter in (SentenceSegmenter(), SentenceSegmenter(first_clause_max_chars=0)):
+            for part in streamed_segments(entry, segmenter):
+                spoken = normalize_for_speech(part).strip()
+                key = normalize_text(spoken)
+                if key and key not in seen:
+                    seen.add(key)
+                    sentences.append(spoken)
+    return sentences
+
+
+# ─────────────────────────────────────
+# Worker processes
+# ─────────────────────────────────────
+_voice = None
+
+
+def _init_worker(model_path: str, threads: int):
+    global _voice
+    from tts_engine import load_voice
+
+    _voice = load_voice(model_path, intra_op_threads=threads, inter_op_threads=1)
+
+
+def _render(text: str) -> tuple[str, bytes, float, float]:
+    """(text, int16 PCM, wall seconds, CPU seconds) for one sentence."""
+    started, cpu_started = time.perf_counter(), time.process_time()
+    pcm = b"".join(chunk.audio_int16_bytes for chunk in _voice.synthesize(text))
+    return text, pcm, time.perf_counter() - started, time.process_time() - cpu_started
+
+
+def render_all(sentences: list[str], model_path: str, workers: int, threads: int):
+    """Yield `_render` results as the pool finishes them."""
+    if not sentences:
+        return
+    with multiprocessing.get_context("spawn").Pool(
+        workers, initializer=_init_worker, initargs=(model_path, threads)
+    ) as pool:
+        yield from pool.imap_unordered(_render, sentences, chunksize=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="Text or CSV files")
+    parser.add_argument("--column", default="text", help="CSV column holding the text")
+    parser.add_argument("--no-defaults", action="store_true", help="Skip the lexicon and agent phrases")
+    parser.add_argument("--agent", default=DEFAULT_AGENT)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--out", default=os.environ.get("AUDIO_STORE_PATH") or DEFAULT_STORE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=1, help="onnxruntime threads per worker")
+    parser.add_argument("--rebuild", action="store_true", help="Render everything, ignoring the existing store")
+    args = parser.parse_args()
+
+    entries = []
+    if not args.no_defaults:
+        entries += load_lexicon(DEFAULT_LEXICON)
+        if os.path.exists(args.agent):
+            entries += agent_phrases(args.agent)
+    for path in args.corpus:
+        entries += read_corpus(path, args.column)
+    sentences = spoken_sentences(entries)
+
+    model_id = model_fingerprint(args.model)
+    with open(f"{args.model}.json", "r", encoding="utf-8") as config_file:
+        sample_rate = json.load(config_file)["audio"]["sample_rate"]
+
+    # Keep sentences the existing store already has for this voice
+    reused: dict[str, bytes] = {}
+    if not args.rebuild and os.path.exists(args.out):
+        try:
+            existing = AudioStore(args.out, model_id)
+            for sentence in sentences:
+                pcm = existing.get(sentence)
+                if pcm is not None:
+                    reused[sentence] = bytes(pcm)
+        except ValueError as e:
+            print(f"Re-rendering everything: {e}")
+    pending = [s for s in sentences if s not in reused]
+
+    rendered: dict[str, bytes] = {}
+    synthesis_s = cpu_s = 0.0
+    started = time.perf_counter()
+    for done, (text, pcm, wall, cpu) in enumerate(render_all(pending, args.model, args.workers, args.threads), 1):
+        rendered[text] = pcm
+        synthesis_s += wall
+        cpu_s += cpu
+        if done % 25 == 0 or done == len(pending):
+            print(f"[{done}/{len(pending)}] {done / (time.perf_counter() - started):.1f} sentences/s", flush=True)
+    wall_s = time.perf_counter() - started
+
+    write_store(
+        args.out,
+        model_id,
+        sample_rate,
+        ((s, rendered.get(s) or reused.get(s)) for s in sentences),
+    )
+
+    audio_s = sum(map(len, rendered.values())) / 2 / sample_rate
+    workers = min(args.workers, len(pending)) or 1
+    print(json.dumps({
+        "store": args.out,
+        "store_bytes": os.path.getsize(args.out),
+        "sentences": len(sentences),
+        "rendered": len(rendered),
+        "reused": len(reused),
+        "workers": workers,
+        "audio_s": round(audio_s, 2),
+        "wall_s": round(wall_s, 2),
+        "synthesis_s": round(synthesis_s, 2),
+        "cpu_s": round(cpu_s, 2),
+        "rtf": round(synthesis_s / audio_s, 3) if audio_s else None,
+        "audio_s_per_s": round(audio_s / wall_s, 2) if wall_s and audio_s else None,
+        "audio_s_per_core_s": round(audio_s / (wall_s * workers), 2) if wall_s and audio_s else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Incremental sentence segmenter for streamed model text.
+
+Text arrives from ADK in arbitrary chunks, so a boundary can sit anywhere
+inside a chunk. The segmenter scans the growing buffer from where it last
+stopped and releases each sentence as soon as its end is certain:
+
+- ".", "!", "?", ";", ":" and newlines end a sentence when followed by
+  whitespace (closing quotes and brackets stay with the sentence);
+- abbreviations ("Dr.", "e.g."), initials ("A. Einstein"), decimals ("3.5")
+  and times ("10:30") do not;
+- the first clause of an answer may be released early at a comma so speech
+  can start sooner;
+- a sentence longer than `max_chars` is force-split at the last comma or
+  space so a run-on answer never stalls audio.
+"""
+
+import re
+
+TERMINATORS = ".!?;:"
+CLOSERS = "\"')]}’”"
+
+ABBREVIATIONS = frozenset(
+    {
+        "dr", "mr", "mrs", "ms", "prof", "st", "sr", "jr", "vs", "etc",
+        "e.g", "i.e", "approx", "dept", "fig", "eq", "vol", "ch",
+        "sec", "inc", "ltd", "co", "jan", "feb", "mar", "apr", "jun", "jul",
+        "aug", "sep", "sept", "oct", "nov", "dec", "u.k", "u.s", "ph.d", "b.sc",
+        "m.sc", "m.sci", "hons",
+    }
+)
+
+_WORD_BEFORE = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+
+
+class SentenceSegmenter:
+    def __init__(
+        self,
+        max_chars: int = 240,
+        first_clause_min_chars: int = 24,
+        first_clause_max_chars: int = 120,
+    ):
+        self.max_chars = max_chars
+        self.first_clause_min_chars = first_clause_min_chars
+        self.first_clause_max_chars = first_clause_max_chars
+
+        self._buffer = ""
+        self._scan = 0
+        self._emitted = 0
+
+    @property
+    def pending(self) -> bool:
+        """Whether text is buffered that has not been released yet."""
+        return bool(self._buffer.strip())
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text and return every sentence it completes."""
+        self._buffer += text
+        sentences = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            sentence, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            self._scan = 0
+            if sentence.strip():
+                sentences.append(sentence)
+                self._emitted += 1
+        return sentences
+
+    def flush(self) -> str | None:
+        """Return whatever is left once the stream has ended."""
+        rest, self._buffer, self._scan = self._buffer, "", 0
+        return rest if rest.strip() else None
+
+    def _find_cut(self) -> int | None:
+        buffer = self._buffer
+        n = len(buffer)
+
+        i = self._scan
+        while i < n:
+            ch = buffer[i]
+            if ch == "\n":
+                return i + 1
+            if ch in TERMINATORS:
+                end = self._boundary_end(i)
+                if end == -1:
+                    # Undecidable until more text arrives; rescan from here
+                    self._scan = i
+                    return self._fallback_cut()
+                if end is not None:
+                    return end
+            i += 1
+
+        self._scan = n
+        return self._fallback_cut()
+
+    def _boundary_end(self, i: int) -> int | None:
+        """
+        Where the sentence ending at buffer[i] ends, None if buffer[i] is not
+        a boundary, or -1 if that depends on text that has not arrived yet.
+        """
+        buffer = self._buffer
+        n = len(buffer)
+        ch = buffer[i]
+
+        # Swallow runs like "?!" or "..." and any closing quotes/brackets
+        j = i + 1
+        while j < n and buffer[j] in TERMINATORS:
+            j += 1
+        while j < n and buffer[j] in CLOSERS:
+            j += 1
+        if j == n:
+            return -1
+        if not buffer[j].isspace():
+            # "3.5", "10:30", "e.g.", "nottingham.ac.uk"
+            return None
+
+        if ch == "." and j == i + 1 and self._is_abbreviation(i):
+            return None
+        return j
+
+    def _is_abbreviation(self, dot: int) -> bool:
+        match = _WORD_BEFORE.search(self._buffer, 0, dot)
+        if not match:
+            return False
+        word = match.group(1)
+        if len(word) == 1 and word.isupper() and word != "I":
+            # An initial, as in "A. Einstein"
+            return True
+        return word.lower() in ABBREVIATIONS
+
+    def _fallback_cut(self) -> int | None:
+        buffer = self._buffer
+
+        if self._emitted == 0 and len(buffer) >= self.first_clause_min_chars:
+            comma = buffer.find(", ", self.first_clause_min_chars - 1, self.first_clause_max_chars)
+            if comma != -1:
+                return comma + 2
+
+        if len(buffer) > self.max_chars:
+            window = buffer[: self.max_chars]
+            for sep in (", ", " "):
+                cut = window.rfind(sep)
+                if cut > 0:
+                    return cut + len(sep)
+            return self.max_chars
+
+        return None
@@ -0,0 +1,350 @@
+"""
+ADK session lifecycle: a registry of known sessions, a pool of pre-created
+ones, and idle eviction.
+
+The ADK api_server keeps every session in memory until it is deleted, and
+clients rarely say goodbye: kiosks and phones just stop asking. Each worker
+keeps a registry of the sessions it has seen, so answers for a known session
+go straight to run_sse and an unknown one is created lazily on its first
+answer (no separate /init round-trip needed). New visitors can be handed a
+session created ahead of time from a small pool (`/session/new`).
+
+A background sweep deletes sessions idle for longer than `ttl_s`, at most
+`evict_batch` per pass. Workers do not share registries, so before deleting
+a session the sweep asks ADK when it was last updated; one that another
+worker has used recently is kept and its local idle time reset.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import httpx
+
+from metrics import PROCESS_RESIDENT_BYTES, SESSION_REGISTRY_BYTES, SESSIONS, SESSIONS_EVICTED, logger
+
+# create/delete/fetch an ADK session; None when ADK could not be reached
+SessionCall = Callable[[str, str], Awaitable[httpx.Response | None]]
+
+CREATED_STATUSES = (200, 201, 409)
+
+
+@dataclass
+class SessionRecord:
+    created: float
+    last_used: float
+    answers: int = 0
+
+
+def resident_bytes() -> int | None:
+    """Resident set size of this process (Linux), None elsewhere."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def new_session_ids() -> tuple[str, str]:
+    return f"u_{uuid.uuid4().hex[:12]}", f"s_{uuid.uuid4().hex[:12]}"
+
+
+class SessionManager:
+    def __init__(
+        self,
+        create: SessionCall,
+        delete: SessionCall,
+        fetch: SessionCall,
+        ttl_s: float = 1800.0,
+        pool_size: int = 0,
+        sweep_s: float = 60.0,
+        evict_batch: int = 32,
+        max_sessions: int = 10000,
+        on_evict: Callable[[str, str], None] | None = None,
+    ):
+        self._create = create
+        self._delete = delete
+        self._fetch = fetch
+        self.ttl_s = ttl_s
+        self.pool_size = pool_size
+        self.sweep_s = sweep_s
+        self.evict_batch = evict_batch
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+
+        # Least recently used first
+        self._live: OrderedDict[tuple[str, str], SessionRecord] = OrderedDict()
+        self._pool: deque[tuple[str, str]] = deque()
+        self._creating: dict[tuple[str, str], asyncio.Future] = {}
+        self._refill_task: asyncio.Task | None = None
+        self._sweep_task: asyncio.Task | None = None
+
+        self.created = 0
+        self.lazily_created = 0
+        self.pooled_handed_out = 0
+        self.pool_misses = 0
+        self.evicted = 0
+        self.kept_alive = 0
+        self.create_failures = 0
+
+    # ── registry ──────────────────────────────────────────
+    def known(self, uid: str, sid: str) -> bool:
+        return (uid, sid) in self._live
+
+    def register(self, uid: str, sid: str):
+        now = time.time()
+        record = self._live.pop((uid, sid), None) or SessionRecord(created=now, last_used=now)
+        record.last_used = now
+        self._live[(uid, sid)] = record
+
+    def touch(self, uid: str, sid: str, answer: bool = False):
+        record = self._live.get((uid, sid))
+        if record is None:
+            return
+        record.last_used = time.time()
+        if answer:
+            record.answers += 1
+        self._live.move_to_end((uid, sid))
+
+    def forget(self, uid: str, sid: str):
+        """The client deleted the session itself."""
+        self._live.pop((uid, sid), None)
+
+    async def ensure(self, uid: str, sid: str) -> bool:
+        """
+        Make sure ADK has the session before an answer is requested: free for
+        a session in the registry, one create call otherwise (shared by
+        concurrent callers). Returns False if it could not be created.
+        """
+        key = (uid, sid)
+        if key in self._live:
+            self.touch(uid, sid, answer=True)
+            return True
+
+        pending = self._creating.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._creating[key] = future
+        try:
+            ok = await self._create_session(uid, sid)
+            if ok:
+                self.lazily_created += 1
+                self.touch(uid, sid, answer=True)
+            future.set_result(ok)
+            return ok
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._creating[key]
+
+    async def _create_session(self, uid: str, sid: str) -> bool:
+        response = await self._create(uid, sid)
+        if response is None or response.status_code not in CREATED_STATUSES:
+            self.create_failures += 1
+            return False
+        self.created += 1
+        self.register(uid, sid)
+        return True
+
+    # ── pre-created pool ──────────────────────────────────
+    async def new_session(self) -> tuple[str, str, bool]:
+        """
+        IDs for a new visitor: a pre-created session from the pool when one
+        is ready, otherwise a session created now. Returns (uid, sid, pooled);
+        raises ConnectionError if ADK cannot create one.
+        """
+        if self._pool:
+            uid, sid = self._pool.popleft()
+            self.pooled_handed_out += 1
+            self.register(uid, sid)
+            self.refill()
+            return uid, sid, True
+
+        self.pool_misses += 1
+        self.refill()
+        uid, sid = new_session_ids()
+        if not await self._create_session(uid, sid):
+            raise ConnectionError("ADK could not create a session")
+        return uid, sid, False
+
+    def refill(self):
+        """Top the pool up in the background, e.g. once ADK is reachable."""
+        if self.pool_size > 0 and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self._pool) < self.pool_size:
+            uid, sid = new_session_ids()
+            response = await self._create(uid, sid)
+            if response is None or response.status_code not in CREATED_STATUSES:
+                # ADK is not up yet; the next hand-out tries again
+                self.create_failures += 1
+                return
+            self.created += 1
+            self._pool.append((uid, sid))
+            self.update_gauges()
+
+    # ── idle eviction ─────────────────────────────────────
+    def _candidates(self, now: float) -> list[tuple[str, str]]:
+        """Oldest sessions first: idle past the TTL, or beyond `max_sessions`."""
+        over_capacity = len(self._live) - self.max_sessions
+        candidates = []
+        for key, record in self._live.items():
+            if len(candidates) >= self.evict_batch:
+                break
+            if not self._idle(record, now) and len(candidates) >= over_capacity:
+                break
+            candidates.append(key)
+        return candidates
+
+    def _idle(self, record: SessionRecord, now: float) -> bool:
+        return self.ttl_s > 0 and record.last_used <= now - self.ttl_s
+
+    async def _evict(self, key: tuple[str, str], now: float) -> str | None:
+        """Delete one session unless ADK saw it recently; returns why it went, if it did."""
+        record = self._live.get(key)
+        if record is None:
+            return None
+        idle = self._idle(record, now)
+
+        gone = False
+        if idle:
+            response = await self._fetch(*key)
+            if response is None:
+                return None
+            if response.status_code == 404:
+                gone = True
+            elif response.status_code == 200:
+                try:
+                    updated = float(response.json().get("lastUpdateTime") or 0)
+                except (ValueError, TypeError):
+                    updated = 0.0
+                if updated > now - self.ttl_s:
+                    # Another worker is serving this visitor
+                    record.last_used = max(record.last_used, updated)
+                    self._live.move_to_end(key)
+                    self.kept_alive += 1
+                    return None
+
+        if not gone:
+            response = await self._delete(*key)
+            if response is None or response.status_code >= 500:
+                return None
+
+        self._live.pop(key, None)
+        if self.on_evict is not None:
+            self.on_evict(*key)
+        return "idle" if idle else "capacity"
+
+    async def evict_idle(self) -> int:
+        """One sweep: delete up to `evict_batch` idle sessions concurrently."""
+        now = time.time()
+        candidates = self._candidates(now)
+        if not candidates:
+            return 0
+        reasons = await asyncio.gather(
+            *(self._evict(key, now) for key in candidates), return_exceptions=True
+        )
+        evicted = 0
+        for reason in reasons:
+            if isinstance(reason, Exception):
+                logger.warning("Session eviction failed: %s", reason)
+            elif reason is not None:
+                evicted += 1
+                SESSIONS_EVICTED.inc(reason=reason)
+        self.evicted += evicted
+        if evicted:
+            logger.info("Evicted %d idle sessions, %d live", evicted, len(self._live))
+        self.update_gauges()
+        return evicted
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_s)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.warning("Session sweep failed: %s", e)
+
+    # ── lifecycle ─────────────────────────────────────────
+    def start(self):
+        if self.sweep_s > 0 and self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+        self.refill()
+
+    async def aclose(self):
+        """Stop the background tasks and delete pooled sessions nobody was given."""
+        for task in (self._sweep_task, self._refill_task):
+            if task is not None:
+                task.cancel()
+        pooled, self._pool = list(self._pool), deque()
+        await asyncio.gather(*(self._delete(uid, sid) for uid, sid in pooled), return_exceptions=True)
+
+    def registry_bytes(self) -> int:
+        """Approximate memory held by the registry and pool."""
+        size = sys.getsizeof(self._live) + sys.getsizeof(self._pool)
+        for (uid, sid), record in self._live.items():
+            size += sys.getsizeof(uid) + sys.getsizeof(sid) + sys.getsizeof(record) + 56
+        for uid, sid in self._pool:
+            size += sys.getsizeof(uid) + sys.getsizeof(sid) + 56
+        return size
+
+    def update_gauges(self):
+        SESSIONS.set(len(self._live), state="live")
+        SESSIONS.set(len(self._pool), state="pooled")
+        SESSION_REGISTRY_BYTES.set(self.registry_bytes())
+        rss = resident_bytes()
+        if rss is not None:
+            PROCESS_RESIDENT_BYTES.set(rss)
+
+    def stats(self) -> dict:
+        self.update_gauges()
+        now = time.time()
+        return {
+            "live": len(self._live),
+            "pooled": len(self._pool),
+            "pool_size": self.pool_size,
+            "ttl_s": self.ttl_s,
+            "idle": sum(1 for r in self._live.values() if self._idle(r, now)),
+            "created": self.created,
+            "lazily_created": self.lazily_created,
+            "pooled_handed_out": self.pooled_handed_out,
+            "pool_misses": self.pool_misses,
+            "evicted": self.evicted,
+            "kept_alive": self.kept_alive,
+            "create_failures": self.create_failures,
+            "registry_bytes": self.registry_bytes(),
+            "resident_bytes": resident_bytes(),
+        }
+
+
+def sessions_from_env(create: SessionCall, delete: SessionCall, fetch: SessionCall, on_evict=None) -> SessionManager:
+    """
+    Build the manager from SESSION_TTL_S (idle seconds before deletion, 0
+    disables idle eviction), SESSION_POOL_SIZE (pre-created sessions per worker),
+    SESSION_SWEEP_S, SESSION_EVICT_BATCH and SESSION_MAX.
+    """
+    return SessionManager(
+        create,
+        delete,
+        fetch,
+        ttl_s=float(os.environ.get("SESSION_TTL_S", "1800")),
+        pool_size=int(os.environ.get("SESSION_POOL_SIZE", "2")),
+        sweep_s=float(os.environ.get("SESSION_SWEEP_S", "60")),
+        evict_batch=int(os.environ.get("SESSION_EVICT_BATCH", "32")),
+        max_sessions=int(os.environ.get("SESSION_MAX", "10000")),
+        on_evict=on_evict,
+    )
@@ -0,0 +1,486 @@
+"""
+Text normalization for speech.
+
+Model answers contain markdown, prices, dates, units, URLs and physics
+notation that Piper (through espeak) would read out literally or not at all.
+`normalize_for_speech` rewrites them into words before synthesis.
+
+The rules live in one ordered table. `SpeechNormalizer` compiles the table
+into a single alternation with one named group per rule, so a sentence is
+scanned once: at each position the first rule that matches wins, and its
+handler turns the match into words. Rules listed earlier therefore take
+precedence (a price is read as money before its digits are read as a plain
+number).
+
+A big alternation is slow to try at every character, so each rule also
+names trigger substrings. Only rules whose triggers occur in the sentence
+join its pass, and the pattern for each combination of rules is compiled
+once and cached; most sentences need just a handful of rules.
+"""
+
+import re
+from collections.abc import Callable
+from functools import lru_cache
+from itertools import groupby
+from typing import NamedTuple
+
+# ─────────────────────────────────────
+# Numbers
+# ─────────────────────────────────────
+ONES = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+    "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+    "seventeen", "eighteen", "nineteen",
+]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+SCALES = [(10**9, "billion"), (10**6, "million"), (1000, "thousand")]
+IRREGULAR_ORDINALS = {
+    "one": "first", "two": "second", "three": "third", "five": "fifth",
+    "eight": "eighth", "nine": "ninth", "twelve": "twelfth",
+}
+SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁻", "0123456789-")
+MONTHS = [
+    "January", "February", "March", "April", "May", "June", "July",
+    "August", "September", "October", "November", "December",
+]
+
+
+def _under_thousand(n: int) -> str:
+    words = []
+    if n >= 100:
+        words.append(f"{ONES[n // 100]} hundred")
+        n %= 100
+        if n:
+            words.append("and")
+    if n >= 20:
+        words.append(TENS[n // 10] + (f"-{ONES[n % 10]}" if n % 10 else ""))
+    elif n:
+        words.append(ONES[n])
+    return " ".join(words)
+
+
+def digits_to_words(digits: str) -> str:
+    return " ".join(ONES[int(d)] for d in digits if d.isdigit())
+
+
+def number_to_words(n: int) -> str:
+    """British English cardinal: 2535 -> "two thousand five hundred and thirty-five"."""
+    if n < 0:
+        return f"minus {number_to_words(-n)}"
+    if n < 1000:
+        return _under_thousand(n) if n else "zero"
+    if n >= 10**12:
+        return digits_to_words(str(n))
+    parts = []
+    for value, name in SCALES:
+        if n >= value:
+            parts.append(f"{_under_thousand(n // value)} {name}")
+            n %= value
+    if n:
+        parts.append(("and " if n < 100 else "") + _under_thousand(n))
+    return " ".join(parts)
+
+
+def decimal_to_words(text: str) -> str:
+    """ "9,535" -> cardinal, "3.14" -> "three point one four", "007" -> digit by digit."""
+    whole, _, fraction = text.replace(",", "").partition(".")
+    if len(whole) > 1 and whole.startswith("0"):
+        words = digits_to_words(whole)
+    else:
+        words = number_to_words(int(whole or "0"))
+    if fraction:
+        words += f" point {digits_to_words(fraction)}"
+    return words
+
+
+def ordinal_to_words(n: int) -> str:
+    cardinal = number_to_words(n)
+    head, sep, last = cardinal.rpartition(" ")
+    prefix, hyphen, last = last.rpartition("-")
+    if last in IRREGULAR_ORDINALS:
+        last = IRREGULAR_ORDINALS[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return f"{head}{sep}{prefix}{hyphen}{last}"
+
+
+def year_to_words(year: int) -> str:
+    """2025 -> "twenty twenty-five", 1905 -> "nineteen oh five", 2005 -> "two thousand and five"."""
+    if 2000 <= year < 2010 or year % 1000 == 0 or not 1000 <= year < 10000:
+        return number_to_words(year)
+    century, rest = divmod(year, 100)
+    if rest == 0:
+        return f"{number_to_words(century)} hundred"
+    if rest < 10:
+        return f"{number_to_words(century)} oh {ONES[rest]}"
+    return f"{number_to_words(century)} {number_to_words(rest)}"
+
+
+def _month(name: str) -> str:
+    name = name.rstrip(".").lower()
+    for month in MONTHS:
+        if month.lower().startswith(name[:3]):
+            return month
+    return name
+
+
+# ─────────────────────────────────────
+# Rule handlers
+# ─────────────────────────────────────
+CURRENCIES = {"£": ("pound", "pounds"), "$": ("dollar", "dollars"), "€": ("euro", "euros")}
+SCALE_WORDS = {"k": "thousand", "m": "million", "bn": "billion"}
+
+UNITS = {
+    "km": ("kilometre", "kilometres"), "m": ("metre", "metres"), "cm": ("centimetre", "centimetres"),
+    "mm": ("millimetre", "millimetres"), "µm": ("micrometre", "micrometres"),
+    "μm": ("micrometre", "micrometres"), "nm": ("nanometre", "nanometres"),
+    "kg": ("kilogram", "kilograms"), "g": ("gram", "grams"), "mg": ("milligram", "milligrams"),
+    "s": ("second", "seconds"), "ms": ("millisecond", "milliseconds"),
+    "ns": ("nanosecond", "nanoseconds"), "h": ("hour", "hours"),
+    "Hz": ("hertz", "hertz"), "kHz": ("kilohertz", "kilohertz"), "MHz": ("megahertz", "megahertz"),
+    "GHz": ("gigahertz", "gigahertz"), "THz": ("terahertz", "terahertz"),
+    "eV": ("electronvolt", "electronvolts"), "keV": ("kiloelectronvolt", "kiloelectronvolts"),
+    "MeV": ("mega electronvolt", "mega electronvolts"), "GeV": ("giga electronvolt", "giga electronvolts"),
+    "TeV": ("tera electronvolt", "tera electronvolts"),
+    "W": ("watt", "watts"), "kW": ("kilowatt", "kilowatts"), "MW": ("megawatt", "megawatts"),
+    "GW": ("gigawatt", "gigawatts"), "J": ("joule", "joules"), "kJ": ("kilojoule", "kilojoules"),
+    "V": ("volt", "volts"), "kV": ("kilovolt", "kilovolts"), "N": ("newton", "newtons"),
+    "Pa": ("pascal", "pascals"), "kPa": ("kilopascal", "kilopascals"),
+    "°C": ("degree Celsius", "degrees Celsius"), "°F": ("degree Fahrenheit", "degrees Fahrenheit"),
+    "mph": ("mile per hour", "miles per hour"), "km/h": ("kilometre per hour", "kilometres per hour"),
+    "m/s": ("metre per second", "metres per second"),
+    "m/s²": ("metre per second squared", "metres per second squared"),
+}
+# Single letters are only units when spaced from the number ("10 s", not "5m people")
+_SPACED_UNITS = {"m", "g", "s", "h", "W", "J", "V", "N"}
+
+SYMBOLS = {
+    "α": "alpha", "β": "beta", "γ": "gamma", "δ": "delta", "Δ": "delta", "ε": "epsilon",
+    "θ": "theta", "λ": "lambda", "μ": "mu", "ν": "nu", "π": "pi", "ρ": "rho", "σ": "sigma",
+    "Σ": "sigma", "τ": "tau", "φ": "phi", "χ": "chi", "ψ": "psi", "ω": "omega", "Ω": "omega",
+    "ħ": "h bar", "≈": "approximately", "±": "plus or minus", "×": "times", "÷": "divided by",
+    "≤": "less than or equal to", "≥": "greater than or equal to", "≠": "not equal to",
+    "∞": "infinity", "∝": "proportional to", "√": "the square root of", "→": "to",
+    "°": "degrees", "&": "and", "=": "equals",
+}
+
+DOMAIN_PARTS = {"uk": "U K", "ac": "A C", "edu": "E D U", "io": "I O", "www": "W W W"}
+
+
+def _plural(words: tuple[str, str], amount: str) -> str:
+    return words[0] if amount in ("1", "1.0") else words[1]
+
+
+def _currency(_, symbol, amount, cents, scale):
+    singular, plural = CURRENCIES[symbol]
+    if scale:
+        scale_word = SCALE_WORDS.get(scale.strip().lower(), scale.strip().lower())
+        number = decimal_to_words(f"{amount}.{cents}" if cents else amount)
+        return f"{number} {scale_word} {plural}"
+    words = f"{number_to_words(int(amount.replace(',', '')))} {_plural((singular, plural), amount)}"
+    if cents and int(cents):
+        words += f" {number_to_words(int(cents.ljust(2, '0')))}"
+    return words
+
+
+def _percent(_, number):
+    return f"{decimal_to_words(number)} percent"
+
+
+def _date_day_month(_, day, month, year):
+    words = f"the {ordinal_to_words(int(day))} of {_month(month)}"
+    return f"{words} {year_to_words(int(year))}" if year else words
+
+
+def _date_month_day(_, month, day, year):
+    words = f"{_month(month)} the {ordinal_to_words(int(day))}"
+    return f"{words}, {year_to_words(int(year))}" if year else words
+
+
+def _date_numeric(text, day, month, year):
+    if not 1 <= int(month) <= 12 or not 1 <= int(day) <= 31:
+        return " ".join(decimal_to_words(part) for part in text.split("/"))
+    return f"the {ordinal_to_words(int(day))} of {MONTHS[int(month) - 1]} {year_to_words(int(year))}"
+
+
+def _academic_year(_, start, end):
+    return f"{year_to_words(int(start))} to {number_to_words(int(end))}"
+
+
+def _year_after(_, word, year):
+    return f"{word} {year_to_words(int(year))}"
+
+
+def _time(_, hours, minutes, meridiem):
+    hours_words = number_to_words(int(hours))
+    if minutes == "00":
+        words = hours_words if meridiem else f"{hours_words} o'clock"
+    elif int(minutes) < 10:
+        words = f"{hours_words} oh {ONES[int(minutes)]}"
+    else:
+        words = f"{hours_words} {number_to_words(int(minutes))}"
+    if meridiem:
+        words += " " + " ".join(meridiem.lower().replace(".", ""))
+    return words
+
+
+def _phone(text):
+    return ", ".join(digits_to_words(group) for group in text.split())
+
+
+def _scientific(_, mantissa, exponent, superscript, unit):
+    exponent = (exponent or superscript).translate(SUPERSCRIPTS).replace("−", "-")
+    words = f"{decimal_to_words(mantissa)} times ten to the power of {_signed(exponent)}"
+    return f"{words} {UNITS[unit.strip()][1]}" if unit else words
+
+
+def _signed(number: str) -> str:
+    if number.startswith("-"):
+        return f"minus {number_to_words(int(number[1:]))}"
+    return number_to_words(int(number))
+
+
+def _power(_, base, exponent):
+    exponent = exponent.translate(SUPERSCRIPTS)
+    if exponent == "2":
+        return f"{base} squared"
+    if exponent == "3":
+        return f"{base} cubed"
+    return f"{base} to the power of {_signed(exponent)}"
+
+
+def _unit(_, number, unit, spaced_unit):
+    return f"{decimal_to_words(number)} {_plural(UNITS[unit or spaced_unit], number)}"
+
+
+def _decade(_, year):
+    words = year_to_words(int(year))
+    return words[:-1] + "ies" if words.endswith("y") else words + "s"
+
+
+def _ordinal(_, number):
+    return ordinal_to_words(int(number))
+
+
+def _number(text):
+    return decimal_to_words(text)
+
+
+def _symbol(_, symbol, word_after):
+    return f" {SYMBOLS[symbol]} " if word_after else f" {SYMBOLS[symbol]}"
+
+
+def _domain(_, domain):
+    return " dot ".join(DOMAIN_PARTS.get(part.lower(), part) for part in domain.split("."))
+
+
+def _email(_, user, domain):
+    return f"{user.replace('.', ' dot ')} at {_domain(None, domain)}"
+
+
+def _link(_, label):
+    return normalize_for_speech(label)
+
+
+# ─────────────────────────────────────
+# Rule table
+# ─────────────────────────────────────
+class Rule(NamedTuple):
+    """
+    `pattern` is matched at each position; `replace` is either a constant
+    string or a callable taking the matched text followed by the pattern's
+    own groups (which must be unnamed). The rule is only tried on text that
+    contains one of `triggers` (lower case), or always when there are none.
+    Consecutive rules with the same `guard` (a zero-width pattern every
+    match of theirs starts with) are tried only where the guard holds.
+    """
+
+    name: str
+    pattern: str
+    replace: str | Callable[..., str]
+    triggers: tuple[str, ...] = ()
+    guard: str = ""
+
+
+_MONTH = r"(January|February|March|April|May|June|July|August|September|October|November|December|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sept?|Oct|Nov|Dec)\b(?:\.(?=\s*\d))?"
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_DOMAIN = r"((?:[A-Za-z0-9-]+\.)+(?:ac\.uk|co\.uk|org\.uk|gov\.uk|com|org|net|edu|gov|io|uk)\b)"
+_UNIT = "|".join(sorted((re.escape(unit) for unit in UNITS), key=len, reverse=True))
+_JOINED_UNIT = "|".join(
+    sorted((re.escape(unit) for unit in UNITS if unit not in _SPACED_UNITS), key=len, reverse=True)
+)
+_SPACED_UNIT = "|".join(sorted(_SPACED_UNITS))
+
+DIGITS = tuple("0123456789")
+TLDS = (".uk", ".com", ".org", ".net", ".edu", ".gov", ".io")
+SUPERSCRIPT_DIGITS = tuple("⁰¹²³⁴⁵⁶⁷⁸⁹")
+
+# Guards shared by runs of rules, so most positions are ruled out with one check
+WORD_START = r"\b(?=[A-Za-z])"
+DIGIT = r"(?=\d)"
+
+RULES = [
+    # Markdown: links keep their label, formatting marks are dropped
+    Rule("md_link", r"\[([^\]]+)\]\([^)\s]+\)", _link, ("](",)),
+    Rule("md_heading", r"(?m:^[ \t]*#{1,6}[ \t]+)", "", ("#",)),
+    Rule(
+        "md_bullet",
+        r"(?m:(\n?)^[ \t]*(?:[-*+]|\d+\.)[ \t]+)",
+        lambda text, newline: ", " if newline else "",
+        ("- ", "* ", "+ ", ". "),
+    ),
+    Rule("md_mark", r"\*+|_{2,}|`+", "", ("*", "__", "`")),
+    # Addresses
+    Rule("email", r"(?<![\w.+-])([\w.+-]+)@" + _DOMAIN + r"\b", _email, ("@",)),
+    Rule(
+        "url",
+        r"(?<![\w.@/-])(?:https?://)?(?:www\.)?" + _DOMAIN + r"(?:/[\w\-./%?=&#~]*[\w/])?",
+        _domain,
+        TLDS,
+    ),
+    Rule(
+        "currency",
+        r"([£$€])(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d{1,2}))?((?i:\s?(?:bn|k|m)\b|\s(?:thousand|million|billion)\b))?",
+        _currency,
+        ("£", "$", "€"),
+    ),
+    # Physics notation
+    Rule(
+        "power",
+        r"(?<![A-Za-z0-9)])([A-Za-z0-9)]+)(?:\^(-?\d+)|([⁻]?[⁰¹²³⁴⁵⁶⁷⁸⁹]+))",
+        lambda text, base, exponent, superscript: _power(
+            text, decimal_to_words(base) if base.isdigit() else base, exponent or superscript
+        ),
+        ("^",) + SUPERSCRIPT_DIGITS,
+    ),
+    Rule(
+        "symbol",
+        "([" + "".join(re.escape(symbol) for symbol in SYMBOLS) + r"])(?=(\w)?)",
+        _symbol,
+        tuple(SYMBOLS),
+    ),
+    Rule("msci", r"(?i:msci)", "MSc", ("msci",)),
+    # Rules starting with a word. They cannot match where the digit rules
+    # below do, so the two runs are independent of each other's order.
+    Rule(
+        "date_md",
+        _MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4})\b)?",
+        _date_month_day,
+        DIGITS,
+        WORD_START,
+    ),
+    Rule(
+        "year",
+        r"((?i:in|since|from|by|until|till|during|before|after|of|to|autumn|spring|summer|winter)|"
+        r"January|February|March|April|May|June|July|August|September|October|November|December)"
+        r"\s+(1[1-9]\d{2}|20\d{2})\b(?![.,]\d|\s?%)",
+        _year_after,
+        DIGITS,
+        WORD_START,
+    ),
+    Rule("mass_energy", r"(?i:E\s?=\s?mc(?:²|\^2))", "E equals m c squared", ("mc",), WORD_START),
+    Rule("eg", r"(?i:e\.g\.)", "for example", ("e.g.",), WORD_START),
+    Rule("ie", r"(?i:i\.e\.)", "that is", ("i.e.",), WORD_START),
+    Rule("etc", r"etc\b", "et cetera", ("etc",), WORD_START),
+    Rule("vs", r"vs\b\.?", "versus", ("vs",), WORD_START),
+    # Rules starting with a digit: money-like and dated forms first, so
+    # their digits are not read as plain numbers
+    Rule("percent", r"(" + _NUMBER + r")\s?%", _percent, ("%",), DIGIT),
+    Rule(
+        "date_dm",
+        r"\b(\d{1,2})(?:st|nd|rd|th)?\s+" + _MONTH + r"(?:,?\s+(\d{4})\b)?",
+        _date_day_month,
+        DIGITS,
+        DIGIT,
+    ),
+    Rule("date_numeric", r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b", _date_numeric, ("/",), DIGIT),
+    Rule(
+        "academic_year", r"\b((?:19|20)\d{2})[/–-](\d{2})\b", _academic_year, ("/", "–", "-"), DIGIT
+    ),
+    Rule(
+        "time",
+        r"\b([01]?\d|2[0-3]):([0-5]\d)(?:\s?((?i:[ap]\.?m)\b))?(?!\w)",
+        _time,
+        (":",),
+        DIGIT,
+    ),
+    Rule("phone", r"\b0\d{3,4}\s\d{3}\s?\d{4}\b", _phone, ("0",), DIGIT),
+    Rule(
+        "scientific",
+        r"(\d+(?:\.\d+)?)\s?[×x]\s?10(?:\^([-−]?\d+)|([⁻]?[⁰¹²³⁴⁵⁶⁷⁸⁹]+))(\s?(?:" + _UNIT + r")(?![\w²]))?",
+        _scientific,
+        ("10",),
+        DIGIT,
+    ),
+    Rule(
+        "unit",
+        r"(" + _NUMBER + r")(?:\s?(" + _JOINED_UNIT + r")|\s(" + _SPACED_UNIT + r"))(?![\w²/])",
+        _unit,
+        DIGITS,
+        DIGIT,
+    ),
+    Rule("decade", r"\b((?:1[1-9]|20)\d0)s\b", _decade, DIGITS, DIGIT),
+    Rule("ordinal", r"\b(\d+)(?:st|nd|rd|th)\b", _ordinal, DIGITS, DIGIT),
+    Rule("number", r"(?<![\w.])(?:" + _NUMBER + r")(?![\w])", _number, DIGITS, DIGIT),
+]
+
+
+class SpeechNormalizer:
+    """Applies an ordered rule table in one regex pass per sentence."""
+
+    def __init__(self, rules: list[Rule], cache_size: int = 256):
+        self.rules = rules
+        # Triggers indexed by their first character: a sentence only checks
+        # the triggers whose first character it contains
+        self._by_first: dict[str, list[tuple[str, int]]] = {}
+        for index, rule in enumerate(rules):
+            for trigger in rule.triggers:
+                self._by_first.setdefault(trigger[0], []).append((trigger, index))
+        self._always = {index for index, rule in enumerate(rules) if not rule.triggers}
+        self._compile = lru_cache(maxsize=cache_size)(self._compile_rules)
+        # Compile every rule up front so a bad table fails at import
+        self._compile(tuple(range(len(rules))))
+
+    def _compile_rules(self, active: tuple[int, ...]) -> tuple[re.Pattern, dict]:
+        rules = [self.rules[i] for i in active]
+        branches = []
+        for guard, run in groupby(rules, key=lambda rule: rule.guard):
+            alternatives = "|".join(f"(?P<{rule.name}>{rule.pattern})" for rule in run)
+            branches.append(f"{guard}(?:{alternatives})" if guard else alternatives)
+        pattern = re.compile("|".join(branches))
+        # rule name -> (replacement, slice of match.groups() holding its own groups)
+        handlers = {}
+        for rule in rules:
+            outer = pattern.groupindex[rule.name]
+            inner = re.compile(rule.pattern).groups
+            handlers[rule.name] = (rule.replace, slice(outer, outer + inner))
+        return pattern, handlers
+
+    def _active(self, text: str) -> tuple[int, ...]:
+        lowered = text.lower()
+        active = set(self._always)
+        for char in self._by_first.keys() & set(lowered):
+            for trigger, index in self._by_first[char]:
+                if index not in active and trigger in lowered:
+                    active.add(index)
+        return tuple(sorted(active))
+
+    def __call__(self, text: str) -> str:
+        active = self._active(text)
+        if active:
+            pattern, handlers = self._compile(active)
+
+            def substitute(match: re.Match) -> str:
+                replace, groups = handlers[match.lastgroup]
+                if isinstance(replace, str):
+                    return replace
+                return replace(match.group(), *match.groups()[groups])
+
+            text = pattern.sub(substitute, text)
+        # Symbols become space-padded words; collapse the extra spaces
+        return " ".join(text.split())
+
+
+normalize_for_speech = SpeechNormalizer(RULES)
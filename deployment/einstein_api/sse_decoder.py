@@ -0,0 +1,172 @@
+"""
+Incremental Server-Sent Events decoder.
+
+Bytes are appended to one bytearray and lines are read at a moving offset,
+so each byte is scanned once and the consumed prefix is dropped in a single
+slice per `feed()` call. This keeps decoding linear in the response size,
+where re-splitting a `bytes` buffer on every line is quadratic.
+
+Follows the event-stream rules of the HTML spec: `data:` lines are joined
+with newlines, `event:` / `id:` / `retry:` fields are tracked, comments
+(lines starting with ":") are ignored and a blank line dispatches the event.
+CR, LF and CRLF line endings are all accepted.
+"""
+
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+
+
+@dataclass
+class SSEEvent:
+    data: str
+    event: str = "message"
+    id: str | None = None
+    retry: int | None = None
+
+
+class SSEDecoder:
+    def __init__(self):
+        self._buffer = bytearray()
+        self._data: list[str] = []
+        self._event = ""
+        self._last_id: str | None = None
+        self._retry: int | None = None
+        self._cr_seen = False
+        # A chunk that ended in "\r" may be followed by the "\n" of a CRLF
+        self._skip_lf = False
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        """Add bytes from the stream and return every event they complete."""
+        buffer = self._buffer
+        # Bytes before this offset are known to hold no line break, so a long
+        # line arriving in many small chunks is not rescanned from the start.
+        scan = len(buffer)
+        buffer += chunk
+        if self._cr_seen or b"\r" in chunk:
+            self._cr_seen = True
+            return self._feed_any_newline()
+
+        events = []
+        start = 0
+        while True:
+            lf = buffer.find(b"\n", scan)
+            if lf == -1:
+                break
+            event = self._process_line(buffer[start:lf])
+            if event is not None:
+                events.append(event)
+            start = scan = lf + 1
+
+        if start:
+            del buffer[:start]
+        return events
+
+    def _feed_any_newline(self) -> list[SSEEvent]:
+        """Slower path once the stream has used CR or CRLF line endings."""
+        buffer = self._buffer
+        events = []
+
+        start = 0
+        end = len(buffer)
+        if self._skip_lf and start < end:
+            if buffer[start] == 0x0A:
+                start += 1
+            self._skip_lf = False
+
+        # Next CR and LF at or after `start`, `end` when there is none; each
+        # is searched for again only once the line holding it is consumed
+        cr = lf = -1
+        while start < end:
+            if cr < start:
+                cr = buffer.find(b"\r", start)
+                if cr == -1:
+                    cr = end
+            if lf < start:
+                lf = buffer.find(b"\n", start)
+                if lf == -1:
+                    lf = end
+            if cr < lf:
+                line_end, next_start = cr, cr + 1
+                if next_start < end and buffer[next_start] == 0x0A:
+                    next_start += 1
+                elif next_start == end:
+                    self._skip_lf = True
+            elif lf < end:
+                line_end, next_start = lf, lf + 1
+            else:
+                break
+
+            event = self._process_line(buffer[start:line_end])
+            if event is not None:
+                events.append(event)
+            start = next_start
+
+        if start:
+            del buffer[:start]
+        return events
+
+    def flush(self) -> list[SSEEvent]:
+        """Dispatch whatever is left once the stream has ended."""
+        events = []
+        if self._buffer:
+            event = self._process_line(self._buffer)
+            self._buffer.clear()
+            if event is not None:
+                events.append(event)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, raw: bytearray) -> SSEEvent | None:
+        if not raw:
+            return self._dispatch()
+
+        line = raw.decode("utf-8")
+        if line.startswith("data:"):
+            # Fast path for the only field ADK really uses
+            self._data.append(line[6:] if line.startswith("data: ") else line[5:])
+            return None
+        if line.startswith(":"):
+            return None
+
+        field, sep, value = line.partition(":")
+        if sep and value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\0" not in value:
+                self._last_id = value
+        elif field == "retry":
+            if value.isdigit():
+                self._retry = int(value)
+        return None
+
+    def _dispatch(self) -> SSEEvent | None:
+        if not self._data:
+            self._event = ""
+            return None
+
+        event = SSEEvent(
+            data="\n".join(self._data),
+            event=self._event or "message",
+            id=self._last_id,
+            retry=self._retry,
+        )
+        self._data = []
+        self._event = ""
+        return event
+
+
+async def aiter_events(chunks: AsyncIterable[bytes]) -> AsyncIterator[SSEEvent]:
+    """Decode a byte stream, including a last event the server did not end with a blank line."""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
@@ -0,0 +1,99 @@
+"""
+Worker start-up stages and readiness.
+
+A fresh worker pays for model loading, graph optimization, espeak set-up and
+its first ADK connection. The app lifespan runs those as named stages on a
+`Readiness` tracker, which records when each finished relative to the start
+of the process, so cold starts show up in `/ready` and in
+`einstein_cold_start_seconds`. The worker reports ready once its required
+stages are done; best-effort stages (such as the ADK connection, whose
+server may still be starting) are recorded but never hold readiness back.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from metrics import COLD_START, READY, logger
+from prerender import spoken_sentences
+from tts_cache import DEFAULT_LEXICON, load_lexicon
+
+_IMPORTED = time.monotonic()
+
+
+def process_age() -> float:
+    """Seconds since this process started (Linux), else since this module was imported."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED
+
+
+class Readiness:
+    def __init__(self):
+        self.stages: dict[str, dict] = {}
+        self.ready = False
+        self.ready_after_s: float | None = None
+
+    @contextmanager
+    def stage(self, name: str, required: bool = True):
+        """Time one start-up stage. A failing required stage re-raises; others are logged."""
+        started = time.perf_counter()
+        self.stages[name] = {"status": "running", "required": required}
+        try:
+            yield
+        except Exception as e:
+            self.stages[name].update(
+                status="failed", error=str(e), ms=round((time.perf_counter() - started) * 1000, 1)
+            )
+            if required:
+                raise
+            logger.warning("Start-up stage %s failed: %s", name, e)
+            return
+        done_at = process_age()
+        self.stages[name].update(
+            status="done",
+            ms=round((time.perf_counter() - started) * 1000, 1),
+            done_at_s=round(done_at, 3),
+        )
+        COLD_START.set(done_at, stage=name)
+        logger.info("Start-up stage %s done in %.0f ms", name, self.stages[name]["ms"])
+
+    def mark_ready(self):
+        if self.ready:
+            return
+        self.ready = True
+        self.ready_after_s = process_age()
+        COLD_START.set(self.ready_after_s, stage="ready")
+        READY.set(1)
+        logger.info("Worker ready %.2f s after process start", self.ready_after_s)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_after_s": round(self.ready_after_s, 3) if self.ready_after_s else None,
+            "uptime_s": round(process_age(), 3),
+            "stages": self.stages,
+        }
+
+
+async def prerender_lexicon(engine) -> int:
+    """
+    Synthesise the lexicon phrases (PHONEME_LEXICON) into the engine's PCM
+    cache unless WARMUP_PRERENDER=0, split and normalized into the sentences
+    live answers look up (prerender.spoken_sentences). Returns how many
+    were rendered.
+    """
+    if os.environ.get("WARMUP_PRERENDER", "1") != "1":
+        return 0
+    lexicon = os.environ.get("PHONEME_LEXICON", DEFAULT_LEXICON)
+    if not lexicon or not os.path.exists(lexicon):
+        return 0
+    rendered = await engine.prerender(spoken_sentences(load_lexicon(lexicon)))
+    logger.info("Pre-rendered %d lexicon phrases", rendered)
+    return rendered
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import speech_recognition as sr
+
+from audio_codecs import FFMPEG_PATH
+
+STT_SAMPLE_RATE = 16000
+
+
+class STTError(RuntimeError):
+    """Base class for speech-to-text failures."""
+
+
+class AudioDecodeError(STTError):
+    """The upload could not be decoded."""
+
+
+class UnintelligibleAudioError(STTError):
+    """The recognizer heard nothing it could transcribe."""
+
+
+class RecognizerUnavailableError(STTError):
+    """The recognition backend could not be reached or loaded."""
+
+
+@dataclass
+class Transcript:
+    text: str
+    timings: dict = field(default_factory=dict)
+
+
+async def decode_to_pcm(audio_data: bytes, sample_rate: int = STT_SAMPLE_RATE) -> bytes:
+    """
+    Decode any ffmpeg-readable upload (webm, ogg, mp4, wav...) to 16-bit mono
+    PCM at `sample_rate`, entirely through pipes: no temporary files, and the
+    event loop only waits on the subprocess.
+    """
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_PATH,
+        "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        pcm, errors = await process.communicate(audio_data)
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+
+    if process.returncode != 0 or not pcm:
+        raise AudioDecodeError(
+            f"Could not decode audio: {errors.decode(errors='replace').strip() or 'no samples'}"
+        )
+    return pcm
+
+
+# MediaRecorder MIME type -> ffmpeg demuxer, so streamed input needs no probing
+_DEMUXERS = {"audio/webm": "matroska", "audio/ogg": "ogg"}
+
+
+class StreamingDecoder:
+    """
+    Incremental decoder for a recording that is still being made.
+
+    Compressed chunks (e.g. MediaRecorder webm slices) go into a long-lived
+    ffmpeg process as they arrive; 16 kHz mono PCM is read back continuously
+    and handed to `on_pcm`, so voice-activity detection runs while the user
+    is still speaking.
+    """
+
+    def __init__(self, mime_type: str = "", sample_rate: int = STT_SAMPLE_RATE, on_pcm=None):
+        self.sample_rate = sample_rate
+        self.on_pcm = on_pcm
+        self.pcm = bytearray()
+        self._demuxer = _DEMUXERS.get(mime_type.split(";")[0].strip())
+        self._process: asyncio.subprocess.Process | None = None
+        self._reader: asyncio.Task | None = None
+
+    async def start(self):
+        input_args = ["-f", self._demuxer] if self._demuxer else []
+        self._process = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH,
+            "-hide_banner", "-loglevel", "error",
+            # Decode as soon as bytes arrive instead of probing seconds of input
+            "-probesize", "4096", "-analyzeduration", "0", "-fflags", "nobuffer",
+            *input_args, "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(self.sample_rate),
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader = asyncio.create_task(self._read_pcm())
+
+    async def _read_pcm(self):
+        while True:
+            data = await self._process.stdout.read(4096)
+            if not data:
+                return
+            self.pcm += data
+            if self.on_pcm is not None:
+                self.on_pcm(data)
+
+    async def feed(self, chunk: bytes):
+        """Queue a chunk for ffmpeg; raises AudioDecodeError if ffmpeg has exited."""
+        try:
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg quits on input it cannot decode
+            raise AudioDecodeError("Could not decode audio: the decoder stopped")
+
+    async def finish(self) -> bytes:
+        """Signal end of input and return all decoded PCM."""
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        await self._reader
+        await self._process.wait()
+        return bytes(self.pcm)
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+
+
+class EnergyVAD:
+    """
+    Energy-based voice-activity detector for end-of-utterance detection.
+
+    Frames louder than the adaptive noise floor (plus a margin) count as
+    speech. The utterance ends after `silence_ms` of quiet following at least
+    `min_speech_ms` of speech, or after `max_utterance_ms` regardless.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = STT_SAMPLE_RATE,
+        frame_ms: int = 30,
+        silence_ms: int = 700,
+        min_speech_ms: int = 250,
+        max_utterance_ms: int = 30000,
+        threshold_db: float = -45.0,
+        noise_margin_db: float = 12.0,
+    ):
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.frame_ms = frame_ms
+        self.silence_ms = silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.max_utterance_ms = max_utterance_ms
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+
+        self._pending = bytearray()
+        self._noise_db: float | None = None
+        self.speech_ms = 0
+        self.trailing_silence_ms = 0
+        self.total_ms = 0
+        self.ended = False
+
+    def feed(self, pcm: bytes) -> bool:
+        """Consume PCM; returns True once the end of the utterance is reached."""
+        self._pending += pcm
+        usable = len(self._pending) - len(self._pending) % self.frame_bytes
+        if usable == 0 or self.ended:
+            return self.ended
+
+        frames = np.frombuffer(bytes(self._pending[:usable]), dtype=np.int16)
+        del self._pending[:usable]
+        frames = frames.reshape(-1, self.frame_bytes // 2).astype(np.float32)
+        rms = np.sqrt(np.mean(frames**2, axis=1)) / 32768.0
+        levels_db = 20 * np.log10(rms + 1e-10)
+
+        for level_db in levels_db:
+            if self._noise_db is None:
+                self._noise_db = level_db
+            is_speech = level_db > max(self.threshold_db, self._noise_db + self.noise_margin_db)
+
+            self.total_ms += self.frame_ms
+            if is_speech:
+                self.speech_ms += self.frame_ms
+                self.trailing_silence_ms = 0
+            else:
+                # Track the noise floor only on non-speech frames
+                self._noise_db = 0.95 * self._noise_db + 0.05 * level_db
+                self.trailing_silence_ms += self.frame_ms
+
+            if (
+                self.speech_ms >= self.min_speech_ms
+                and self.trailing_silence_ms >= self.silence_ms
+            ) or self.total_ms >= self.max_utterance_ms:
+                self.ended = True
+                break
+        return self.ended
+
+
+# Recognizer backends: name -> speech_recognition method and its extra
+# arguments. "google" is the online default; the others run locally once
+# their optional packages are installed (openai-whisper, faster-whisper,
+# vosk or pocketsphinx) and need no network access.
+BACKENDS = {
+    "google": ("recognize_google", {}),
+    "whisper": ("recognize_whisper", {"model": "base.en", "language": "english"}),
+    "faster_whisper": ("recognize_faster_whisper", {"model": "base.en", "language": "en"}),
+    "vosk": ("recognize_vosk", {}),
+    "sphinx": ("recognize_sphinx", {}),
+}
+
+
+class STTEngine:
+    """
+    Speech-to-text that keeps the event loop free.
+
+    Decoding runs in an ffmpeg subprocess and recognition, which blocks on the
+    network or on a local model, runs on a small thread pool. Every call
+    reports how long each stage took.
+    """
+
+    def __init__(self, backend: str = "google", max_workers: int = 2):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown STT backend '{backend}'. Choose one of: {', '.join(BACKENDS)}"
+            )
+        self.backend = backend
+        self._method, self._kwargs = BACKENDS[backend]
+        self._recognizer = sr.Recognizer()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="stt"
+        )
+
+    def _recognize_blocking(self, pcm: bytes, sample_rate: int) -> str:
+        audio = sr.AudioData(pcm, sample_rate, 2)
+        recognize = getattr(self._recognizer, self._method)
+        try:
+            result = recognize(audio, **self._kwargs)
+        except sr.UnknownValueError:
+            raise UnintelligibleAudioError("Could not understand audio")
+        except sr.RequestError as e:
+            raise RecognizerUnavailableError(f"Recognition service error: {e}")
+
+        # Offline backends return JSON strings or dicts rather than plain text
+        if isinstance(result, dict):
+            result = result.get("text", "")
+        elif result.startswith("{"):
+            result = json.loads(result).get("text", "")
+        if not result.strip():
+            raise UnintelligibleAudioError("Could not understand audio")
+        return result
+
+    async def recognize_pcm(self, pcm: bytes, sample_rate: int = STT_SAMPLE_RATE) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._recognize_blocking, pcm, sample_rate
+        )
+
+    async def transcribe(self, audio_data: bytes) -> Transcript:
+        started = time.perf_counter()
+        pcm = await decode_to_pcm(audio_data)
+        decoded = time.perf_counter()
+        text = await self.recognize_pcm(pcm)
+        finished = time.perf_counter()
+
+        return Transcript(
+            text=text,
+            timings={
+                "backend": self.backend,
+                "audio_ms": round(len(pcm) / 2 / STT_SAMPLE_RATE * 1000, 1),
+                "decode_ms": round((decoded - started) * 1000, 1),
+                "recognize_ms": round((finished - decoded) * 1000, 1),
+            },
+        )
+
+    async def warm_up(self) -> bool:
+        """
+        Load a local recognizer's model by recognising a moment of silence.
+        Network backends have nothing to load and are skipped.
+        """
+        if self.backend == "google":
+            return False
+        try:
+            await self.recognize_pcm(bytes(STT_SAMPLE_RATE), STT_SAMPLE_RATE)
+        except UnintelligibleAudioError:
+            pass
+        return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stt_from_env() -> STTEngine:
+    """Build an STTEngine for STT_BACKEND (default: google)."""
+    return STTEngine(
+        backend=os.environ.get("STT_BACKEND", "google"),
+        max_workers=int(os.environ.get("STT_MAX_WORKERS", "2")),
+    )
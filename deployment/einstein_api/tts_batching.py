@@ -0,0 +1,262 @@
+"""
+Micro-batched Piper inference.
+
+`PiperVoice.synthesize` runs the VITS model on one sentence at a time, which
+leaves most of a multi-core CPU idle per run. Here sentences from concurrent
+answers are phonemized, padded into one `[batch, phonemes]` tensor and run
+through the ONNX session together. The VITS decoder pads every row's audio
+to the longest, so each row is cut to the length its own phoneme durations
+give: `with_frame_counts` adds the per-row frame count the model already
+computes (the sum of its ceiled durations) as an extra graph output. Without
+it (no `onnx` package, or an unfamiliar graph) rows are run one at a time.
+Audio is converted to int16 the same way Piper does.
+
+`BatchScheduler` collects jobs on the event loop for a short window (or
+until a worker frees up) and hands them to the synthesis pool in batches.
+First sentences of an answer are queued ahead of the rest so time to first
+audio stays low while later sentences fill the batches.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor
+from functools import partial
+
+import numpy as np
+from piper import PiperVoice
+
+# Rows are grouped so no row is padded to more than this times its length
+MAX_PADDING_RATIO = 1.5
+# Graph output added by `with_frame_counts`
+FRAME_COUNTS = "frame_counts"
+
+
+def with_frame_counts(model_path: str) -> bytes | None:
+    """
+    The Piper graph, serialized, with each row's length in spectrogram frames
+    as the extra output FRAME_COUNTS. VITS computes it as
+    `sum(ceil(durations))` to size the decoder input; that ReduceSum, the one
+    fed by the graph's only Ceil, is exposed as it is. None if the onnx
+    package is missing or no such node exists.
+    """
+    try:
+        import onnx
+    except ImportError:
+        return None
+    model = onnx.load(model_path)
+    graph = model.graph
+    ceiled = {node.output[0] for node in graph.node if node.op_type == "Ceil"}
+    sums = [node for node in graph.node if node.op_type == "ReduceSum" and ceiled & set(node.input)]
+    if len(ceiled) != 1 or len(sums) != 1:
+        return None
+    graph.node.append(onnx.helper.make_node("Identity", [sums[0].output[0]], [FRAME_COUNTS]))
+    graph.output.append(
+        onnx.helper.make_tensor_value_info(FRAME_COUNTS, onnx.TensorProto.FLOAT, None)
+    )
+    return model.SerializeToString()
+
+
+def has_frame_counts(voice: PiperVoice) -> bool:
+    return any(output.name == FRAME_COUNTS for output in voice.session.get_outputs())
+
+
+def _length_groups(lengths: list[int], max_ratio: float) -> list[list[int]]:
+    """Row indices grouped by similar length, to keep padding waste low."""
+    groups: list[list[int]] = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if groups and lengths[index] <= lengths[groups[-1][0]] * max_ratio:
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+    return groups
+
+
+def _to_int16(audio: np.ndarray) -> bytes:
+    """Peak-normalise and convert like Piper's default SynthesisConfig."""
+    peak = np.max(np.abs(audio)) if audio.size else 0.0
+    if peak < 1e-8:
+        return np.zeros(audio.shape, dtype=np.int16).tobytes()
+    audio = np.clip(audio / peak, -1.0, 1.0)
+    return (audio * 32767).astype(np.int16).tobytes()
+
+
+def infer_padded(voice: PiperVoice, id_rows: list[list[int]]) -> list[bytes]:
+    """Run one padded ONNX inference over `id_rows`; returns int16 PCM per row."""
+    config = voice.config
+    lengths = np.array([len(row) for row in id_rows], dtype=np.int64)
+    ids = np.zeros((len(id_rows), lengths.max()), dtype=np.int64)
+    for i, row in enumerate(id_rows):
+        ids[i, : len(row)] = row
+
+    inputs = {
+        "input": ids,
+        "input_lengths": lengths,
+        "scales": np.array(
+            [config.noise_scale, config.length_scale, config.noise_w_scale],
+            dtype=np.float32,
+        ),
+    }
+    if config.num_speakers > 1:
+        inputs["sid"] = np.zeros(len(id_rows), dtype=np.int64)
+
+    outputs = voice.session.run(None, inputs)
+    audio = outputs[0].reshape(len(id_rows), -1)
+    if len(id_rows) == 1:
+        return [_to_int16(audio[0])]
+    if len(outputs) < 2:
+        raise ValueError(f"Batched inference needs the {FRAME_COUNTS} output (see with_frame_counts)")
+
+    # The decoder runs over the longest row's frames; the rest of a shorter
+    # row is its output over padding. VITS clamps lengths to at least 1
+    frames = np.maximum(outputs[1].reshape(-1), 1).astype(np.int64)
+    hop = audio.shape[1] // frames.max()
+    return [_to_int16(row[: count * hop]) for row, count in zip(audio, frames)]
+
+
+def phoneme_rows(
+    voice: PiperVoice,
+    text: str,
+    phonemize: Callable[[str], list[list[str]]] | None = None,
+) -> list[list[int]]:
+    """
+    Phoneme ID rows for `text`, one per sentence espeak finds in it.
+    `phonemize` replaces `voice.phonemize` (e.g. `PhonemeCache.phonemize`).
+    """
+    phonemize = phonemize or voice.phonemize
+    rows = [voice.phonemes_to_ids(phonemes) for phonemes in phonemize(text)]
+    return [row for row in rows if row]
+
+
+def synthesize_batch(
+    voice: PiperVoice,
+    texts: list[str],
+    phonemize: Callable[[str], list[list[str]]] | None = None,
+) -> tuple[list[bytes], int]:
+    """
+    Synthesise several texts together. Returns int16 PCM per text and the
+    number of ONNX runs it took.
+    """
+    rows: list[list[int]] = []
+    owners: list[int] = []
+    for index, text in enumerate(texts):
+        for ids in phoneme_rows(voice, text, phonemize):
+            rows.append(ids)
+            owners.append(index)
+
+    audio_rows: list[bytes] = [b""] * len(rows)
+    if has_frame_counts(voice):
+        groups = _length_groups([len(row) for row in rows], MAX_PADDING_RATIO)
+    else:
+        groups = [[i] for i in range(len(rows))]
+    for group in groups:
+        for row_index, audio in zip(group, infer_padded(voice, [rows[i] for i in group])):
+            audio_rows[row_index] = audio
+
+    per_text: list[list[bytes]] = [[] for _ in texts]
+    for owner, audio in zip(owners, audio_rows):
+        per_text[owner].append(audio)
+    return [b"".join(parts) for parts in per_text], len(groups)
+
+
+class BatchJob:
+    def __init__(self, text: str, future: asyncio.Future):
+        self.text = text
+        self.future = future
+        # Set once the job has left the queue for a batch
+        self.taken = False
+
+
+class BatchScheduler:
+    """
+    Groups queued sentences into batches for `run_batch(texts)`.
+
+    A batch is formed whenever one of `max_workers` slots is free: the
+    scheduler waits up to `window_s` for company (unless `max_batch` jobs are
+    already waiting), then takes priority jobs first. Under load the window
+    is irrelevant, as jobs pile up while every worker is busy.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list[str]], list[list[bytes]]],
+        executor: Executor,
+        max_workers: int,
+        max_batch: int = 8,
+        window_s: float = 0.01,
+    ):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch = max_batch
+        self.window_s = window_s
+
+        self._slots = asyncio.Semaphore(max_workers)
+        self._priority: deque[BatchJob] = deque()
+        self._normal: deque[BatchJob] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def submit(self, text: str, priority: bool = False) -> BatchJob:
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+        job = BatchJob(text, loop.create_future())
+        (self._priority if priority else self._normal).append(job)
+        self._wakeup.set()
+        return job
+
+    def _waiting(self) -> int:
+        return len(self._priority) + len(self._normal)
+
+    def _take(self) -> list[BatchJob]:
+        jobs = []
+        for queue in (self._priority, self._normal):
+            while queue and len(jobs) < self.max_batch:
+                job = queue.popleft()
+                if job.future.cancelled():
+                    continue
+                job.taken = True
+                jobs.append(job)
+        return jobs
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            try:
+                while not self._waiting():
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                if self._waiting() < self.max_batch and self.window_s:
+                    await asyncio.sleep(self.window_s)
+                jobs = self._take()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not jobs:
+                self._slots.release()
+                continue
+
+            future = loop.run_in_executor(
+                self.executor, self.run_batch, [job.text for job in jobs]
+            )
+            future.add_done_callback(partial(self._finish, jobs))
+
+    def _finish(self, jobs: list[BatchJob], future: asyncio.Future):
+        self._slots.release()
+        if future.cancelled():
+            for job in jobs:
+                job.future.cancel()
+            return
+        error = future.exception()
+        for index, job in enumerate(jobs):
+            if job.future.done():
+                continue
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(future.result()[index])
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+
+from metrics import logger
+
+_WHITESPACE = re.compile(r"\s+")
+# A comma, semicolon or colon after a word ends an espeak clause. Not after
+# a full stop, so "e.g.," stays with the words that decide how it is read
+_CLAUSE_BREAK = re.compile(r"(?<=[^\W_][,;:])\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a sentence for cache lookups."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Identify a voice by its file name, size and inference parameters.
+
+    Hashing the whole ONNX file would add seconds to every start; name, size
+    and the `.onnx.json` inference block change whenever the voice does.
+    """
+    with open(f"{model_path}.json", "r", encoding="utf-8") as config_file:
+        inference = json.load(config_file).get("inference", {})
+    return json.dumps(
+        {
+            "model": os.path.basename(model_path),
+            "size": os.path.getsize(model_path),
+            "noise_scale": inference.get("noise_scale"),
+            "length_scale": inference.get("length_scale"),
+            "noise_w": inference.get("noise_w"),
+        },
+        sort_keys=True,
+    )
+
+
+class PCMCache:
+    """
+    Content-addressed cache of synthesised sentences.
+
+    Keys hash the normalized text together with the model fingerprint, so a
+    new voice or changed inference parameters never serve stale audio. The
+    memory tier is an LRU bounded by total PCM bytes; the optional disk tier
+    stores one raw PCM file per sentence, read back through mmap and promoted
+    into memory on a hit.
+    """
+
+    def __init__(self, model_id: str, max_bytes: int = 64 * 1024 * 1024, disk_dir: str | None = None):
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model_id}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pcm")
+
+    def peek(self, text: str) -> bytes | None:
+        """
+        Memory-tier lookup only, cheap enough for the event loop.
+
+        A miss here is not counted; the caller is expected to follow up with
+        `get()` off the loop, which also consults the disk tier.
+        """
+        key = self.key(text)
+        with self._lock:
+            pcm = self._entries.get(key)
+            if pcm is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+            return pcm
+
+    def get(self, text: str) -> bytes | None:
+        key = self.key(text)
+        with self._lock:
+            pcm = self._entries.get(key)
+            if pcm is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return pcm
+
+        pcm = self._read_disk(key)
+        if pcm is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        self._insert(key, pcm)
+        return pcm
+
+    def put(self, text: str, pcm: bytes):
+        key = self.key(text)
+        self._insert(key, pcm)
+        if self.disk_dir:
+            self._write_disk(key, pcm)
+
+    def _insert(self, key: str, pcm: bytes):
+        if len(pcm) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = pcm
+            self._bytes += len(pcm)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _read_disk(self, key: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, pcm: bytes):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pcm)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_dir": self.disk_dir,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+def cache_from_env(model_path: str) -> PCMCache | None:
+    """Build the PCM cache from TTS_CACHE_MAX_MB / TTS_CACHE_DIR (0 MB disables it)."""
+    max_mb = float(os.environ.get("TTS_CACHE_MAX_MB", "64"))
+    if max_mb <= 0:
+        return None
+    return PCMCache(
+        model_fingerprint(model_path),
+        max_bytes=int(max_mb * 1024 * 1024),
+        disk_dir=os.environ.get("TTS_CACHE_DIR") or None,
+    )
+
+
+class PhonemeCache:
+    """
+    Memoised espeak phonemization, one entry per clause.
+
+    espeak translates text a clause at a time, so a clause's phonemes (stress
+    and weak forms included) do not depend on the clauses around it, and
+    sentences joined from cached clauses phonemize exactly as the whole
+    sentence would. Word-level entries would not: "the" before a vowel, or
+    a word's stress in a compound, depends on its neighbours. Recurring
+    clauses ("Ah, a splendid question!", course names, the disclaimer) then
+    skip espeak even inside sentences the PCM cache has never seen. Bounded
+    as an LRU by entry count; an entry is a few dozen one-character strings.
+    """
+
+    def __init__(self, phonemize: Callable[[str], list[list[str]]], max_entries: int = 4096):
+        self._phonemize = phonemize
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, list[list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.phonemize_s = 0.0
+
+    def _clause(self, clause: str) -> list[list[str]]:
+        with self._lock:
+            groups = self._entries.get(clause)
+            if groups is not None:
+                self._entries.move_to_end(clause)
+                self.hits += 1
+                return groups
+
+        started = time.perf_counter()
+        groups = self._phonemize(clause)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.misses += 1
+            self.phonemize_s += elapsed
+            self._entries[clause] = groups
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return groups
+
+    def phonemize(self, text: str) -> list[list[str]]:
+        """Drop-in for `PiperVoice.phonemize`: phonemes grouped by sentence."""
+        sentences: list[list[str]] = []
+        for index, clause in enumerate(_CLAUSE_BREAK.split(text.strip())):
+            groups = self._clause(clause)
+            if not groups:
+                continue
+            # Every clause but the last ends on a comma, semicolon or colon,
+            # which does not end espeak's sentence
+            if index and sentences:
+                sentences[-1].extend(groups[0])
+                groups = groups[1:]
+            sentences.extend(list(group) for group in groups)
+        return sentences
+
+    def warm(self, texts: list[str]) -> int:
+        """Phonemize `texts` ahead of time; returns how many clauses were added."""
+        before = len(self._entries)
+        for text in texts:
+            self.phonemize(text)
+        return len(self._entries) - before
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "phonemize_s": round(self.phonemize_s, 3),
+        }
+
+
+def load_lexicon(path: str) -> list[str]:
+    """Domain sentences and phrases, one per line; blank lines and # comments skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+DEFAULT_LEXICON = os.path.join(os.path.dirname(__file__), "lexicon", "domain_phrases.txt")
+
+
+def phoneme_cache_from_env(phonemize: Callable[[str], list[list[str]]]) -> PhonemeCache | None:
+    """
+    Build the clause phoneme cache from PHONEME_CACHE_SIZE (entries, 0
+    disables it) and warm it from PHONEME_LEXICON (default
+    lexicon/domain_phrases.txt).
+    """
+    size = int(os.environ.get("PHONEME_CACHE_SIZE", "4096"))
+    if size <= 0:
+        return None
+    cache = PhonemeCache(phonemize, max_entries=size)
+
+    lexicon = os.environ.get("PHONEME_LEXICON", DEFAULT_LEXICON)
+    if lexicon and os.path.exists(lexicon):
+        started = time.perf_counter()
+        added = cache.warm(load_lexicon(lexicon))
+        logger.info(
+            "Phoneme cache warmed with %d clauses in %.0f ms",
+            added, (time.perf_counter() - started) * 1000,
+        )
+    return cache
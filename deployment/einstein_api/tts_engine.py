@@ -0,0 +1,417 @@
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import onnxruntime
+from piper import PiperVoice
+from piper.config import PiperConfig
+
+from metrics import TTS_BATCH_SIZE, TTS_RTF, TTS_SYNTHESIS, logger
+from tts_batching import (
+    BatchScheduler,
+    has_frame_counts,
+    infer_padded,
+    phoneme_rows,
+    synthesize_batch,
+    with_frame_counts,
+)
+from tts_cache import (
+    PCMCache,
+    PhonemeCache,
+    cache_from_env,
+    model_fingerprint,
+    phoneme_cache_from_env,
+)
+
+WARM_UP_TEXT = "Hello there, I am Albeee Einstein."
+
+
+def optimized_model_path(
+    model_path: str, cache_dir: str, provider: str, frame_counts: bool = False
+) -> str:
+    """
+    Where the optimized graph for this model, provider, onnxruntime version
+    and machine is cached. Fully optimized graphs can contain layouts
+    specific to the CPU they were built on, so none of these may change;
+    nor whether the graph has the frame counts output.
+    """
+    key = hashlib.sha256(
+        json.dumps(
+            [
+                model_fingerprint(model_path),
+                provider,
+                onnxruntime.__version__,
+                platform.machine(),
+                frame_counts,
+            ]
+        ).encode("utf-8")
+    ).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{name}.{key}.onnx")
+
+
+def _create_session(
+    model_path: str,
+    sess_options: onnxruntime.SessionOptions,
+    providers: list,
+    cache_dir: str | None,
+    graph: bytes | None = None,
+) -> onnxruntime.InferenceSession:
+    """
+    Create the inference session, reusing a serialized optimized graph from
+    `cache_dir` when one exists so graph optimization is not paid on every
+    start. Without one, the optimized graph is written there for next time.
+    `graph` replaces the model file's own (see `with_frame_counts`).
+    """
+    model = graph if graph is not None else str(model_path)
+    if not cache_dir:
+        return onnxruntime.InferenceSession(
+            model, sess_options=sess_options, providers=providers
+        )
+
+    provider = providers[0] if isinstance(providers[0], str) else providers[0][0]
+    cached = optimized_model_path(model_path, cache_dir, provider, graph is not None)
+    if os.path.exists(cached):
+        # The cached graph is already optimized; loading it as-is is the saving
+        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return onnxruntime.InferenceSession(
+                cached, sess_options=sess_options, providers=providers
+            )
+        except Exception as e:
+            logger.warning("Discarding unusable optimized graph %s: %s", cached, e)
+            os.remove(cached)
+            sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Workers starting together each write their own file; the rename is atomic
+    partial_path = f"{cached}.{os.getpid()}.tmp"
+    sess_options.optimized_model_filepath = partial_path
+    session = onnxruntime.InferenceSession(
+        model, sess_options=sess_options, providers=providers
+    )
+    if os.path.exists(partial_path):
+        os.replace(partial_path, cached)
+        logger.info("Saved optimized ONNX graph to %s", cached)
+    return session
+
+
+def load_voice(
+    model_path: str,
+    use_cuda: bool = False,
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+    optimized_cache_dir: str | None = None,
+) -> PiperVoice:
+    """
+    Load a Piper voice with explicit onnxruntime threading.
+
+    `PiperVoice.load` always uses default session options, which lets every
+    session grab all cores. Pinning intra/inter-op threads keeps several
+    sessions (or workers) from oversubscribing the CPU. 0 means "let
+    onnxruntime decide". With `optimized_cache_dir` the optimized graph is
+    cached on disk (see `_create_session`). The graph gets the per-row frame
+    counts batched inference cuts its audio by, when they can be exposed.
+    """
+    with open(f"{model_path}.json", "r", encoding="utf-8") as config_file:
+        config_dict = json.load(config_file)
+
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.intra_op_num_threads = intra_op_threads
+    sess_options.inter_op_num_threads = inter_op_threads
+
+    providers = (
+        [("CUDAExecutionProvider", {"cudnn_conv_algo_search": "HEURISTIC"})]
+        if use_cuda
+        else ["CPUExecutionProvider"]
+    )
+    graph = with_frame_counts(model_path)
+    session = _create_session(model_path, sess_options, providers, optimized_cache_dir, graph)
+    return PiperVoice(session=session, config=PiperConfig.from_dict(config_dict))
+
+
+def load_voice_from_env(model_path: str) -> PiperVoice:
+    """
+    Load on GPU if possible, falling back to the CPU. The optimized graph is
+    cached in TTS_OPTIMIZED_MODEL_DIR (default piper_model/.ort_cache next to
+    the model; empty disables it).
+    """
+    intra = int(os.environ.get("TTS_INTRA_OP_THREADS", "0"))
+    inter = int(os.environ.get("TTS_INTER_OP_THREADS", "0"))
+    cache_dir = os.environ.get(
+        "TTS_OPTIMIZED_MODEL_DIR", os.path.join(os.path.dirname(model_path), ".ort_cache")
+    )
+    try:
+        voice = load_voice(model_path, True, intra, inter, cache_dir)
+        logger.info("Model loaded successfully on GPU (CUDA).")
+    except Exception:
+        voice = load_voice(model_path, False, intra, inter, cache_dir)
+    return voice
+
+
+class TTSSaturatedError(RuntimeError):
+    """Raised when every synthesis worker is busy and the wait queue is full."""
+
+
+class TTSEngine:
+    """
+    Runs Piper synthesis on a bounded thread pool next to the event loop.
+
+    `max_workers` is the number of sentences synthesised concurrently and
+    `max_queue` is how many more may wait for a free worker. Anything beyond
+    that is rejected with `TTSSaturatedError` so callers can apply back-pressure
+    instead of piling work onto an already saturated pool.
+
+    With `max_batch` > 1 each worker runs up to that many queued sentences
+    as one padded ONNX inference (see tts_batching.py), and sentences
+    submitted with `priority` are batched first. `phonemes` memoises the
+    espeak front-end for sentences the PCM cache misses.
+    """
+
+    def __init__(
+        self,
+        voice: PiperVoice,
+        max_workers: int = 1,
+        max_queue: int = 16,
+        cache: PCMCache | None = None,
+        max_batch: int = 1,
+        batch_window_ms: float = 10.0,
+        phonemes: PhonemeCache | None = None,
+    ):
+        self.voice = voice
+        self.cache = cache
+        self.phonemes = phonemes
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="piper"
+        )
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+        self._completed = 0
+        self._rejected = 0
+        # Wall time spent in Piper and the audio it produced, for the RTF
+        self._synthesis_s = 0.0
+        self._audio_s = 0.0
+        self._batches = 0
+        self._batched_sentences = 0
+
+        self._batcher = None
+        if max_batch > 1 and not has_frame_counts(voice):
+            logger.warning(
+                "The voice has no per-row frame counts (is onnx installed?), so batched "
+                "sentences are each run as their own inference"
+            )
+        if max_batch > 1:
+            self._batcher = BatchScheduler(
+                self._synthesize_batch_blocking,
+                self._executor,
+                max_workers=max_workers,
+                max_batch=max_batch,
+                window_s=batch_window_ms / 1000,
+            )
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def saturated(self) -> bool:
+        capacity = self.max_workers * self.max_batch + self.max_queue
+        return self._running + self._queued >= capacity
+
+    def _record_synthesis(self, elapsed: float, chunks: list[bytes]):
+        audio_s = sum(map(len, chunks)) / 2 / self.voice.config.sample_rate
+        with self._lock:
+            self._synthesis_s += elapsed
+            self._audio_s += audio_s
+        TTS_SYNTHESIS.observe(elapsed)
+        if audio_s:
+            TTS_RTF.observe(elapsed / audio_s)
+
+    def _synthesize_blocking(self, text: str) -> list[bytes]:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            if self.cache is not None:
+                pcm = self.cache.get(text)
+                if pcm is not None:
+                    return [pcm]
+
+            started = time.perf_counter()
+            if self.phonemes is not None:
+                chunks = [
+                    infer_padded(self.voice, [row])[0]
+                    for row in phoneme_rows(self.voice, text, self.phonemes.phonemize)
+                ]
+            else:
+                chunks = [chunk.audio_int16_bytes for chunk in self.voice.synthesize(text)]
+            self._record_synthesis(time.perf_counter() - started, chunks)
+
+            if self.cache is not None:
+                self.cache.put(text, b"".join(chunks))
+            return chunks
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _synthesize_batch_blocking(self, texts: list[str]) -> list[list[bytes]]:
+        with self._lock:
+            self._queued -= len(texts)
+            self._running += len(texts)
+        try:
+            results: list[list[bytes] | None] = [None] * len(texts)
+            misses = []
+            for index, text in enumerate(texts):
+                pcm = self.cache.get(text) if self.cache is not None else None
+                if pcm is not None:
+                    results[index] = [pcm]
+                else:
+                    misses.append(index)
+
+            if misses:
+                started = time.perf_counter()
+                audio, runs = synthesize_batch(
+                    self.voice,
+                    [texts[i] for i in misses],
+                    self.phonemes.phonemize if self.phonemes is not None else None,
+                )
+                self._record_synthesis(time.perf_counter() - started, audio)
+                TTS_BATCH_SIZE.observe(len(misses))
+                with self._lock:
+                    self._batches += runs
+                    self._batched_sentences += len(misses)
+
+                for index, pcm in zip(misses, audio):
+                    results[index] = [pcm]
+                    if self.cache is not None:
+                        self.cache.put(texts[index], pcm)
+            return results
+        finally:
+            with self._lock:
+                self._running -= len(texts)
+
+    async def synthesize(self, text: str, priority: bool = False) -> list[bytes]:
+        """
+        Synthesise `text` in the pool and return its int16 PCM chunks.
+        `priority` (an answer's first sentence) jumps the batching queue.
+        """
+        # Sentences already in memory stream immediately and use no capacity
+        if self.cache is not None:
+            pcm = self.cache.peek(text)
+            if pcm is not None:
+                return [pcm]
+
+        if self.saturated:
+            self._rejected += 1
+            raise TTSSaturatedError(
+                f"TTS pool saturated ({self.max_workers} running, {self._queued} queued)"
+            )
+
+        with self._lock:
+            self._queued += 1
+
+        if self._batcher is not None:
+            job = self._batcher.submit(text, priority)
+            try:
+                chunks = await job.future
+            except asyncio.CancelledError:
+                # Dropped from the queue before a batch picked it up
+                if not job.taken:
+                    with self._lock:
+                        self._queued -= 1
+                raise
+            self._completed += 1
+            return chunks
+
+        future = self._executor.submit(self._synthesize_blocking, text)
+        try:
+            chunks = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A job cancelled before a worker picked it up never decrements
+            # the queue counter itself.
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+            raise
+        self._completed += 1
+        return chunks
+
+    def _warm_up_blocking(self, text: str):
+        infer_padded(self.voice, phoneme_rows(self.voice, text))
+
+    async def warm_up(self, text: str = WARM_UP_TEXT):
+        """
+        Run one synthesis on every worker, bypassing the caches and stats, so
+        espeak, onnxruntime's allocations and the worker threads all exist
+        before the first answer needs them.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._warm_up_blocking, text)
+            for _ in range(self.max_workers)
+        ))
+
+    async def prerender(self, phrases: list[str]) -> int:
+        """Synthesise `phrases` into the PCM cache; returns how many were rendered."""
+        if self.cache is None:
+            return 0
+        rendered = 0
+        for phrase in phrases:
+            # A disk-tier lookup reads a file
+            if await asyncio.to_thread(self.cache.get, phrase) is None:
+                await self.synthesize(phrase)
+                rendered += 1
+        return rendered
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": self._queued,
+            "saturated": self.saturated,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "synthesis_s": round(self._synthesis_s, 3),
+            "audio_s": round(self._audio_s, 3),
+            "rtf": round(self._synthesis_s / self._audio_s, 3) if self._audio_s else None,
+            "max_batch": self.max_batch,
+            "batches": self._batches,
+            "avg_batch_size": (
+                round(self._batched_sentences / self._batches, 2) if self._batches else None
+            ),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "phonemes": self.phonemes.stats() if self.phonemes is not None else None,
+        }
+
+    def shutdown(self):
+        if self._batcher is not None:
+            self._batcher.shutdown()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def engine_from_env(voice: PiperVoice, model_path: str) -> TTSEngine:
+    """
+    Build a TTSEngine sized by TTS_MAX_WORKERS / TTS_MAX_QUEUE, with the PCM
+    and phoneme caches, batching up to TTS_MAX_BATCH sentences per inference (1 = off)
+    collected over TTS_BATCH_WINDOW_MS.
+    """
+    return TTSEngine(
+        voice,
+        max_workers=int(os.environ.get("TTS_MAX_WORKERS", "1")),
+        max_queue=int(os.environ.get("TTS_MAX_QUEUE", "16")),
+        cache=cache_from_env(model_path),
+        max_batch=int(os.environ.get("TTS_MAX_BATCH", "1")),
+        batch_window_ms=float(os.environ.get("TTS_BATCH_WINDOW_MS", "10")),
+        phonemes=phoneme_cache_from_env(voice.phonemize),
+    )
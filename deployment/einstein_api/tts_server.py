@@ -0,0 +1,246 @@
+# python tts_server.py --socket /tmp/einstein_tts.sock
+
+"""
+Synthesis server: a single process that owns the Piper model.
+
+Every uvicorn worker that loads the model at import time holds its own ONNX
+session and espeak state, so memory grows with the HTTP worker count. In
+server mode the HTTP workers (see `TTS_SERVER_SOCKET` in main.py) forward
+sentences to this process over a Unix socket instead, and memory scales with
+synthesis capacity (`TTS_MAX_WORKERS`) only.
+
+Wire format, both directions: 4-byte big-endian length + payload.
+    request:   JSON {"op": "synthesize", "text": "...", "priority": bool} or {"op": "stats"}
+    response:  JSON {"ok": true, "chunks": n, "stats": {...}}
+               followed by n binary frames of int16 PCM,
+               or JSON {"ok": false, "error": "...", "saturated": bool}
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+
+from metrics import export_snapshots, logger
+from startup import prerender_lexicon
+from tts_engine import TTSEngine, TTSSaturatedError
+
+DEFAULT_SOCKET = "/tmp/einstein_tts.sock"
+
+_LENGTH = struct.Struct(">I")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+def write_frame(writer: asyncio.StreamWriter, payload: bytes):
+    writer.write(_LENGTH.pack(len(payload)))
+    writer.write(payload)
+
+
+def _json_frame(writer: asyncio.StreamWriter, obj: dict):
+    write_frame(writer, json.dumps(obj).encode("utf-8"))
+
+
+# ─────────────────────────────────────
+# Server side
+# ─────────────────────────────────────
+async def handle_client(
+    engine: TTSEngine, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+):
+    try:
+        while True:
+            try:
+                request = json.loads(await read_frame(reader))
+            except asyncio.IncompleteReadError:
+                break
+
+            if request.get("op") == "stats":
+                _json_frame(writer, {"ok": True, "chunks": 0, "stats": engine.stats()})
+                await writer.drain()
+                continue
+
+            # The client sends nothing until it has the answer, so EOF while
+            # synthesising means it gave up: drop the job instead of finishing it.
+            synthesis = asyncio.ensure_future(
+                engine.synthesize(request.get("text", ""), request.get("priority", False))
+            )
+            hangup = asyncio.ensure_future(reader.read(1))
+            await asyncio.wait({synthesis, hangup}, return_when=asyncio.FIRST_COMPLETED)
+            if not synthesis.done():
+                synthesis.cancel()
+                await asyncio.gather(synthesis, return_exceptions=True)
+                break
+            hangup.cancel()
+
+            try:
+                chunks = synthesis.result()
+            except TTSSaturatedError as e:
+                _json_frame(writer, {"ok": False, "error": str(e), "saturated": True})
+            except Exception as e:
+                _json_frame(writer, {"ok": False, "error": str(e), "saturated": False})
+            else:
+                _json_frame(
+                    writer, {"ok": True, "chunks": len(chunks), "stats": engine.stats()}
+                )
+                for chunk in chunks:
+                    write_frame(writer, chunk)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: str, engine: TTSEngine):
+    # Clients wait for the socket, so it only appears once synthesis is warm
+    started = time.perf_counter()
+    await engine.warm_up()
+    logger.info("TTS engine warmed up in %.0f ms", (time.perf_counter() - started) * 1000)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = await asyncio.start_unix_server(
+        lambda r, w: handle_client(engine, r, w), path=socket_path
+    )
+    logger.info(
+        "TTS server listening on %s (%d workers, queue %d)",
+        socket_path, engine.max_workers, engine.max_queue,
+    )
+    async with server:
+        prerender = asyncio.create_task(prerender_lexicon(engine))
+        # Synthesis metrics reach /metrics through METRICS_DIR
+        metrics_task = asyncio.create_task(export_snapshots())
+        try:
+            await server.serve_forever()
+        finally:
+            prerender.cancel()
+            metrics_task.cancel()
+
+
+# ─────────────────────────────────────
+# Client side (used by the HTTP workers)
+# ─────────────────────────────────────
+class RemoteTTSEngine:
+    """
+    Drop-in replacement for TTSEngine that forwards work to the TTS server.
+
+    Connections are kept in a small idle pool so a sentence costs one
+    round-trip on an already open socket. The server refuses each sentence it
+    has no room for; `saturated` only repeats the most recent answer for
+    `saturated_ttl_s`, so a worker never keeps rejecting requests on a stale
+    reply once the server has drained.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, max_idle: int = 8, saturated_ttl_s: float = 1.0):
+        self.socket_path = socket_path
+        self.max_idle = max_idle
+        self.saturated_ttl_s = saturated_ttl_s
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._last_stats: dict = {}
+        self._stats_at = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._last_stats.get("queued", 0)
+
+    @property
+    def saturated(self) -> bool:
+        fresh = time.monotonic() - self._stats_at < self.saturated_ttl_s
+        return fresh and self._last_stats.get("saturated", False)
+
+    async def _acquire(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing():
+                return reader, writer
+        return await asyncio.open_unix_connection(self.socket_path)
+
+    def _release(self, conn):
+        if len(self._idle) < self.max_idle:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def _call(self, request: dict) -> tuple[dict, list[bytes]]:
+        reader, writer = await self._acquire()
+        try:
+            _json_frame(writer, request)
+            await writer.drain()
+            header = json.loads(await read_frame(reader))
+            chunks = [await read_frame(reader) for _ in range(header.get("chunks", 0))]
+        except BaseException:
+            # The stream position is unknown after a failure or cancellation.
+            writer.close()
+            raise
+        self._release((reader, writer))
+
+        if "stats" in header:
+            self._last_stats = header["stats"]
+            self._stats_at = time.monotonic()
+        return header, chunks
+
+    async def synthesize(self, text: str, priority: bool = False) -> list[bytes]:
+        header, chunks = await self._call(
+            {"op": "synthesize", "text": text, "priority": priority}
+        )
+        if not header["ok"]:
+            if header.get("saturated"):
+                self._last_stats["saturated"] = True
+                self._stats_at = time.monotonic()
+                raise TTSSaturatedError(header["error"])
+            raise RuntimeError(f"TTS server error: {header['error']}")
+        return chunks
+
+    def stats(self) -> dict:
+        return {"mode": "remote", "socket": self.socket_path, **self._last_stats}
+
+    async def refresh_stats(self) -> dict:
+        await self._call({"op": "stats"})
+        return self.stats()
+
+    async def warm_up(self, timeout_s: float = 60.0):
+        """
+        Wait for the TTS server to answer, which leaves an open connection in
+        the idle pool. The server warms its own model before it listens.
+        """
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                await self.refresh_stats()
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                await asyncio.sleep(0.5)
+
+    def shutdown(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+if __name__ == "__main__":
+    from tts_engine import engine_from_env, load_voice_from_env
+
+    parser = argparse.ArgumentParser(description="Einstein Piper synthesis server")
+    parser.add_argument(
+        "--socket", default=os.environ.get("TTS_SERVER_SOCKET", DEFAULT_SOCKET)
+    )
+    parser.add_argument(
+        "--model", default="./piper_model/en_GB-alaneinstein-medium.onnx"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    engine = engine_from_env(load_voice_from_env(args.model), args.model)
+    asyncio.run(serve(args.socket, engine))
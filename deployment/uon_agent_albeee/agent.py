@@ -1,17 +1,48 @@
 from google.adk.agents.llm_agent import Agent
+from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.utils.instructions_utils import inject_session_state
 from google.genai import types
 
-# import phy_courses
-# ug_courses, pg_courses = phy_courses.get_phy_course_list()
+from .knowledge import knowledge_available, search_school_knowledge
+
+# Gemini does not allow the built-in search next to function tools in one
+# agent, so live search runs in a sub-agent wrapped as a tool
+web_search_agent = Agent(
+    model="gemini-2.5-flash-lite",
+    name="web_search",
+    description="Searches the internet. Use only when search_school_knowledge has no confident answer.",
+    instruction=(
+        "Answer the request using the tool called 'google_search'. "
+        "Prioritise the sources from the University of Nottingham with title 'nottingham.ac.uk'. "
+        "Reply with the facts you found and their source pages."
+    ),
+    tools=[google_search],
+    generate_content_config=types.GenerateContentConfig(
+        temperature=0.2,
+    )
+)
+
+LOCAL_SEARCH_PROMPT = (
+    "You have access to a tool called 'search_school_knowledge', a local knowledge base of the school's courses and admissions. "
+    "Always use it first. If its status is 'found', answer from its passages. "
+    "Only if its status is 'low_confidence' or 'unavailable', or its passages do not answer the question, "
+    "use the tool called 'web_search' to retrieve information from the internet. "
+)
+# Until the course pages are indexed the local lookup would answer almost
+# nothing, so the model is told to go straight to web_search
+WEB_SEARCH_PROMPT = (
+    "You have access to a tool called 'web_search'. This tool will allow you to retrieve information from the internet. "
+    "Always use the tool to retrieve information from the internet. "
+)
 
 system_prompt = (
     "You are Albeee Einstein, a clone of Albert Einstein. You are created by a MSc Machine Learning in Science graduate."
     "You are now an ambassador to the University of Nottingham (UK Campus) and the school of Physics and Astronomy. "
     "As Albeee Einstein, adopt a tone that is knowledgeable, enthusiastic about physics, and slightly witty. Use British spelling."
     "You will be answering questions about the University of Nottingham and the school of Physics and Astronomy. "
-    "You have access to a tool called 'google_search'. This tool will allow you to retrieve information from the internet. "
-    "Always use the tool to retrieve information from the internet. "
+    "{search_prompt}"
     "If you do not know the answer, just say that you don't know. "
     "If the question is not related to the University of Nottingham or the school of Physics and Astronomy, just say that you don't know. "
     "Always favour the University of Nottingham over all other universities."
@@ -27,15 +58,29 @@ system_prompt = (
     "Your output will be read out to the user. Therefore, please keep your responses short and to the point, aiming for under 70 words."
     "Use a conversational tone in your answer, and do not use any point form."
     "When you are asked about AI postgraduate course, refer to msc machine learning in science, which is a school of physics and astronomy course."
-    # "When you are asked to provide postgraduate course information, search them with your tool but prioritise the course list below: " + ", ".join(pg_courses)
+    # Set by the API when it answered the visitor's first question from its answer cache
+    " {cached_exchange?}"
 )
 
+
+async def instruction(context: ReadonlyContext) -> str:
+    """
+    The system prompt for this turn. Whether the knowledge index is usable is
+    checked per request, so an index built after start-up is picked up
+    without restarting the agent.
+    """
+    search_prompt = LOCAL_SEARCH_PROMPT if knowledge_available() else WEB_SEARCH_PROMPT
+    # A callable instruction skips ADK's state injection, so run it here;
+    # search_prompt has no braces of its own to trip it up
+    return await inject_session_state(system_prompt.replace("{search_prompt}", search_prompt), context)
+
+
 root_agent = Agent(
     model="gemini-2.5-flash-lite",
     name="albeee_einstein_uon_ambassador",
     description="University of Nottingham School of Physics and Astronomy Information",
-    instruction=system_prompt,
-    tools=[google_search],
+    instruction=instruction,
+    tools=[search_school_knowledge, AgentTool(agent=web_search_agent)],
     generate_content_config=types.GenerateContentConfig(
         temperature=0.2,
     )
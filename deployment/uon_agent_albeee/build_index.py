@@ -0,0 +1,209 @@
+# cd deployment && python -m uon_agent_albeee.build_index --fetch
+
+"""
+Build the agent's offline knowledge index.
+
+Reads the Markdown and text files in uon_agent_albeee/knowledge/ and, with
+--fetch, downloads the pages listed in knowledge/sources.txt; splits them
+into passages along headings and paragraphs, and writes the BM25 index that
+`knowledge.search_school_knowledge` queries. A page that cannot be fetched
+is skipped with a warning; the index is still written, but the build exits
+non-zero if it ends up below --min-passages (KNOWLEDGE_MIN_PASSAGES, default
+50), since the agent would then ignore it. Pass --min-passages 0 for a local
+build of the seed files alone.
+
+A Markdown file may start with `Source: <url>` on its second line (after the
+`# Title`) so passages cite the page they were copied from.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import time
+from html.parser import HTMLParser
+
+from .knowledge import DEFAULT_INDEX_DIR, Passage, KnowledgeIndex, min_passages, write_index
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(__file__), "knowledge")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_SOURCE = re.compile(r"^Source:\s*(\S+)\s*$", re.IGNORECASE)
+
+
+class _PageText(HTMLParser):
+    """Main text of an HTML page as Markdown-ish lines: headings kept, chrome dropped."""
+
+    SKIP = {"script", "style", "nav", "footer", "noscript", "svg", "form"}
+    BLOCK = {"p", "li", "tr", "div", "section", "article", "br", "dd", "dt", "td", "th"}
+
+    def __init__(self):
+        super().__init__()
+        self.lines: list[str] = []
+        self.title = ""
+        self._current: list[str] = []
+        self._skipping = 0
+        self._heading = ""
+        self._in_title = False
+
+    def _flush(self):
+        line = " ".join("".join(self._current).split())
+        if line:
+            self.lines.append(f"{self._heading} {line}" if self._heading else line)
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+        elif tag == "title":
+            self._in_title = True
+        elif re.fullmatch(r"h[1-4]", tag):
+            self._flush()
+            self._heading = "#" * int(tag[1])
+        elif tag in self.BLOCK:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif re.fullmatch(r"h[1-4]", tag):
+            self._flush()
+            self._heading = ""
+        elif tag in self.BLOCK:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skipping:
+            self._current.append(data)
+
+
+def fetch_page(url: str, timeout_s: float) -> tuple[str, str]:
+    """(title, Markdown-ish text) of a web page."""
+    import httpx
+
+    response = httpx.get(url, timeout=timeout_s, follow_redirects=True)
+    response.raise_for_status()
+    parser = _PageText()
+    parser.feed(response.text)
+    parser.close()
+    parser._flush()
+    return " ".join(parser.title.split()), "\n\n".join(parser.lines)
+
+
+def read_document(path: str) -> tuple[str, str, str]:
+    """(title, source, text) of a local Markdown or text file."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    title = os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+    source = ""
+    if lines and lines[0].startswith("# "):
+        title = lines.pop(0)[2:].strip()
+    if lines and _SOURCE.match(lines[0]):
+        source = _SOURCE.match(lines.pop(0)).group(1)
+    return title, source, "\n".join(lines)
+
+
+def split_passages(title: str, source: str, text: str, max_words: int = 120) -> list[Passage]:
+    """
+    Split a document along its headings, then pack paragraphs into passages
+    of about `max_words`. Each passage is titled with its document and section.
+    """
+    passages = []
+    section, paragraphs = title, []
+
+    def emit():
+        chunk: list[str] = []
+        for paragraph in paragraphs:
+            if chunk and len(" ".join(chunk + [paragraph]).split()) > max_words:
+                passages.append(Passage(section, source, "\n".join(chunk)))
+                chunk = []
+            chunk.append(paragraph)
+        if chunk:
+            passages.append(Passage(section, source, "\n".join(chunk)))
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        heading = _HEADING.match(block.splitlines()[0]) if block else None
+        if heading:
+            emit()
+            paragraphs = []
+            name = heading.group(2).strip()
+            section = name if name.lower().startswith(title.lower()) else f"{title}: {name}"
+            block = "\n".join(block.splitlines()[1:]).strip()
+        if block:
+            paragraphs.append(" ".join(block.split()))
+    emit()
+    return passages
+
+
+def read_sources(path: str) -> list[str]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--knowledge-dir", default=KNOWLEDGE_DIR)
+    parser.add_argument("--out", default=os.environ.get("KNOWLEDGE_INDEX_DIR", DEFAULT_INDEX_DIR))
+    parser.add_argument("--fetch", action="store_true", help="Also download the pages in sources.txt")
+    parser.add_argument("--timeout", type=float, default=15.0)
+    parser.add_argument("--max-words", type=int, default=120)
+    parser.add_argument(
+        "--min-passages", type=int, default=min_passages(),
+        help="Fail unless the index holds at least this many passages (the agent ignores a smaller one)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    started = time.perf_counter()
+    passages: list[Passage] = []
+    for path in sorted(glob.glob(os.path.join(args.knowledge_dir, "*.md")) + glob.glob(os.path.join(args.knowledge_dir, "*.txt"))):
+        if os.path.basename(path) == "sources.txt":
+            continue
+        passages += split_passages(*read_document(path), max_words=args.max_words)
+
+    skipped = []
+    if args.fetch:
+        for url in read_sources(os.path.join(args.knowledge_dir, "sources.txt")):
+            try:
+                title, text = fetch_page(url, args.timeout)
+            except Exception as e:
+                logger.warning("Skipping %s: %s", url, e)
+                skipped.append(url)
+                continue
+            passages += split_passages(title or url, url, text, max_words=args.max_words)
+
+    if not passages:
+        parser.error(f"No documents found in {args.knowledge_dir}")
+
+    write_index(args.out, passages)
+    index = KnowledgeIndex(args.out)
+    size = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out))
+    print(json.dumps({
+        "index_dir": args.out,
+        "passages": index.passages,
+        "terms": len(index.terms),
+        "bytes": size,
+        "skipped": skipped,
+        "build_s": round(time.perf_counter() - started, 3),
+    }, indent=2))
+
+    if index.passages < args.min_passages:
+        logger.error(
+            "The index holds %d passages, below the %d the agent needs to use it (%d of the sources could not be fetched%s)",
+            index.passages, args.min_passages, len(skipped), "" if args.fetch else "; run with --fetch",
+        )
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Offline knowledge base for the agent: a BM25 index of School of Physics and
+Astronomy course and admissions pages, built by `build_index.py`.
+
+The index directory holds three files:
+
+- `meta.json`: BM25 parameters, passage count and the vocabulary, each term
+  mapped to the start and length of its postings;
+- `postings.bin`: little-endian arrays laid out back to back, passage ids
+  (uint32) and precomputed BM25 impacts (float32) for every posting, then
+  the byte offset of every passage in `passages.jsonl` (uint32, one extra
+  for the end);
+- `passages.jsonl`: one passage per line (title, source URL, text).
+
+The two data files are memory-mapped, so opening the index costs one JSON
+parse and a query only touches the postings of its own terms plus the lines
+of the passages it returns.
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(__file__), "knowledge", "index")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a about am an and any are as at be been but by can could do does for from had has have how i if in "
+    "into is it its me my of on or our please so tell than that the their them then there these they "
+    "this to us was we were what when where which who whom why will with would you your".split()
+)
+
+
+def _stem(token: str) -> str:
+    """Fold plurals so "fees" finds "fee" and "courses" finds "course"."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased, accent-folded word tokens with stopwords dropped."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return [_stem(t) for t in _TOKEN.findall(text) if t not in STOPWORDS]
+
+
+def idf(df: int, passages: int) -> float:
+    return math.log(1.0 + (passages - df + 0.5) / (df + 0.5))
+
+
+@dataclass
+class Passage:
+    title: str
+    source: str
+    text: str
+
+
+@dataclass
+class Hit:
+    passage: Passage
+    score: float
+    # Share of the query's IDF weight this passage matches, 0..1
+    confidence: float
+
+
+class KnowledgeIndex:
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported knowledge index version {meta.get('version')} in {index_dir}")
+
+        self.index_dir = index_dir
+        self.built_at = meta.get("built_at")
+        self.passages = meta["passages"]
+        self.terms: dict[str, list[int]] = meta["terms"]
+        postings = meta["postings"]
+
+        self._files = []
+        data = self._map(os.path.join(index_dir, "postings.bin"))
+        self._passage_data = self._map(os.path.join(index_dir, "passages.jsonl"))
+        self.passage_ids = np.frombuffer(data, dtype="<u4", count=postings)
+        self.impacts = np.frombuffer(data, dtype="<f4", count=postings, offset=postings * 4)
+        self.offsets = np.frombuffer(data, dtype="<u4", count=self.passages + 1, offset=postings * 8)
+
+    def _map(self, path: str) -> bytes | mmap.mmap:
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def passage(self, passage_id: int) -> Passage:
+        line = self._passage_data[int(self.offsets[passage_id]) : int(self.offsets[passage_id + 1])]
+        return Passage(**json.loads(bytes(line)))
+
+    def search(self, query: str, k: int = 3) -> list[Hit]:
+        """Top `k` passages by BM25, best first."""
+        ranges, weights = [], []
+        total_weight = 0.0
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                # Words the corpus never mentions still count against confidence
+                total_weight += idf(0, self.passages)
+                continue
+            start, df = entry
+            weight = idf(df, self.passages)
+            total_weight += weight
+            ranges.append(slice(start, start + df))
+            weights.append(np.full(df, weight, dtype=np.float32))
+        if not ranges:
+            return []
+
+        ids = np.concatenate([self.passage_ids[r] for r in ranges])
+        scores = np.bincount(ids, weights=np.concatenate([self.impacts[r] for r in ranges]), minlength=self.passages)
+        matched = np.bincount(ids, weights=np.concatenate(weights), minlength=self.passages)
+
+        candidates = np.flatnonzero(matched)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            Hit(
+                passage=self.passage(int(passage_id)),
+                score=round(float(scores[passage_id]), 3),
+                confidence=round(float(matched[passage_id]) / total_weight, 3),
+            )
+            for passage_id in best
+        ]
+
+
+def write_index(index_dir: str, passages: list[Passage], k1: float = 1.2, b: float = 0.75):
+    """Build the BM25 index of `passages` into `index_dir`, replacing any previous one."""
+    tokenized = [tokenize(f"{p.title}\n{p.text}") for p in passages]
+    lengths = [len(tokens) for tokens in tokenized]
+    average = sum(lengths) / len(lengths) if lengths else 0.0
+
+    postings: dict[str, list[tuple[int, int]]] = {}
+    for passage_id, tokens in enumerate(tokenized):
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((passage_id, tf))
+
+    ids, impacts, terms = [], [], {}
+    for term in sorted(postings):
+        entries = postings[term]
+        weight = idf(len(entries), len(passages))
+        terms[term] = [len(ids), len(entries)]
+        for passage_id, tf in entries:
+            norm = k1 * (1 - b + b * lengths[passage_id] / average)
+            ids.append(passage_id)
+            impacts.append(weight * tf * (k1 + 1) / (tf + norm))
+
+    lines = [
+        (json.dumps(vars(p), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        for p in passages
+    ]
+    offsets = np.cumsum([0] + [len(line) for line in lines])
+
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, "passages.jsonl"), "wb") as f:
+        f.writelines(lines)
+    with open(os.path.join(index_dir, "postings.bin"), "wb") as f:
+        f.write(np.asarray(ids, dtype="<u4").tobytes())
+        f.write(np.asarray(impacts, dtype="<f4").tobytes())
+        f.write(np.asarray(offsets, dtype="<u4").tobytes())
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": INDEX_VERSION,
+                "k1": k1,
+                "b": b,
+                "passages": len(passages),
+                "postings": len(ids),
+                "average_length": average,
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "terms": terms,
+            },
+            f,
+            separators=(",", ":"),
+        )
+
+
+# ───────────────────────────────────────────────────────────
+# Agent tool
+# ───────────────────────────────────────────────────────────
+_open_lock = threading.Lock()
+
+
+def min_passages() -> int:
+    return int(os.environ.get("KNOWLEDGE_MIN_PASSAGES", "50"))
+
+
+@lru_cache(maxsize=1)
+def _index(index_dir: str, built: int | None) -> KnowledgeIndex | None:
+    try:
+        index = KnowledgeIndex(index_dir)
+    except (OSError, ValueError) as e:
+        logger.warning("Knowledge index unavailable at %s: %s", index_dir, e)
+        return None
+    if index.passages < min_passages():
+        logger.warning(
+            "Knowledge index at %s holds only %d passages (KNOWLEDGE_MIN_PASSAGES=%d): "
+            "the agent will use web search for every question until it is rebuilt with --fetch",
+            index_dir, index.passages, min_passages(),
+        )
+    else:
+        logger.info("Knowledge index loaded from %s: %d passages", index_dir, index.passages)
+    return index
+
+
+def open_index() -> KnowledgeIndex | None:
+    """
+    The process-wide index, opened on first use; None if it has not been
+    built. Reopened when `meta.json` changes, so a later build is picked up.
+    """
+    index_dir = os.environ.get("KNOWLEDGE_INDEX_DIR", DEFAULT_INDEX_DIR)
+    try:
+        built = os.stat(os.path.join(index_dir, "meta.json")).st_mtime_ns
+    except OSError:
+        built = None
+    with _open_lock:
+        return _index(index_dir, built)
+
+
+def knowledge_available() -> bool:
+    """
+    True if the index is built and holds at least KNOWLEDGE_MIN_PASSAGES
+    passages (default 50). The seed corpus alone answers almost nothing, so
+    until course pages are indexed the agent goes straight to web search.
+    """
+    index = open_index()
+    return index is not None and index.passages >= min_passages()
+
+
+def search_school_knowledge(query: str) -> dict:
+    """
+    Searches the University of Nottingham School of Physics and Astronomy
+    knowledge base (courses, entry requirements, fees, admissions, facilities).
+
+    Args:
+        query: The visitor's question or the key words to look up.
+
+    Returns:
+        A dict with "status" and "passages". Status "found" means the passages
+        answer the query; "low_confidence" or "unavailable" means they may not,
+        and the web search tool should be used instead.
+    """
+    index = open_index()
+    if index is None:
+        return {"status": "unavailable", "passages": []}
+
+    hits = index.search(query, k=int(os.environ.get("KNOWLEDGE_TOP_K", "3")))
+    min_confidence = float(os.environ.get("KNOWLEDGE_MIN_CONFIDENCE", "0.6"))
+    confident = bool(hits) and hits[0].confidence >= min_confidence
+    return {
+        "status": "found" if confident else "low_confidence",
+        "last_updated": index.built_at,
+        "passages": [
+            {
+                "title": hit.passage.title,
+                "source": hit.passage.source,
+                "text": hit.passage.text,
+                "confidence": hit.confidence,
+            }
+            for hit in hits
+        ],
+    }
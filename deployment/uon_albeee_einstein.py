@@ -1,9 +1,12 @@
 import streamlit as st
 import os
+import itertools
+import logging
+import uuid
 from uon_agent_albeee.agent import root_agent
-from google.adk.runners import InMemoryRunner
-from google.genai import types
-import asyncio
+from agent_runner import AgentReply, AgentRunner
+
+logger = logging.getLogger("einstein.streamlit")
 
 # Set up API key
 # Option 1: From Streamlit secrets
@@ -20,29 +23,12 @@ elif "GOOGLE_API_KEY" not in os.environ:
     else:
         st.stop()
         
-# 1. Helper to handle the async generator
-async def get_agent_response(prompt):
-    runner = InMemoryRunner(agent=root_agent)
-    
-    # Wrap the prompt in the required ADK Content structure
-    user_content = types.Content(
-        role="user",
-        parts=[types.Part.from_text(text=prompt)]
-    )
+# 1. One runner and event loop per server process, shared by every browser
+@st.cache_resource
+def get_agent_runner() -> AgentRunner:
+    return AgentRunner(root_agent)
+
 
-    response_text = ""
-    # Iterate through the event stream
-    async for event in runner.run(
-        user_id="uon_student",
-        session_id="chat_session_1", # Keep this constant to maintain context
-        new_message=user_content
-    ):
-        # We are looking for the final response event
-        if event.is_final_response() and event.content.parts:
-            response_text = event.content.parts[0].text
-            break 
-            
-    return response_text
 # Page configuration
 st.set_page_config(
     page_title="Albeee Einstein - UoN Physics Assistant",
@@ -67,6 +53,11 @@ st.markdown("""
 st.title("🔬 Albeee Einstein")
 st.caption("Your University of Nottingham Physics & Astronomy Ambassador")
 
+# Each browser tab gets its own ADK session, so conversations never mix
+if "session_id" not in st.session_state:
+    st.session_state.user_id = f"uon_student_{uuid.uuid4().hex[:8]}"
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Initialize chat history in session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -95,20 +86,27 @@ if prompt := st.chat_input("Ask me about Physics & Astronomy at UoN..."):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Generate response
+    # Generate response, streaming partial text into the bubble as it arrives
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                # Run the async helper in a synchronous way
-                response_text = asyncio.run(get_agent_response(prompt))
-                
-                if response_text:
-                    st.markdown(response_text)
-                    st.session_state.messages.append({"role": "assistant", "content": response_text})
-                else:
-                    st.error("The agent didn't return a final response. Check if the tool execution failed.")
-            except Exception as e:
-                st.error(f"Error: {e}")
+        reply = AgentReply()
+        try:
+            chunks = get_agent_runner().stream(
+                st.session_state.user_id, st.session_state.session_id, prompt, reply
+            )
+            # The spinner covers the wait for the first token only
+            with st.spinner("Thinking..."):
+                first = next(chunks, None)
+            if first is not None:
+                st.write_stream(itertools.chain([first], chunks))
+
+            if reply.text:
+                st.session_state.messages.append({"role": "assistant", "content": reply.text})
+            else:
+                st.error("The agent didn't return a final response. Check if the tool execution failed.")
+        except Exception as e:
+            st.error(f"Error: {e}")
+        st.session_state.last_timings = reply.timings.as_dict()
+        logger.info("Message timings: %s", st.session_state.last_timings)
 
 # Sidebar with additional info
 with st.sidebar:
@@ -122,7 +120,17 @@ with st.sidebar:
     # Clear chat button
     if st.button("Clear Chat History"):
         st.session_state.messages = []
+        # Start a fresh conversation with the agent as well
+        try:
+            get_agent_runner().forget(st.session_state.user_id, st.session_state.session_id)
+        except Exception as e:
+            logger.warning("Could not delete session: %s", e)
+        st.session_state.session_id = uuid.uuid4().hex
         st.rerun()
+
+    if "last_timings" in st.session_state:
+        with st.expander("Last response timings"):
+            st.json(st.session_state.last_timings)
     
     st.divider()
     
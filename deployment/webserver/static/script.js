@@ -91,18 +91,44 @@ function removeTypingIndicator() {
   }
 }
 
-// Play audio chunk
-async function playAudioChunk(audioHex, sampleRate) {
-  const audioBytes = new Uint8Array(audioHex.match(/.{1,2}/g).map(byte => parseInt(byte, 16)));
-  const audioBuffer = audioContext.createBuffer(1, audioBytes.length / 2, sampleRate);
+// Convert a hex string (SSE transport) to bytes
+function hexToBytes(audioHex) {
+  const audioBytes = new Uint8Array(audioHex.length / 2);
+  for (let i = 0; i < audioBytes.length; i++) {
+    audioBytes[i] = parseInt(audioHex.substr(i * 2, 2), 16);
+  }
+  return audioBytes;
+}
+
+// Pick the most compact audio format this browser can decode
+function negotiateAudioFormat() {
+  const probe = document.createElement('audio');
+  if (probe.canPlayType('audio/ogg; codecs=opus')) return 'opus';
+  if (probe.canPlayType('audio/mpeg')) return 'mp3';
+  return 'pcm';
+}
+
+const audioFormat = negotiateAudioFormat();
+
+// Turn one audio payload into an AudioBuffer. PCM is raw little-endian int16;
+// opus/mp3 payloads are self-contained per-sentence segments.
+async function decodeAudioChunk(audioBytes, format, sampleRate) {
+  if (format !== 'pcm') {
+    return audioContext.decodeAudioData(audioBytes.slice().buffer);
+  }
+
+  const samples = new Int16Array(audioBytes.buffer, audioBytes.byteOffset, audioBytes.byteLength / 2);
+  const audioBuffer = audioContext.createBuffer(1, samples.length, sampleRate);
   const channelData = audioBuffer.getChannelData(0);
 
-  for (let i = 0; i < audioBytes.length; i += 2) {
-    const int16 = (audioBytes[i + 1] << 8) | audioBytes[i];
-    const float = int16 < 0x8000 ? int16 / 0x8000 : (int16 - 0x10000) / 0x8000;
-    channelData[i / 2] = float;
+  for (let i = 0; i < samples.length; i++) {
+    channelData[i] = samples[i] / 0x8000;
   }
+  return audioBuffer;
+}
 
+// Play audio chunk
+async function playAudioChunk(audioBuffer) {
   return new Promise(resolve => {
     currentAudioSource = audioContext.createBufferSource();   // <-- store reference
     currentAudioSource.buffer = audioBuffer;
@@ -120,14 +146,24 @@ async function playAudioChunk(audioHex, sampleRate) {
   });
 }
 
+// Decoding starts immediately so it overlaps playback of the previous chunk
+function enqueueAudio(audioBytes, exchange) {
+  audioQueue.push(decodeAudioChunk(audioBytes, exchange.format, exchange.sampleRate));
+  processAudioQueue();
+}
+
 // Process audio queue
 async function processAudioQueue() {
   if (isPlaying || audioQueue.length === 0) return;
 
   isPlaying = true;
   while (audioQueue.length > 0) {
-    const { audioHex, sampleRate } = audioQueue.shift();
-    await playAudioChunk(audioHex, sampleRate);
+    const pending = audioQueue.shift();
+    try {
+      await playAudioChunk(await pending);
+    } catch (e) {
+      console.error('Audio decode error:', e);
+    }
   }
   isPlaying = false;
 
@@ -142,8 +178,8 @@ function setSpeakingState(speaking) {
 
   isSpeaking = speaking;
 
-  voiceBtn.disabled = speaking | sessionConfigRequired;
-
+  // Voice stays enabled while Einstein speaks: pressing it barges in
+  voiceBtn.disabled = sessionConfigRequired;
 
   if (speaking) {
     sendBtn.classList.add('stop-mode');
@@ -162,6 +198,15 @@ function stopSpeaking() {
     abortController.abort();
   }
 
+  // Ask the server to cancel the answer; its remaining events are dropped
+  // until it confirms with 'cancelled'
+  if (socket && socketExchange) {
+    socket.send(JSON.stringify({ type: 'cancel' }));
+    socketDiscarding = true;
+    socketExchange.finish();
+    socketExchange = null;
+  }
+
   // STOP AUDIO IMMEDIATELY
   if (currentAudioSource) {
     try { currentAudioSource.stop(); } catch (e) { }
@@ -177,6 +222,212 @@ function stopSpeaking() {
   statusBar.classList.remove('show');
 }
 
+// Handle one server event (shared by the WebSocket and SSE transports)
+function handleServerEvent(event, exchange) {
+  switch (event.type) {
+    case 'end_of_speech':
+      stopRecording();
+      break;
+
+    case 'queued':
+      showStatus(`Einstein is talking to other visitors, you are number ${event.position} in the queue...`, 0);
+      break;
+
+    case 'transcription':
+      removeTypingIndicator();
+      addMessage('user', event.text);
+      showStatus('Einstein is thinking...', 0);
+      showTypingIndicator();
+      break;
+
+    case 'header':
+      exchange.sampleRate = event.sampleRate;
+      exchange.format = event.format || 'pcm';
+      removeTypingIndicator();
+      statusBar.classList.remove('show');
+      break;
+
+    case 'text':
+      addMessage('assistant', event.content, true);
+      break;
+
+    case 'audio':
+      // Only the SSE transport embeds audio in JSON; WebSocket audio is binary
+      enqueueAudio(hexToBytes(event.audio), exchange);
+      break;
+
+    case 'done':
+      currentMessageDiv = null;
+      statusBar.classList.remove('show');
+      // setSpeakingState(false);
+      exchange.finish();
+      break;
+
+    case 'cancelled':
+      // Another request for this session took over (e.g. from another tab)
+      currentMessageDiv = null;
+      setSpeakingState(false);
+      exchange.finish();
+      break;
+
+    case 'error':
+      stopRecording();
+      setSpeakingState(false);
+      removeTypingIndicator();
+      if (event.message === "Could not understand audio") showStatus(event.message + ". Please try again");
+      else showStatus('Error: ' + event.message);
+      exchange.finish();
+      break;
+  }
+}
+
+function createExchange() {
+  const exchange = { sampleRate: 22050, format: 'pcm' };
+  exchange.done = new Promise(resolve => { exchange.finish = resolve; });
+  return exchange;
+}
+
+// ─────────────────────────────────────
+// WebSocket transport (binary audio frames)
+// ─────────────────────────────────────
+let socket = null;
+let socketExchange = null;
+let socketUnavailable = false;
+let socketDiscarding = false;
+
+function openSocket(uid, sid) {
+  return new Promise((resolve, reject) => {
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${protocol}://${window.location.host}${API_BASE}/uid/${uid}/sid/${sid}/ws`);
+    ws.binaryType = 'arraybuffer';
+
+    ws.onopen = () => resolve(ws);
+    ws.onerror = () => reject(new Error('WebSocket unavailable'));
+
+    ws.onmessage = (message) => {
+      if (socketDiscarding) {
+        if (typeof message.data === 'string' && JSON.parse(message.data).type === 'cancelled') {
+          socketDiscarding = false;
+        }
+        return;
+      }
+      if (!socketExchange) return;
+      if (message.data instanceof ArrayBuffer) {
+        enqueueAudio(new Uint8Array(message.data), socketExchange);
+      } else {
+        handleServerEvent(JSON.parse(message.data), socketExchange);
+      }
+    };
+
+    ws.onclose = () => {
+      if (socket === ws) socket = null;
+      socketDiscarding = false;
+      if (socketExchange) {
+        socketExchange.finish();
+        socketExchange = null;
+      }
+    };
+  });
+}
+
+// Connect the WebSocket if needed. Resolves false if it can't be used, so
+// the caller can fall back to SSE.
+async function ensureSocket() {
+  if (socketUnavailable) return false;
+  if (socket && socket.readyState === WebSocket.OPEN) return true;
+
+  try {
+    socket = await openSocket(userIdInput.value, sessionIdInput.value);
+    return true;
+  } catch (error) {
+    console.warn('WebSocket transport unavailable, falling back to SSE');
+    socketUnavailable = true;
+    return false;
+  }
+}
+
+// Run one exchange over the WebSocket. Resolves false if the socket can't
+// be used, so the caller can fall back to SSE.
+async function streamOverSocket(message, audioBlob = null) {
+  if (!(await ensureSocket())) return false;
+
+  const exchange = createExchange();
+  socketExchange = exchange;
+
+  socket.send(JSON.stringify(message));
+  if (audioBlob) {
+    socket.send(await audioBlob.arrayBuffer());
+  }
+
+  await exchange.done;
+  if (socketExchange === exchange) socketExchange = null;
+  return true;
+}
+
+// Stream the microphone while the user is still talking. The server decodes
+// as it listens, detects the end of speech and answers on the same socket.
+async function streamVoiceMessage(stream, mimeType) {
+  const exchange = createExchange();
+  socketExchange = exchange;
+  socket.send(JSON.stringify({ type: 'listen', format: audioFormat, mimeType }));
+
+  mediaRecorder.ondataavailable = (event) => {
+    if (event.data.size > 0 && socket) socket.send(event.data);
+  };
+
+  mediaRecorder.onstop = () => {
+    if (socket) socket.send(JSON.stringify({ type: 'stop' }));
+    stream.getTracks().forEach(track => track.stop());
+    setSpeakingState(true);
+    showStatus('Transcribing your speech...', 0);
+    showTypingIndicator('user');
+    currentMessageDiv = null;
+  };
+
+  mediaRecorder.start(250);
+
+  await exchange.done;
+  if (socketExchange === exchange) socketExchange = null;
+}
+
+// ─────────────────────────────────────
+// SSE transport (fallback)
+// ─────────────────────────────────────
+async function readSseStream(response) {
+  if (!response.ok) {
+    // e.g. 429 when Einstein is busy, with the reason in `detail`
+    const body = await response.json().catch(() => ({}));
+    throw new Error(body.detail || `Request failed (${response.status})`);
+  }
+
+  const exchange = createExchange();
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+
+    for (const line of lines) {
+      if (!line.startsWith('data: ')) continue;
+
+      const data = line.slice(6);
+      if (!data.trim()) continue;
+
+      try {
+        handleServerEvent(JSON.parse(data), exchange);
+      } catch (e) {
+        console.error('Parse error:', e);
+      }
+    }
+  }
+}
+
 // Send text message
 async function sendMessage(text) {
   if (!text.trim()) return;
@@ -197,7 +448,9 @@ async function sendMessage(text) {
   abortController = new AbortController();
 
   try {
-    const response = await fetch(`${API_BASE}/uid/${uid}/sid/${sid}/ask`, {
+    if (await streamOverSocket({ type: 'ask', prompt: text, format: audioFormat })) return;
+
+    const response = await fetch(`${API_BASE}/uid/${uid}/sid/${sid}/ask?format=${audioFormat}`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -206,65 +459,7 @@ async function sendMessage(text) {
       signal: abortController.signal
     });
 
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder();
-    let buffer = '';
-    let sampleRate = 22050;
-    let firstText = true;
-
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
-
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split('\n');
-      buffer = lines.pop();
-
-      for (const line of lines) {
-        if (!line.startsWith('data: ')) continue;
-
-        const data = line.slice(6);
-        if (!data.trim()) continue;
-
-        try {
-          const event = JSON.parse(data);
-
-          switch (event.type) {
-            case 'header':
-              sampleRate = event.sampleRate;
-              removeTypingIndicator();
-              break;
-
-            case 'text':
-              if (firstText) {
-                addMessage('assistant', event.content, true);
-                firstText = false;
-              } else {
-                addMessage('assistant', event.content, true);
-              }
-              break;
-
-            case 'audio':
-              audioQueue.push({ audioHex: event.audio, sampleRate });
-              processAudioQueue();
-              break;
-
-            case 'done':
-              currentMessageDiv = null;
-              // setSpeakingState(false);
-              break;
-
-            case 'error':
-              setSpeakingState(false);
-              removeTypingIndicator();
-              showStatus('Error: ' + event.message);
-              break;
-          }
-        } catch (e) {
-          console.error('Parse error:', e);
-        }
-      }
-    }
+    await readSseStream(response);
   } catch (error) {
     if (error.name === 'AbortError') {
       console.log('Request aborted');
@@ -289,85 +484,19 @@ async function sendVoiceMessage(audioBlob) {
   currentMessageDiv = null;
   abortController = new AbortController();
 
-  const formData = new FormData();
-  formData.append('audio', audioBlob, 'recording.webm');
-
   try {
-    const response = await fetch(`${API_BASE}/uid/${uid}/sid/${sid}/speak`, {
+    if (await streamOverSocket({ type: 'speak', format: audioFormat }, audioBlob)) return;
+
+    const formData = new FormData();
+    formData.append('audio', audioBlob, 'recording.webm');
+
+    const response = await fetch(`${API_BASE}/uid/${uid}/sid/${sid}/speak?format=${audioFormat}`, {
       method: 'POST',
       body: formData,
       signal: abortController.signal
     });
 
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder();
-    let buffer = '';
-    let sampleRate = 22050;
-    let firstText = true;
-
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
-
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split('\n');
-      buffer = lines.pop();
-
-      for (const line of lines) {
-        if (!line.startsWith('data: ')) continue;
-
-        const data = line.slice(6);
-        if (!data.trim()) continue;
-
-        try {
-          const event = JSON.parse(data);
-
-          switch (event.type) {
-            case 'transcription':
-              removeTypingIndicator();
-              addMessage('user', event.text);
-              showStatus('Einstein is thinking...', 0);
-              showTypingIndicator();
-              break;
-
-            case 'header':
-              sampleRate = event.sampleRate;
-              removeTypingIndicator();
-              statusBar.classList.remove('show');
-              break;
-
-            case 'text':
-              if (firstText) {
-                addMessage('assistant', event.content, true);
-                firstText = false;
-              } else {
-                addMessage('assistant', event.content, true);
-              }
-              break;
-
-            case 'audio':
-              audioQueue.push({ audioHex: event.audio, sampleRate });
-              processAudioQueue();
-              break;
-
-            case 'done':
-              currentMessageDiv = null;
-              statusBar.classList.remove('show');
-              // setSpeakingState(false);
-              break;
-
-            case 'error':
-              setSpeakingState(false);
-              removeTypingIndicator();
-              if (event.message === "Could not understand audio") showStatus(event.message + ". Please try again");
-              else showStatus('Error: ' + event.message);
-              break;
-          }
-        } catch (e) {
-          console.error('Parse error:', e);
-        }
-      }
-    }
+    await readSseStream(response);
   } catch (error) {
     if (error.name === 'AbortError') {
       console.log('Request aborted');
@@ -397,16 +526,26 @@ messageInput.addEventListener('keypress', (e) => {
   }
 });
 
+// Stop the microphone (the user clicked Stop, or the server heard them finish)
+function stopRecording() {
+  if (!isRecording) return;
+
+  mediaRecorder.stop();
+  isRecording = false;
+  removeTypingIndicator();
+  voiceBtn.classList.remove('recording');
+  voiceBtn.innerHTML = '<span>🎤</span> Voice';
+}
+
 voiceBtn.addEventListener('click', async () => {
 
   if (isRecording) {
     // Stop recording
-    mediaRecorder.stop();
-    isRecording = false;
-    removeTypingIndicator();
-    voiceBtn.classList.remove('recording');
-    voiceBtn.innerHTML = '<span>🎤</span> Voice';
+    stopRecording();
   } else {
+    // Barge-in: talking over Einstein cancels the answer in progress
+    if (isSpeaking) stopSpeaking();
+
     // Start recording
     try {
       // Check if getUserMedia is available in secure context
@@ -423,25 +562,33 @@ voiceBtn.addEventListener('click', async () => {
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
       const mimeType = getSupportedMimeType();
 
+      initAudio();
       mediaRecorder = new MediaRecorder(stream, { mimeType });
-      audioChunks = [];
 
-      mediaRecorder.ondataavailable = (event) => {
-        audioChunks.push(event.data);
-      };
+      if (await ensureSocket()) {
+        streamVoiceMessage(stream, mimeType);
+        showStatus('Listening... I will answer when you stop talking', 0);
+      } else {
+        audioChunks = [];
 
-      mediaRecorder.onstop = async () => {
-        const audioBlob = new Blob(audioChunks, { type: mimeType });
-        await sendVoiceMessage(audioBlob);
-        stream.getTracks().forEach(track => track.stop());
-      };
+        mediaRecorder.ondataavailable = (event) => {
+          audioChunks.push(event.data);
+        };
+
+        mediaRecorder.onstop = async () => {
+          const audioBlob = new Blob(audioChunks, { type: mimeType });
+          await sendVoiceMessage(audioBlob);
+          stream.getTracks().forEach(track => track.stop());
+        };
+
+        mediaRecorder.start();
+        showStatus('Recording... Click Stop when done', 0);
+      }
 
-      mediaRecorder.start();
       isRecording = true;
       showTypingIndicator('user');
       voiceBtn.classList.add('recording');
       voiceBtn.innerHTML = '<span>⏹️</span> Stop';
-      showStatus('Recording... Click Stop when done', 0);
     } catch (error) {
       console.error('Microphone error:', error);
       showStatus('Error accessing microphone: ' + error.message);
@@ -475,37 +622,45 @@ function generateRandomId(prefix = "id") {
 // Initialize on load — now supports URL-based uid/sid
 window.addEventListener('load', async () => {
   const urlIds = getIdsFromUrl();
-  let uid = generateRandomId("u");
-  let sid = generateRandomId("s");
 
   if (urlIds) {
-    uid = urlIds.uid;
-    sid = urlIds.sid;
-    userIdInput.value = uid;
-    sessionIdInput.value = sid;
-  }
-  else {
-    userIdInput.value = uid;
-    sessionIdInput.value = sid;
+    userIdInput.value = urlIds.uid;
+    sessionIdInput.value = urlIds.sid;
 
-    updateUrl();
+    // Resuming a known session: make sure it exists (the first /ask would create it anyway)
+    try {
+      const response = await fetch(`${API_BASE}/uid/${urlIds.uid}/sid/${urlIds.sid}/init`);
+      if (response.status === 409) {
+        showStatus(`Info: Session already exists, resuming session...`, 5000);
+      }
+      else if (!response.ok) {
+        showStatus(`Warning: Session init failed (${response.status})`, 5000);
+      }
+    } catch (error) {
+      console.error('Failed to initialize session:', error);
+    }
+    return;
   }
 
-  // Optional: save to localStorage for persistence
-  // localStorage.setItem('last_uid', uid);
-  // localStorage.setItem('last_sid', sid);
-
+  // New visitor: take a session the backend has already created
+  let uid = generateRandomId("u");
+  let sid = generateRandomId("s");
   try {
-    const response = await fetch(`${API_BASE}/uid/${uid}/sid/${sid}/init`);
-    if (response.status === 409) {
-      showStatus(`Info: Session already exists, resuming session...`, 5000);
-    }
-    else if (!response.ok) {
-      showStatus(`Warning: Session init failed (${response.status})`, 5000);
+    const response = await fetch(`${API_BASE}/session/new`);
+    if (response.ok) {
+      ({ uid, sid } = await response.json());
     }
   } catch (error) {
-    console.error('Failed to initialize session:', error);
+    // Fall back to the random IDs; the first /ask creates the session
+    console.error('Failed to get a new session:', error);
   }
+  userIdInput.value = uid;
+  sessionIdInput.value = sid;
+  updateUrl();
+
+  // Optional: save to localStorage for persistence
+  // localStorage.setItem('last_uid', uid);
+  // localStorage.setItem('last_sid', sid);
 });
 
 function cleanAndNormaliseSpaces(inputString) {
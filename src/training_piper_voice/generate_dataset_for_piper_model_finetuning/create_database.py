@@ -1,20 +1,15 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import numpy as np
 import pandas as pd
 
-from TTS.api import TTS
-import os
-import torch
-
 import librosa
 import soundfile as sf
 
-# Get device
-device = "cuda" if torch.cuda.is_available() else "cpu"
-
-# Init TTS
-# replace the path with the path to your desired TTS model
-tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-
 # you can use one or multiple files for a speaker
 # for more information, check the TTS documentation or their github (https://github.com/idiap/coqui-ai-TTS)
 speaker_voice_files = [
@@ -24,12 +19,38 @@ speaker_voice_files = [
 
 PATH_TO_OUTPUT = "path_to_output_dir"
 CSV_PATH = "path/to/metadata.csv"
+# replace the path with the path to your desired TTS model
+TTS_MODEL = "tts_models/multilingual/multi-dataset/xtts_v2"
+TARGET_SR = 22050
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def load_tts():
+    import torch
+    from TTS.api import TTS
+
+    # Get device
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # Init TTS
+    return TTS(TTS_MODEL).to(device)
 
 
-path_to_output_original = f"{PATH_TO_OUTPUT}/original"
-path_to_output_22050 = f"{PATH_TO_OUTPUT}/22050"
+def load_metadata(csv_path):
+    metadata = pd.read_csv(csv_path, sep="|", header=None, index_col=0)
+    return [(int(index), str(metadata.loc[index, 1])) for index in metadata.index]
 
-def generate_voice(index, text):
+
+def write_wav(path, audio, sample_rate):
+    """Write through a temporary file so a crash never leaves a truncated WAV behind."""
+    tmp_path = f"{path}.tmp.wav"
+    sf.write(tmp_path, audio, sample_rate)
+    os.replace(tmp_path, path)
+
+
+# ───────────────────────────────────────────────────────────
+# Legacy mode: one row at a time, through files on disk
+# ───────────────────────────────────────────────────────────
+def generate_voice(tts, index, text, path_to_output_original, path_to_output_22050):
     print(f"Processing {index}: {text}")
     original_file_path = f"{path_to_output_original}/{index}.wav"
     output_path = f"{path_to_output_22050}/{index}.wav"
@@ -43,26 +64,179 @@ def generate_voice(index, text):
     resampled_data = librosa.resample(
         audio_data,
         orig_sr=original_sr,
-        target_sr=22050,
+        target_sr=TARGET_SR,
     )
-    sf.write(output_path, resampled_data, 22050)
-
-
-# check if directory exists
-if not os.path.exists(PATH_TO_OUTPUT):
-    os.makedirs(PATH_TO_OUTPUT)
-
-if not os.path.exists(path_to_output_original):
-    os.makedirs(path_to_output_original)
-
-if not os.path.exists(path_to_output_22050):
-    os.makedirs(path_to_output_22050)
-
-
-metadata = pd.read_csv(CSV_PATH, sep="|", header=None, index_col=0)
-
-for i in metadata.index:
-    index = metadata.loc[i].name
-    sentence = metadata.loc[i, 1]
-
-    generate_voice(index, sentence)
+    sf.write(output_path, resampled_data, TARGET_SR)
+
+
+# ───────────────────────────────────────────────────────────
+# Pipeline mode
+# ───────────────────────────────────────────────────────────
+class Synthesizer:
+    """
+    XTTS inference with the speaker conditioning computed once.
+
+    `tts_to_file` re-encodes the speaker clips for every sentence; here the
+    GPT conditioning latents and speaker embedding are computed up front and
+    reused for every row. Models without that interface fall back to
+    `tts.tts`, which still keeps the audio in memory.
+    """
+
+    def __init__(self, tts):
+        self.tts = tts
+        self.model = tts.synthesizer.tts_model
+        self.sample_rate = tts.synthesizer.output_sample_rate
+        self.latents = None
+        if hasattr(self.model, "get_conditioning_latents"):
+            self.latents = self.model.get_conditioning_latents(audio_path=speaker_voice_files)
+
+    def synthesize_many(self, texts):
+        """Audio for each text in turn; XTTS inference takes one sentence at a time."""
+        import torch
+
+        with torch.inference_mode():
+            if self.latents is None:
+                return [
+                    np.asarray(self.tts.tts(text=text, speaker_wav=speaker_voice_files, language="en"), dtype=np.float32)
+                    for text in texts
+                ]
+            gpt_cond_latent, speaker_embedding = self.latents
+            return [
+                np.asarray(self.model.inference(text, "en", gpt_cond_latent, speaker_embedding)["wav"], dtype=np.float32)
+                for text in texts
+            ]
+
+
+def resample_and_write(rows, audios, original_sr, path_to_output_original, path_to_output_22050):
+    """Worker: resample a batch in memory and write both WAVs; returns its manifest entries."""
+    entries = []
+    for (index, text), audio in zip(rows, audios):
+        if path_to_output_original:
+            write_wav(f"{path_to_output_original}/{index}.wav", audio, original_sr)
+        resampled = librosa.resample(audio, orig_sr=original_sr, target_sr=TARGET_SR)
+        write_wav(f"{path_to_output_22050}/{index}.wav", resampled, TARGET_SR)
+        entries.append({"index": index, "text": text, "seconds": round(len(resampled) / TARGET_SR, 3)})
+    return entries
+
+
+def read_manifest(path, path_to_output_22050):
+    """Indices already generated, for the same text, whose 22050 Hz file still exists."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line of a run that was killed mid-write
+                continue
+            if os.path.exists(f"{path_to_output_22050}/{entry['index']}.wav"):
+                done[entry["index"]] = entry["text"]
+    return done
+
+
+class Progress:
+    def __init__(self, total, skipped):
+        self.total = total
+        self.done = skipped
+        self.generated = 0
+        self.audio_s = 0.0
+        self.started = time.perf_counter()
+
+    def update(self, entries):
+        self.done += len(entries)
+        self.generated += len(entries)
+        self.audio_s += sum(entry["seconds"] for entry in entries)
+        elapsed = time.perf_counter() - self.started
+        rate = self.generated / elapsed
+        eta = (self.total - self.done) / rate if rate else 0.0
+        print(
+            f"[{self.done}/{self.total}] {rate:.2f} sentences/s, "
+            f"{self.audio_s / elapsed:.2f} s of audio per s, ETA {eta:.0f} s",
+            flush=True,
+        )
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "sentences": self.total,
+            "generated": self.generated,
+            "skipped": self.total - self.generated,
+            "elapsed_s": round(elapsed, 1),
+            "sentences_per_s": round(self.generated / elapsed, 3) if elapsed else None,
+            "audio_s": round(self.audio_s, 1),
+            "audio_s_per_s": round(self.audio_s / elapsed, 3) if elapsed else None,
+        }
+
+
+def run_pipeline(tts, rows, output_dir, batch_size, workers, keep_original):
+    path_to_output_original = f"{output_dir}/original" if keep_original else None
+    path_to_output_22050 = f"{output_dir}/22050"
+    manifest_path = f"{output_dir}/{MANIFEST_NAME}"
+
+    done = read_manifest(manifest_path, path_to_output_22050)
+    pending = [(index, text) for index, text in rows if done.get(index) != text]
+    progress = Progress(len(rows), len(rows) - len(pending))
+    print(f"{len(rows) - len(pending)} of {len(rows)} sentences already generated, {len(pending)} to go")
+
+    synthesizer = Synthesizer(tts)
+    in_flight = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(manifest_path, "a", encoding="utf-8") as manifest:
+
+        def collect(futures):
+            for future in futures:
+                entries = future.result()
+                # Recorded only after both files are written
+                manifest.writelines(json.dumps(entry) + "\n" for entry in entries)
+                manifest.flush()
+                progress.update(entries)
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            audios = synthesizer.synthesize_many([text for _, text in batch])
+            # The GPU moves on to the next batch while workers resample this one
+            in_flight.add(pool.submit(
+                resample_and_write, batch, audios, synthesizer.sample_rate,
+                path_to_output_original, path_to_output_22050,
+            ))
+            # Bound the audio held in memory
+            while len(in_flight) >= 2 * workers:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(in_flight)[0])
+
+    return progress.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Piper fine-tuning dataset with XTTS.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--out", default=PATH_TO_OUTPUT)
+    parser.add_argument("--batch-size", type=int, default=8, help="Sentences per resampling job")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--no-original", action="store_true", help="Do not keep the model-rate WAVs")
+    parser.add_argument("--legacy", action="store_true", help="Original one-row-at-a-time loop")
+    args = parser.parse_args()
+
+    path_to_output_original = f"{args.out}/original"
+    path_to_output_22050 = f"{args.out}/22050"
+    # check if directory exists
+    os.makedirs(path_to_output_22050, exist_ok=True)
+    if not args.no_original or args.legacy:
+        os.makedirs(path_to_output_original, exist_ok=True)
+
+    rows = load_metadata(args.csv)
+    tts = load_tts()
+
+    if args.legacy:
+        for index, sentence in rows:
+            generate_voice(tts, index, sentence, path_to_output_original, path_to_output_22050)
+        return
+
+    report = run_pipeline(tts, rows, args.out, args.batch_size, args.workers, not args.no_original)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()